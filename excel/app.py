@@ -7,11 +7,15 @@ from excel.tax_invoice_app import run as run_tax
 from excel.misc_app import run as run_misc
 from excel.loan_app import run as run_loan
 from excel.ledger_app import run as run_ledger
+from excel.ledger_query_app import run as run_ledger_query
 from excel.xls_convert_app import run as run_xls_convert
 from excel.fundcheck_app import run as run_fund_check
 from excel.donation_main_app import run as run_donation_main
+from excel.donation_report_app import STEP_KEY as DONATION_STEP_KEY, STEPS as DONATION_STEPS
+from excel.donation_report_app import run as run_donation_report
 from excel.expense_account_check_app import run as run_expense_account_check
 from excel.prepaid_cit_app import run as run_prepaid_cit
+from excel.jobs import show_session_jobs
 
 
 def render_main_menu(go):
@@ -32,12 +36,14 @@ def render_main_menu(go):
             ### ⚠ 주의사항
             - 업로드한 파일은 **서버에 저장되지 않습니다**.
             - 개인정보 포함 파일은 작업 후 즉시 삭제 권장.
-            - 동시에 여러 기능을 새 탭에서 실행하지 마세요.
+            - 무거운 작업은 서버 전체에서 동시 실행 수·메모리 한도 안에서 차례로 처리됩니다.
+              (한도를 넘으면 대기 순번이 표시되고, 너무 큰 파일은 나눠서 올리라는 안내가 나옵니다)
             """
         )
 
     st.title("📊 재무회계팀 자동화 작업 메뉴")
     st.write("원하는 작업을 선택하세요.")
+    show_session_jobs()
 
     st.markdown(
         """
@@ -56,6 +62,8 @@ def render_main_menu(go):
         st.button("재무제표 생성", disabled=True)
         if st.button("회계단위별 원장파일 통합"):
             go("EXCEL:ledger")
+        if st.button("통합 원장 조회"):
+            go("EXCEL:ledger_query")
         st.button("재무제표 vs 부속명세서 검증", disabled=True)
 
         st.markdown("---")
@@ -85,10 +93,10 @@ def render_main_menu(go):
     with col3:
         st.subheader("🎁출연받은재산 보고를 위한 작업🎁")
         st.write("아래의 기능들을 순서대로 작업하는 것을 추천")
-        st.button("1) 당해 기부금 내역 정리", disabled=True)
-        st.button("2) 출연받은재산보고 정리", disabled=True)
-        st.button("3) 기부금지출명세서 정리", disabled=True)
-        st.button("4) 기부금지출명세서 검증", disabled=True)
+        for i, label in enumerate(DONATION_STEPS, start=1):
+            if st.button(label):
+                st.session_state[DONATION_STEP_KEY] = i
+                go("EXCEL:donation_report")
         st.markdown("---")
         st.subheader("산단 준비중")
 
@@ -127,6 +135,11 @@ def render(go):
             go("EXCEL:main")
         run_ledger()
 
+    elif page == "EXCEL:ledger_query":
+        if st.button("⬅ 엑셀메뉴", key="back_excel_menu_ledger_query"):
+            go("EXCEL:main")
+        run_ledger_query()
+
     elif page == "EXCEL:xls_convert":
         if st.button("⬅ 엑셀메뉴", key="back_excel_menu_xls"):
             go("EXCEL:main")
@@ -142,6 +155,11 @@ def render(go):
             go("EXCEL:main")
         run_donation_main()
 
+    elif page == "EXCEL:donation_report":
+        if st.button("⬅ 엑셀메뉴", key="back_excel_menu_donation_report"):
+            go("EXCEL:main")
+        run_donation_report()
+
     elif page == "EXCEL:expense_account_check":
         if st.button("⬅ 엑셀메뉴", key="back_excel_menu_expense"):
             go("EXCEL:main")
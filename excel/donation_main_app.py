@@ -1,12 +1,127 @@
 # donation_main_app.py
 # -*- coding: utf-8 -*-
+import zipfile
+from concurrent.futures import as_completed
+from datetime import datetime
+from io import BytesIO
+
+import pandas as pd
 import streamlit as st
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Font
+from openpyxl.utils import get_column_letter
+
+from excel.excel_io import parse_amounts, read_upload_filtered
+from excel.jobs import estimate_memory, process_pool, run_admitted
+from excel.result_cache import cached_result, get_result, result_key
+from excel.routing import split_by_route
+
+# 원본 P열(적요): 공란 행은 두 재원 모두 버리므로 읽는 단계에서 바로 제외
+NARR_COL_IDX = 15
+
+
+def narration_filled(batch):
+    """스트리밍 묶음별 1차 필터: P열(적요)이 공란이 아닌 행만"""
+    if batch.shape[1] <= NARR_COL_IDX:
+        raise ValueError("P열 폴백이 불가능합니다(컬럼 수 부족). 원본 파일 형식 확인 필요.")
+    return batch.iloc[:, NARR_COL_IDX].map(lambda x: "" if x is None else str(x).strip()) != ""
+
+# 결과 시트 공통: K열 '합계' + L열 =SUM, L열 #,##0, 전체 열 AutoFit(10~80)
+SUM_LABEL_IDX = 10   # K
+SUM_AMOUNT_IDX = 11  # L
+AMOUNT_FMT = "#,##0"
+DATETIME_FMT = "YYYY-MM-DD HH:MM:SS"  # pd.ExcelWriter 기본 날짜 서식과 동일
+MIN_WIDTH, MAX_WIDTH = 10, 80
+
+
+def _display_len(v) -> int:
+    """AutoFit 기준 글자 수 (숫자는 천단위 콤마 표시 기준)"""
+    if isinstance(v, (int, float)):
+        return len(f"{v:,.0f}")
+    return len(str(v))
+
+
+def write_donation_workbook(sheets: dict, center_a1=False) -> bytes:
+    """
+    {시트명: DataFrame} → xlsx bytes, write-only 1회 기록.
+    - center_a1: True(전 시트) 또는 A1 세로 가운데 정렬할 시트명 집합
+    - 값은 이미 숫자화된 상태로 그대로 기록, L열은 #,##0
+    - 데이터가 있으면 마지막에 K '합계' / L =SUM(L2:Ln) (굵게)
+    - 열 너비는 헤더·값·합계행 기준으로 미리 계산
+    """
+    wb = Workbook(write_only=True)
+    for name, df in sheets.items():
+        ws = wb.create_sheet(name[:31])
+        ws.sheet_view.showGridLines = True
+
+        # 예전 결과를 다시 넣은 경우 등, 기존 '합계' 행은 제외
+        if df.shape[1] > SUM_LABEL_IDX:
+            label = df.iloc[:, SUM_LABEL_IDX]
+            df = df[~label.map(lambda v: isinstance(v, str) and v.strip() == "합계")]
+
+        header = [str(c) for c in df.columns]
+        body = df.astype(object).where(df.notna(), None).values.tolist()
+        n_cols = len(header)
+        has_amount = n_cols > SUM_AMOUNT_IDX
+        sum_row = None
+        if body and n_cols > SUM_LABEL_IDX:
+            amount_letter = get_column_letter(SUM_AMOUNT_IDX + 1)
+            sum_row = [None] * n_cols
+            sum_row[SUM_LABEL_IDX] = "합계"
+            if has_amount:
+                sum_row[SUM_AMOUNT_IDX] = f"=SUM({amount_letter}2:{amount_letter}{len(body) + 1})"
+
+        # 열 너비 (write-only 는 행보다 먼저)
+        for ci in range(n_cols):
+            lens = [len(header[ci])]
+            lens += [_display_len(row[ci]) for row in body if row[ci] is not None]
+            if sum_row is not None and sum_row[ci] is not None:
+                lens.append(len(sum_row[ci]))
+            width = min(max(max(lens) + 2, MIN_WIDTH), MAX_WIDTH)
+            ws.column_dimensions[get_column_letter(ci + 1)].width = width
+
+        centered = center_a1 if isinstance(center_a1, bool) else name in center_a1
+        if centered and header:
+            first = WriteOnlyCell(ws, value=header[0])
+            first.alignment = Alignment(vertical="center")
+            ws.append([first, *header[1:]])
+        else:
+            ws.append(header)
+
+        for row in body:
+            for ci, v in enumerate(row):
+                if isinstance(v, datetime):
+                    cell = WriteOnlyCell(ws, value=v)
+                    cell.number_format = DATETIME_FMT
+                    row[ci] = cell
+            if has_amount:
+                cell = WriteOnlyCell(ws, value=row[SUM_AMOUNT_IDX])
+                cell.number_format = AMOUNT_FMT
+                row[SUM_AMOUNT_IDX] = cell
+            ws.append(row)
+
+        if sum_row is not None:
+            label = WriteOnlyCell(ws, value="합계")
+            label.font = Font(bold=True)
+            sum_row[SUM_LABEL_IDX] = label
+            if has_amount:
+                total = WriteOnlyCell(ws, value=sum_row[SUM_AMOUNT_IDX])
+                total.font = Font(bold=True)
+                total.number_format = AMOUNT_FMT
+                sum_row[SUM_AMOUNT_IDX] = total
+            ws.append(sum_row)
+
+    out = BytesIO()
+    wb.save(out)
+    return out.getvalue()
+
 
 def run():
     st.title("🎁 출연받은재산 정리")
     st.write("재원을 선택하면 이 페이지에서 바로 작업을 실행합니다.")
     st.markdown("""
-        - 지원 형식: XLSX, XLSM  
+        - 지원 형식: XLSX, XLSM, XLS  
 
         1. 회계-세무관리-출연받은재산 사용내역 메뉴 클릭  
         2. 회계단위를 조회하여 우클릭 후 *기본엑셀*로 저장(엑셀파일x)  
@@ -21,13 +136,16 @@ def run():
     if "donation_mode" not in st.session_state:
         st.session_state["donation_mode"] = None
 
-    col1, col2 = st.columns(2)
+    col1, col2, col3 = st.columns(3)
     with col1:
         if st.button("교비비등록금 재원", use_container_width=True):
             st.session_state["donation_mode"] = "gb"
     with col2:
         if st.button("대학원비등록금 재원", use_container_width=True):
             st.session_state["donation_mode"] = "grad"
+    with col3:
+        if st.button("여러 재원 일괄 처리", use_container_width=True):
+            st.session_state["donation_mode"] = "batch"
 
     mode = st.session_state["donation_mode"]
 
@@ -40,7 +158,7 @@ def run():
     # ===== 교비비등록금 =====
     if mode == "gb":
         st.subheader("✅ 교비비등록금 재원 처리")
-        up = st.file_uploader("원본 파일 업로드 (.xlsx/.xlsm)", type=["xlsx", "xlsm"], key="up_gb")
+        up = st.file_uploader("원본 파일 업로드 (.xlsx/.xlsm/.xls)", type=["xlsx", "xlsm", "xls"], key="up_gb")
         if not up:
             st.stop()
 
@@ -51,7 +169,11 @@ def run():
             status.write("📥 처리 중...")
             prog.progress(20)
 
-            out_bytes = process_gb_like_vba(up)
+            # 서버 작업 스케줄러 경유 (동시 실행 수 / 메모리 한도 초과 시 대기)
+            out_bytes = run_admitted(
+                "출연받은재산 (교비비등록금)", lambda report: process_gb_like_vba(up),
+                cost=estimate_memory([up]),
+            )
 
             prog.progress(95)
             status.write("✅ 완료")
@@ -72,11 +194,15 @@ def run():
     elif mode == "grad":
         st.subheader("✅ 대학원비등록금 재원 처리")
 
-        up = st.file_uploader("원본 파일 업로드 (.xlsx/.xlsm)", type=["xlsx", "xlsm"], key="up_grad")
+        up = st.file_uploader("원본 파일 업로드 (.xlsx/.xlsm/.xls)", type=["xlsx", "xlsm", "xls"], key="up_grad")
         if not up:
             st.stop()
 
-        out_bytes = process_grad_like_vba(up)
+        # 서버 작업 스케줄러 경유 (동시 실행 수 / 메모리 한도 초과 시 대기)
+        out_bytes = run_admitted(
+            "출연받은재산 (대학원비등록금)", lambda report: process_grad_like_vba(up),
+            cost=estimate_memory([up]),
+        )
 
         st.download_button(
             "📥 결과 엑셀 다운로드",
@@ -85,408 +211,252 @@ def run():
             mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
         )
 
-def process_gb_like_vba(file_like) -> bytes:
-    """
-    VBA: 교비비출연받은재산정리
-    - 적요 공란 제거
-    - F/H/I/J 열 삭제
-    - 부서별 시트 생성
-    - 지정기부금 통합
-    - 학생지원팀 → CCF / 지정기부금 이동
-    - 합계(L열) + AutoFit
-    """
+    # ===== 여러 재원 일괄 처리 =====
+    elif mode == "batch":
+        st.subheader("✅ 여러 재원 일괄 처리")
+        st.caption("파일마다 재원을 지정하면 공통 전처리 후 동시에 처리합니다. (파일명에 '대학원'이 있으면 대학원비등록금으로 추정)")
 
-    from io import BytesIO
-    import re
-    import pandas as pd
-    from openpyxl import load_workbook
-    from openpyxl.utils import get_column_letter
-    def autofit_all_columns(ws, min_width=10, max_width=80):
-        """
-        시트의 모든 열을 대상으로:
-        - 헤더 + 데이터 기준 최대 문자열 길이 계산
-        - 숫자는 콤마 포함 문자열 기준
-        """
-        for col_idx in range(1, ws.max_column + 1):
-            col_letter = get_column_letter(col_idx)
-            max_len = 0
-
-            for row_idx in range(1, ws.max_row + 1):
-                cell = ws.cell(row=row_idx, column=col_idx)
-                v = cell.value
-                if v is None:
-                    continue
-
-                if isinstance(v, (int, float)):
-                    s = f"{v:,.0f}"
-                else:
-                    s = str(v)
-
-                max_len = max(max_len, len(s))
-
-            ws.column_dimensions[col_letter].width = min(
-                max(max_len + 2, min_width),
-                max_width
+        ups = st.file_uploader(
+            "원본 파일 업로드 (여러 개 가능)",
+            type=["xlsx", "xlsm", "xls"],
+            accept_multiple_files=True,
+            key="up_batch",
+        )
+        if not ups:
+            st.stop()
+
+        units = list(DONATION_UNITS)
+        items = []
+        for i, up in enumerate(ups):
+            unit = st.selectbox(
+                up.name,
+                units,
+                index=units.index(guess_unit(up.name)),
+                format_func=lambda u: DONATION_UNITS[u]["label"],
+                key=f"batch_unit_{i}_{up.name}",
             )
-    # --------------------------
-    # 유틸
-    # --------------------------
-
-    def excel_col_to_index(letter: str) -> int:
-        n = 0
-        for ch in letter.upper():
-            n = n * 26 + (ord(ch) - ord("A") + 1)
-        return n - 1
-
-    def safe_strip(x):
-        return "" if x is None else str(x).strip()
-
-    def to_number(x):
-        if x is None:
-            return None
-        if isinstance(x, (int, float)):
-            return float(x)
-        s = str(x).replace(",", "").strip()
-        if s == "":
-            return None
-        if re.fullmatch(r"-?\d+(\.\d+)?", s):
-            return float(s)
-        return None
-
-    def autofit(ws):
-        for c in range(1, ws.max_column + 1):
-            col_letter = get_column_letter(c)
-            max_len = 0
-            for r in range(1, ws.max_row + 1):
-                v = ws.cell(r, c).value
-                if v is None:
-                    continue
-                s = f"{v:,.0f}" if isinstance(v, (int, float)) else str(v)
-                max_len = max(max_len, len(s))
-            ws.column_dimensions[col_letter].width = min(max(max_len + 2, 10), 70)
-
-    # --------------------------
-    # 1) 원본 읽기
-    # --------------------------
-    df = pd.read_excel(file_like, sheet_name=0, dtype=object)
-    df.columns = [str(c).strip() for c in df.columns]
+            items.append((unit, up.name, up.getvalue()))
 
-    # 기본 위치 fallback (VBA 기준)
-    col_narr = df.columns[excel_col_to_index("P")]
-    col_dept = df.columns[excel_col_to_index("I")]
-    col_amt  = df.columns[excel_col_to_index("L")]
-
-    # --------------------------
-    # 2) 적요 공란 제거
-    # --------------------------
-    df = df[df[col_narr].map(safe_strip) != ""].copy()
-
-    # --------------------------
-    # 3) F/H/I/J 열 삭제 (역순)
-    # --------------------------
-    drop_letters = ["J", "I", "H", "F"]
-    cols = list(df.columns)
-    for lt in drop_letters:
-        idx = excel_col_to_index(lt)
-        if idx < len(cols):
-            cols.pop(idx)
-    df = df.loc[:, cols].copy()
-
-    # 삭제 후 다시 위치 보정
-    col_narr = df.columns[excel_col_to_index("P")]
-    col_dept = df.columns[excel_col_to_index("I")]
-    col_amt  = df.columns[excel_col_to_index("L")]
-
-    # --------------------------
-    # 4) 금액 숫자화
-    # --------------------------
-    df[col_amt] = df[col_amt].apply(to_number)
-
-    # --------------------------
-    # 5) 부서별 시트 분리
-    # --------------------------
-    specified_depts = [
-        "산학연구지원팀", "비서실", "학생지원팀",
-        "대외협력팀", "대학교회", "공간환경시스템공학부"
-    ]
-
-    sheets = {}
-    for dept in sorted(df[col_dept].dropna().unique()):
-        part = df[df[col_dept] == dept].copy()
-        sheets[str(dept)] = part
-
-    # --------------------------
-    # 6) 지정기부금 통합
-    # --------------------------
-    지정_rows = []
-    for k in list(sheets.keys()):
-        if k not in specified_depts:
-            지정_rows.append(sheets.pop(k))
-
-    sheets["지정기부금"] = (
-        pd.concat(지정_rows, ignore_index=True)
-        if 지정_rows else df.iloc[0:0].copy()
-    )
-
-    # --------------------------
-    # 7) 학생지원팀 → CCF / 지정기부금
-    # --------------------------
-    if "학생지원팀" in sheets:
-        stud = sheets["학생지원팀"].copy()
-        narr = stud[col_narr].map(safe_strip)
-
-        mask_ccf = narr.str.contains(r"\(지정\)장학 기부금\(CCF\)", na=False)
-        ccf_df = stud[mask_ccf].copy()
-        stud = stud[~mask_ccf].copy()
-
-        mask_to_지정 = narr.str.contains(r"\(지정\)기타 지정기부금", na=False) | \
-                       narr.str.contains(r"\(지정\)총학생회 기부금", na=False)
-        to_지정 = stud[mask_to_지정].copy()
-        stud = stud[~mask_to_지정].copy()
-
-        sheets["CCF"] = ccf_df
-        if not to_지정.empty:
-            sheets["지정기부금"] = pd.concat(
-                [sheets["지정기부금"], to_지정],
-                ignore_index=True
+        output = st.radio("결과 형식", [BATCH_ZIP, BATCH_COMBINED], horizontal=True)
+
+        # 같은 파일 + 재원 지정 + 결과 형식이면 재실행(다운로드 클릭 등) 시 이전 결과 재사용
+        key = result_key(
+            "donation_batch", ups,
+            {"names": tuple(name for _, name, _ in items), "units": tuple(u for u, _, _ in items), "output": output},
+        )
+        result = get_result(key)
+        if result is None:
+            if not st.button("일괄 처리 실행", type="primary"):
+                st.stop()
+            # 파일별 처리 + 결과 파일 작성까지 서버 작업 스케줄러 경유
+            result = cached_result(key, lambda: run_admitted(
+                f"출연받은재산 일괄 처리 ({len(items)}개)", lambda report: donation_batch_job(items, output),
+                cost=estimate_memory(ups),
+            ))
+
+        for name, err in result["errors"]:
+            st.error(f"{name}: {err}")
+        if result["data"] is None:
+            st.stop()
+
+        st.success(f"✅ {result['done']}개 파일 처리 완료")
+        if output == BATCH_ZIP:
+            st.download_button(
+                "📥 결과 ZIP 다운로드",
+                data=result["data"],
+                file_name="출연받은재산_일괄처리.zip",
+                mime="application/zip",
+            )
+        else:
+            st.download_button(
+                "📥 통합 결과 엑셀 다운로드",
+                data=result["data"],
+                file_name="출연받은재산_일괄처리.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
             )
 
-        sheets["학생지원팀"] = stud
-
-    # --------------------------
-    # 8) 시트명 변경
-    # --------------------------
-    rename_map = {
-        "학생지원팀": "교비일반장학",
-        "공간환경시스템공학부": "공시학부",
-        "산학연구지원팀": "연구소기부",
-    }
-    for old, new in rename_map.items():
-        if old in sheets:
-            sheets[new] = sheets.pop(old)
-
-    # --------------------------
-    # 9) 엑셀 생성
-    # --------------------------
-    bio = BytesIO()
-    with pd.ExcelWriter(bio, engine="openpyxl") as writer:
-        for name, data in sheets.items():
-            data.to_excel(writer, sheet_name=name[:31], index=False)
-    bio.seek(0)
-
-    # --------------------------
-    # 10) 합계 + AutoFit
-    # --------------------------
-    def add_sum_row(ws, k_col_letter="K", l_col_letter="L"):
-        k_col = excel_col_to_index(k_col_letter) + 1
-        l_col = excel_col_to_index(l_col_letter) + 1
-
-        # 기존 합계행 제거
-        for rr in range(ws.max_row, 1, -1):
-            v = ws.cell(rr, k_col).value
-            if isinstance(v, str) and v.strip() == "합계":
-                ws.delete_rows(rr, 1)
-
-        last = ws.max_row
-        if last >= 2:
-            sum_row = last + 1
-            ws.cell(sum_row, k_col).value = "합계"
-            ws.cell(sum_row, l_col).value = f"=SUM({l_col_letter}2:{l_col_letter}{last})"
-            ws.cell(sum_row, l_col).number_format = "#,##0"
-            ws.cell(sum_row, k_col).font = ws.cell(sum_row, k_col).font.copy(bold=True)
-            ws.cell(sum_row, l_col).font = ws.cell(sum_row, l_col).font.copy(bold=True)
-
-    wb = load_workbook(bio)
-    for ws in wb.worksheets:
-        # 숫자 서식 (L열)
-        l_col = excel_col_to_index("L") + 1
-        if l_col <= ws.max_column:
-            for rr in range(2, ws.max_row + 1):
-                cell = ws.cell(rr, l_col)
-                if isinstance(cell.value, str):
-                    vv = cell.value.replace(",", "").strip()
-                    if re.fullmatch(r"-?\d+(\.\d+)?", vv or ""):
-                        cell.value = float(vv)
-                cell.number_format = "#,##0"
-
-        # 합계
-        add_sum_row(ws, "K", "L")
-
-        # 🔥 모든 열 AutoFit (반드시 루프 안!)
-        autofit_all_columns(ws)
+# ======================= 공통 전처리 (재원 공통, 입력마다 1회) =======================
+DROP_LETTERS = ["J", "I", "H", "F"]  # VBA 순서대로 (역순 삭제)
 
-    out = BytesIO()
-    wb.save(out)
-    out.seek(0)
-    return out.read()
 
-def process_grad_like_vba(file_like) -> bytes:
+def excel_col_to_index(letter: str) -> int:
+    n = 0
+    for ch in letter.upper():
+        n = n * 26 + (ord(ch) - ord("A") + 1)
+    return n - 1
+
+
+def prepare_donation_frame(file_like) -> pd.DataFrame:
     """
-    VBA: 대학원비출연받은재산정리_Turbo() 파이썬 변환
-    - P열 공란 삭제
+    두 재원 공통 단계
+    - P열(적요) 공란 행은 읽는 단계에서 제외
     - F/H/I/J 열 삭제
-    - L열 숫자화 + #,##0
-    - 부서별 시트 생성 (헤더에 '부서' 포함 열, 없으면 I열 폴백)
-    - '국제법률대학원' 제외 모든 시트 -> '대학원기부금'으로 합치고 삭제
-    - 모든 시트 AutoFit(전체 열) + L합계(각 시트 1줄)
+    - L열 숫자화
     """
-
-    from io import BytesIO
-    import re
-    import pandas as pd
-    from openpyxl import load_workbook
-    from openpyxl.utils import get_column_letter
-
-    # ---------- util ----------
-    def excel_col_to_index(letter: str) -> int:
-        n = 0
-        for ch in letter.upper():
-            n = n * 26 + (ord(ch) - ord("A") + 1)
-        return n - 1
-
-    def safe_strip(x) -> str:
-        return "" if x is None else str(x).strip()
-
-    def to_number(x):
-        if x is None:
-            return None
-        if isinstance(x, (int, float)):
-            return float(x)
-        s = str(x).replace(",", "").strip()
-        if s == "":
-            return None
-        if re.fullmatch(r"-?\d+(\.\d+)?", s):
-            return float(s)
-        return None
-
-    def find_dept_col_by_header_or_fallback(df: pd.DataFrame) -> str:
-        # VBA: 헤더에 '부서'가 포함된 첫 열, 없으면 I열 폴백
-        for c in df.columns:
-            if "부서" in str(c).strip():
-                return c
-        # fallback: I열(원코드 가정)
-        idx = excel_col_to_index("I")
-        if idx >= len(df.columns):
-            raise ValueError("부서 열을 찾지 못했고 I열 폴백도 불가능합니다(컬럼 수 부족).")
-        return df.columns[idx]
-
-    def add_sum_row(ws, k_col_letter="K", l_col_letter="L"):
-        k_col = excel_col_to_index(k_col_letter) + 1
-        l_col = excel_col_to_index(l_col_letter) + 1
-
-        # 기존 합계 제거
-        for rr in range(ws.max_row, 1, -1):
-            v = ws.cell(rr, k_col).value
-            if isinstance(v, str) and v.strip() == "합계":
-                ws.delete_rows(rr, 1)
-
-        last = ws.max_row
-        if last >= 2:
-            sum_row = last + 1
-            ws.cell(sum_row, k_col).value = "합계"
-            ws.cell(sum_row, l_col).value = f"=SUM({l_col_letter}2:{l_col_letter}{last})"
-            ws.cell(sum_row, l_col).number_format = "#,##0"
-            ws.cell(sum_row, k_col).font = ws.cell(sum_row, k_col).font.copy(bold=True)
-            ws.cell(sum_row, l_col).font = ws.cell(sum_row, l_col).font.copy(bold=True)
-
-    def autofit_all_columns(ws, min_width=10, max_width=80):
-        for col_idx in range(1, ws.max_column + 1):
-            col_letter = get_column_letter(col_idx)
-            max_len = 0
-            for row_idx in range(1, ws.max_row + 1):
-                v = ws.cell(row=row_idx, column=col_idx).value
-                if v is None:
-                    continue
-                if isinstance(v, (int, float)):
-                    s = f"{v:,.0f}"
-                else:
-                    s = str(v)
-                max_len = max(max_len, len(s))
-            ws.column_dimensions[col_letter].width = min(max(max_len + 2, min_width), max_width)
-
-    # ---------- 1) read ----------
-    df = pd.read_excel(file_like, sheet_name=0, dtype=object)
+    df = read_upload_filtered(file_like, keep=narration_filled)
     df.columns = [str(c).strip() for c in df.columns]
 
-    # ---------- 2) P열 공란 삭제 ----------
-    p_idx = excel_col_to_index("P")
-    if p_idx >= len(df.columns):
-        raise ValueError("P열 폴백이 불가능합니다(컬럼 수 부족). 원본 파일 형식 확인 필요.")
-    col_p = df.columns[p_idx]
-    df = df[df[col_p].map(safe_strip) != ""].copy()
-
-    # ---------- 3) F/H/I/J 삭제 (VBA: J,I,H,F 순서) ----------
-    drop_letters = ["J", "I", "H", "F"]
-    cols = list(df.columns)
-    for lt in drop_letters:
+    positions = list(range(df.shape[1]))
+    for lt in DROP_LETTERS:
         idx = excel_col_to_index(lt)
-        if idx < len(cols):
-            cols.pop(idx)
-    df = df.loc[:, cols].copy()
+        if idx < len(positions):
+            positions.pop(idx)
+    df = df.iloc[:, positions].copy()
 
-    # ---------- 4) L열 숫자화 + 서식 ----------
     l_idx = excel_col_to_index("L")
     if l_idx >= len(df.columns):
         raise ValueError("L열 폴백이 불가능합니다(컬럼 수 부족). 원본 파일 형식 확인 필요.")
     col_l = df.columns[l_idx]
-    df[col_l] = df[col_l].apply(to_number)
-
-    # ---------- 5) 부서별 분리 ----------
-    col_dept = find_dept_col_by_header_or_fallback(df)
-
-    sheets = {}
-    # 부서명 공란 제외
-    dept_vals = df[col_dept].map(safe_strip)
-    for dept in sorted([d for d in dept_vals.unique() if d]):
-        sheets[dept] = df[dept_vals == dept].copy()
-
-    # ---------- 7) 대학원기부금 시트 생성 + 합치기 ----------
-    # VBA: 국제법률대학원만 남기고 나머지는 대학원기부금에 합친 후 삭제
-    donation_name = "대학원기부금"
-    keep_name = "국제법률대학원"
-
-    donation_rows = []
-    for name in list(sheets.keys()):
-        if name != keep_name:
-            donation_rows.append(sheets.pop(name))
-    sheets[donation_name] = pd.concat(donation_rows, ignore_index=True) if donation_rows else df.iloc[0:0].copy()
-
-    # 국제법률대학원 시트는 존재하면 유지, 없으면 그냥 donation만 남음
-    # (VBA와 동일하게 “없어도 에러 내지 않음”)
-
-    # ---------- 8/9/10) write excel ----------
-    bio = BytesIO()
-    with pd.ExcelWriter(bio, engine="openpyxl") as writer:
-        # 시트 순서: 국제법률대학원 -> 대학원기부금
-        if keep_name in sheets:
-            sheets[keep_name].to_excel(writer, sheet_name=keep_name[:31], index=False)
-        sheets[donation_name].to_excel(writer, sheet_name=donation_name[:31], index=False)
-    bio.seek(0)
-
-    wb = load_workbook(bio)
-
-    # L열 NumberFormat + 합계 + AutoFit(전체열)
-    for ws in wb.worksheets:
-        # L열 숫자 서식
-        l_col_num = excel_col_to_index("L") + 1
-        if l_col_num <= ws.max_column:
-            for rr in range(2, ws.max_row + 1):
-                cell = ws.cell(rr, l_col_num)
-                if isinstance(cell.value, str):
-                    vv = cell.value.replace(",", "").strip()
-                    if re.fullmatch(r"-?\d+(\.\d+)?", vv or ""):
-                        cell.value = float(vv)
-                cell.number_format = "#,##0"
-
-        # 합계(K/L)
-        add_sum_row(ws, "K", "L")
-
-        # AutoFit(전체 열)
-        ws.cell(1, 1).alignment = ws.cell(1, 1).alignment.copy(vertical="center")
-        ws.sheet_view.showGridLines = True
-        autofit_all_columns(ws)
+    df[col_l] = parse_amounts(df[col_l])
+    return df
+
+
+# ======================= 재원별 시트 구성 =======================
+# 부서(I열) / 적요(P열) → 시트 규칙은 routing_config.ROUTES ("donation_gb" / "donation_grad")
+def split_gb_sheets(df: pd.DataFrame) -> dict:
+    """
+    VBA: 교비비출연받은재산정리
+    - 지정 부서(산학연구지원팀/비서실/학생지원팀/대외협력팀/대학교회/공간환경시스템공학부)는 부서별 시트
+    - 그 외 부서는 지정기부금으로 통합
+    - 학생지원팀 중 (지정)장학 기부금(CCF) → CCF, (지정)기타/총학생회 기부금 → 지정기부금
+    - 시트명 변경 (학생지원팀→교비일반장학, 공간환경시스템공학부→공시학부, 산학연구지원팀→연구소기부)
+    """
+    return split_by_route(df, "donation_gb")
+
+
+def split_grad_sheets(df: pd.DataFrame) -> dict:
+    """
+    VBA: 대학원비출연받은재산정리_Turbo() 파이썬 변환
+    - 부서 열: 헤더에 '부서' 포함 열, 없으면 I열 폴백 (부서명 공란 제외)
+    - '국제법률대학원' 제외 모든 부서 -> '대학원기부금'으로 합침
+    """
+    return split_by_route(df, "donation_grad")
+
+
+# 재원 등록부: 새 재원은 여기에 시트 구성 함수만 추가
+DONATION_UNITS = {
+    "gb": {
+        "label": "교비비등록금",
+        "short": "교비",
+        "split": split_gb_sheets,
+        "center_a1": False,
+        "file_name": "출연받은재산_교비비등록금.xlsx",
+        "name_hints": ["교비"],
+    },
+    "grad": {
+        "label": "대학원비등록금",
+        "short": "대학원",
+        "split": split_grad_sheets,
+        "center_a1": True,
+        "file_name": "출연받은재산_대학원비등록금.xlsx",
+        "name_hints": ["대학원"],
+    },
+}
+
+
+def donation_sheets(unit: str, file_like) -> dict:
+    """업로드 1개 → 공통 전처리 1회 → 재원별 시트 구성"""
+    return DONATION_UNITS[unit]["split"](prepare_donation_frame(file_like))
+
+
+def process_gb_like_vba(file_like) -> bytes:
+    """교비비등록금: 공통 전처리 + 시트 구성 + 합계/AutoFit (1회 기록)"""
+    return write_donation_workbook(donation_sheets("gb", file_like))
+
 
+def process_grad_like_vba(file_like) -> bytes:
+    """대학원비등록금: 공통 전처리 + 시트 구성 + 합계/AutoFit (1회 기록)"""
+    return write_donation_workbook(donation_sheets("grad", file_like), center_a1=True)
+
+
+# ======================= 일괄 처리 (여러 재원 동시) =======================
+BATCH_ZIP = "재원별 엑셀 (ZIP)"
+BATCH_COMBINED = "통합 엑셀 1개"
+
+
+def guess_unit(file_name: str) -> str:
+    """파일명으로 재원 추정 (힌트가 없으면 교비)"""
+    for unit, spec in DONATION_UNITS.items():
+        if any(h in file_name for h in spec["name_hints"]):
+            return unit
+    return "gb"
+
+
+def process_donation_file(unit: str, name: str, data: bytes) -> dict:
+    """프로세스 풀 작업 단위: (재원, 파일명, bytes) → {시트명: DataFrame}"""
+    f = BytesIO(data)
+    f.name = name
+    return donation_sheets(unit, f)
+
+
+def process_donation_batch(items) -> list:
+    """
+    items: [(재원, 파일명, bytes)]
+    파일별로 공용 프로세스 풀(jobs.process_pool)에서 동시에 처리,
+    결과는 입력 순서대로 [(시트 dict | None, 오류 | None)]
+    """
+    results = [None] * len(items)
+
+    def collect(i, fn, *args):
+        try:
+            results[i] = (fn(*args), None)
+        except Exception as e:
+            results[i] = (None, str(e))
+
+    pool = process_pool() if len(items) > 1 else None
+    if pool is not None:
+        futures = {pool.submit(process_donation_file, *item): i for i, item in enumerate(items)}
+        for fut in as_completed(futures):
+            collect(futures[fut], fut.result)
+    else:
+        for i, item in enumerate(items):
+            collect(i, process_donation_file, *item)
+    return results
+
+
+def batch_zip(items, results) -> bytes:
+    """재원별 결과 엑셀을 ZIP 하나로"""
     out = BytesIO()
-    wb.save(out)
-    out.seek(0)
-    return out.read()
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as zf:
+        for (unit, name, _), (sheets, err) in zip(items, results):
+            if err is not None:
+                continue
+            spec = DONATION_UNITS[unit]
+            stem = name.rsplit(".", 1)[0]
+            zf.writestr(
+                f"{spec['file_name'].rsplit('.', 1)[0]}_{stem}.xlsx",
+                write_donation_workbook(sheets, center_a1=spec["center_a1"]),
+            )
+    return out.getvalue()
+
+
+def batch_combined(items, results) -> bytes:
+    """모든 재원 시트를 '재원_시트명' 으로 엑셀 1개에"""
+    combined, centered = {}, set()
+    for (unit, _, _), (sheets, err) in zip(items, results):
+        if err is not None:
+            continue
+        spec = DONATION_UNITS[unit]
+        for sheet_name, df in sheets.items():
+            base = f"{spec['short']}_{sheet_name}"[:31]
+            title, n = base, 1
+            while title in combined:
+                n += 1
+                title = f"{base[:28]}_{n}"
+            combined[title] = df
+            if spec["center_a1"]:
+                centered.add(title)
+    return write_donation_workbook(combined, center_a1=centered)
+
+
+def donation_batch_job(items, output: str) -> dict:
+    """
+    일괄 처리 작업 (스케줄러에서 실행): 파일별 처리 + 결과 파일(ZIP / 통합 엑셀) 작성까지
+    반환: {"errors": [(파일명, 오류)], "done": 처리한 파일 수, "data": 결과 bytes (전부 실패면 None)}
+    """
+    results = process_donation_batch(items)
+    errors = [(name, err) for (_, name, _), (_, err) in zip(items, results) if err is not None]
+    data = None
+    if len(errors) < len(items):
+        data = batch_zip(items, results) if output == BATCH_ZIP else batch_combined(items, results)
+    return {"errors": errors, "done": len(items) - len(errors), "data": data}
@@ -0,0 +1,258 @@
+# donation_report_app.py
+# -*- coding: utf-8 -*-
+"""
+출연받은재산 보고 작업 4단계 파이프라인 (출연받은재산 사용내역 기본엑셀 기준)
+1) 당해 기부금 내역 정리       : 원본 → 공통 전처리 → 재원별 시트 (출연받은재산 정리 메뉴와 같은 결과)
+2) 출연받은재산보고 정리       : 1)의 시트 합계 (시트별 / 시트·부서별 건수·금액)
+3) 기부금지출명세서 정리       : 1)의 시트를 한 시트로 이어붙인 명세 (원본 열 + 시트 이름)
+4) 시트 배정·중복 점검         : 시트 미배정 행 / 여러 시트에 들어간 행 / 같은 내용 중복 행
+   (2)·3)은 1)의 시트를 더하고 이어붙인 것이라 1)과 다시 대조하지 않음)
+
+- 전처리/시트 구성은 donation_main_app 것을 그대로 사용 (prepare_donation_frame, DONATION_UNITS 의 split)
+- 원본에 없는 열은 만들지 않음: 부서(I열)/금액(L열)은 전처리 후 위치, 열 이름은 원본 헤더 그대로
+- 각 단계는 앞 단계의 DataFrame 을 메모리에서 바로 받음 (중간 엑셀 재업로드 없음)
+- 단계 결과는 (파일 내용 해시, 재원) 기준으로 result_cache 에 보관 → 뒤 단계만 다시 실행해도 앞 단계는 재파싱/재계산 없음
+- 처리는 서버 작업 스케줄러(jobs.run_admitted) 경유 (동시 실행 수 / 메모리 한도 초과 시 대기)
+"""
+from __future__ import annotations
+
+from io import BytesIO
+
+import pandas as pd
+import streamlit as st
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.utils import get_column_letter
+
+from excel.donation_main_app import (
+    DONATION_UNITS, SUM_AMOUNT_IDX, guess_unit, prepare_donation_frame, write_donation_workbook,
+)
+from excel.excel_io import content_hash, upload_bytes
+from excel.jobs import estimate_memory, run_admitted
+from excel.result_cache import cached_result
+
+STEP_KEY = "donation_step"
+STEPS = [
+    "1) 당해 기부금 내역 정리",
+    "2) 출연받은재산보고 정리",
+    "3) 기부금지출명세서 정리",
+    "4) 시트 배정·중복 점검",
+]
+
+DEPT_IDX = 8              # 전처리 후 I열 = 부서 (routing_config "donation_*" 와 같은 위치)
+SHEET_COL = "시트"         # 2)·3)에서 붙이는 결과 시트 이름 열
+AMOUNT_COLS = ("금액",)
+AMOUNT_FMT = "#,##0"
+MIN_WIDTH, MAX_WIDTH = 10, 50
+
+
+# =========================== 공통 유틸 ===========================
+def _display_len(v) -> int:
+    """열 너비 기준 글자 수 (숫자는 천단위 콤마 표시 기준)"""
+    if isinstance(v, (int, float)):
+        return len(f"{v:,.0f}")
+    return len(str(v))
+
+
+def _amount(df: pd.DataFrame) -> pd.Series:
+    """전처리된 시트의 금액(L열, 이미 숫자화)"""
+    return df.iloc[:, SUM_AMOUNT_IDX]
+
+
+def _stage(digest: str, unit: str, step: int, compute):
+    """단계 결과 보관 (파일 내용 해시 + 재원 + 단계)"""
+    return cached_result(("donation_report", digest, unit, step), compute)
+
+
+def frames_excel(frames: dict) -> bytes:
+    """{시트명: 요약 DataFrame} → xlsx bytes, write-only 1회 기록 (금액 열 #,##0, 틀고정, 열 너비)"""
+    wb = Workbook(write_only=True)
+    for name, df in frames.items():
+        ws = wb.create_sheet(name[:31])
+        ws.freeze_panes = "A2"
+        header = [str(c) for c in df.columns]
+        body = df.astype(object).where(df.notna(), None).values.tolist()
+        amount_idxs = {i for i, c in enumerate(header) if c in AMOUNT_COLS}
+
+        for ci in range(len(header)):
+            lens = [len(header[ci])] + [_display_len(row[ci]) for row in body if row[ci] is not None]
+            ws.column_dimensions[get_column_letter(ci + 1)].width = min(max(max(lens) + 2, MIN_WIDTH), MAX_WIDTH)
+
+        ws.append(header)
+        for row in body:
+            for ci in amount_idxs:
+                cell = WriteOnlyCell(ws, value=row[ci])
+                cell.number_format = AMOUNT_FMT
+                row[ci] = cell
+            ws.append(row)
+
+    out = BytesIO()
+    wb.save(out)
+    return out.getvalue()
+
+
+# =========================== 1) 당해 기부금 내역 정리 ===========================
+def step1_sheets(digest: str, unit: str, data: bytes, name: str) -> dict:
+    """
+    원본 → 공통 전처리 1회 → 재원별 시트
+    반환: {"sheets": {시트명: DataFrame},
+           "unassigned": 어느 시트에도 안 들어간 행, "multi": 두 시트 이상에 들어간 행,
+           "duplicates": 모든 열 값이 같은 행 (원본 중복 입력 의심)}
+    """
+    def compute():
+        f = BytesIO(data)
+        f.name = name
+        frame = prepare_donation_frame(f).reset_index(drop=True)
+        sheets = DONATION_UNITS[unit]["split"](frame)
+        placed = pd.Index([]).append([df.index for df in sheets.values()])
+        return {
+            "sheets": sheets,
+            "unassigned": frame[~frame.index.isin(placed)],
+            "multi": frame[frame.index.isin(placed[placed.duplicated()])],
+            "duplicates": frame[frame.duplicated(keep=False)],
+        }
+    return _stage(digest, unit, 1, compute)
+
+
+# =========================== 2) 출연받은재산보고 정리 ===========================
+def step2_report(digest: str, unit: str, s1: dict) -> dict:
+    """1)의 시트 → 시트별 합계 / 시트·부서별 합계 (부서 열 이름은 원본 헤더)"""
+    def compute():
+        by_sheet = pd.DataFrame(
+            [(name, len(df), _amount(df).sum()) for name, df in s1["sheets"].items()],
+            columns=[SHEET_COL, "건수", "금액"],
+        )
+        parts = []
+        for name, df in s1["sheets"].items():
+            if df.empty or df.shape[1] <= DEPT_IDX:
+                continue
+            dept = df.iloc[:, DEPT_IDX]
+            part = (
+                _amount(df).groupby(dept, sort=False)
+                .agg(건수="size", 금액="sum")
+                .rename_axis(df.columns[DEPT_IDX])
+                .reset_index()
+            )
+            part.insert(0, SHEET_COL, name)
+            parts.append(part)
+        by_dept = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=[SHEET_COL, "건수", "금액"])
+        return {"시트별": by_sheet, "부서별": by_dept}
+    return _stage(digest, unit, 2, compute)
+
+
+# =========================== 3) 기부금지출명세서 정리 ===========================
+def step3_statement(digest: str, unit: str, s1: dict) -> dict:
+    """1)의 시트 → 시트 순서대로 이어붙인 명세 1개 (원본 열 뒤에 시트 이름, L열 금액 위치 유지)"""
+    def compute():
+        parts = [df.assign(**{SHEET_COL: name}) for name, df in s1["sheets"].items() if not df.empty]
+        first = next(iter(s1["sheets"].values()))
+        statement = (
+            pd.concat(parts, ignore_index=True) if parts else first.assign(**{SHEET_COL: ""}).iloc[0:0]
+        )
+        return {"지출명세": statement}
+    return _stage(digest, unit, 3, compute)
+
+
+# =========================== 4) 시트 배정·중복 점검 ===========================
+def step4_verify(digest: str, unit: str, s1: dict) -> dict:
+    """전처리된 원본 행 기준: 시트 미배정 / 여러 시트 배정 / 같은 내용 중복 행 요약 + 해당 행"""
+    def compute():
+        checks = [
+            ("시트 미배정", s1["unassigned"]),
+            ("여러 시트에 배정", s1["multi"]),
+            ("같은 내용 중복 행", s1["duplicates"]),
+        ]
+        summary = pd.DataFrame(
+            [(label, len(df), _amount(df).sum()) for label, df in checks],
+            columns=["구분", "건수", "금액"],
+        )
+        summary["판정"] = summary["건수"].map(lambda n: "확인 필요" if n else "이상 없음")
+        return {
+            "점검요약": summary,
+            "시트미배정": s1["unassigned"],
+            "중복배정": s1["multi"],
+            "중복의심": s1["duplicates"],
+        }
+    return _stage(digest, unit, 4, compute)
+
+
+# =========================== 파이프라인 실행 ===========================
+def run_pipeline(step: int, unit: str, data: bytes, name: str) -> dict:
+    """
+    step 단계 결과 {시트명: DataFrame}.
+    앞 단계는 보관된 결과(파일 해시·재원 기준)가 있으면 그대로 받아 씀
+    """
+    digest = content_hash(data)
+    s1 = step1_sheets(digest, unit, data, name)
+    if step == 1:
+        return s1["sheets"]
+    if step == 2:
+        return step2_report(digest, unit, s1)
+    if step == 3:
+        return step3_statement(digest, unit, s1)
+    return step4_verify(digest, unit, s1)
+
+
+def step_excel(step: int, unit: str, frames: dict) -> bytes:
+    """단계 결과 → 엑셀 (1·3단계는 출연받은재산 정리와 같은 양식: L열 #,##0 + 합계 행)"""
+    if step == 1:
+        return write_donation_workbook(frames, center_a1=DONATION_UNITS[unit]["center_a1"])
+    if step == 3:
+        return write_donation_workbook(frames)
+    return frames_excel(frames)
+
+
+def report_job(step: int, unit: str, data: bytes, name: str) -> dict:
+    """스케줄러 작업: 단계 실행 + 결과 엑셀 작성까지"""
+    frames = run_pipeline(step, unit, data, name)
+    return {"frames": frames, "xlsx": step_excel(step, unit, frames)}
+
+
+# =========================== Streamlit 화면 ===========================
+def run():
+    st.title("🎁 출연받은재산 보고 작업")
+    st.write("단계를 순서대로 진행합니다. 앞 단계 결과는 메모리에 보관되어 다음 단계에서 파일 재업로드 없이 이어집니다.")
+
+    step_label = st.radio(
+        "작업 단계", STEPS, index=st.session_state.get(STEP_KEY, 1) - 1, horizontal=True,
+    )
+    step = STEPS.index(step_label) + 1
+    st.session_state[STEP_KEY] = step
+
+    up = st.file_uploader(
+        "출연받은재산 사용내역 (기본엑셀)", type=["xlsx", "xlsm", "xls"], key="donation_report_upload",
+    )
+    if not up:
+        st.info("파일을 업로드하세요.")
+        return
+
+    units = list(DONATION_UNITS)
+    unit = st.selectbox(
+        "재원", units, index=units.index(guess_unit(up.name)),
+        format_func=lambda u: DONATION_UNITS[u]["label"], key="donation_report_unit",
+    )
+
+    # 같은 파일 + 재원 + 단계면 재실행(다운로드 클릭 등) 시 이전 결과 재사용
+    data = upload_bytes(up)
+    try:
+        result = cached_result(
+            ("donation_report_out", content_hash(data), unit, step),
+            lambda: run_admitted(
+                "출연받은재산 보고", lambda report: report_job(step, unit, data, up.name),
+                cost=estimate_memory([up]),
+            ),
+        )
+    except ValueError as e:
+        st.error(str(e))
+        return
+
+    for name, df in result["frames"].items():
+        st.subheader(f"{name} ({len(df):,}행)")
+        st.dataframe(df.head(1000), use_container_width=True)
+
+    st.download_button(
+        f"📥 {step_label} 결과 다운로드",
+        data=result["xlsx"],
+        file_name=f"출연받은재산_{step}단계.xlsx",
+        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    )
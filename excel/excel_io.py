@@ -0,0 +1,287 @@
+# excel_io.py
+# -*- coding: utf-8 -*-
+"""
+엑셀 도구 공통 입력 레이어
+- .xlsx/.xlsm 은 pandas(openpyxl) 로 그대로 읽기
+- .xls 는 xlrd 로 바로 DataFrame 변환 (xlsx 변환 후 재업로드 불필요)
+- .xls 변환 결과는 파일 내용 해시 기준으로 메모리 캐시 (같은 파일 재실행 시 재파싱 없음)
+- 큰 파일은 iter_upload_rows 로 행 단위 스트리밍 (read-only, 전체 DOM 적재 없음)
+- read_upload_filtered: 고정 크기 묶음으로 읽으면서 도구별 필터를 바로 적용
+  (남는 행만 누적 → 메모리 사용량이 입력이 아니라 결과 크기에 비례)
+- parse_amounts: 금액 열(숫자/문자 혼재)을 열 단위로 한 번에 float 변환
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+import xlrd
+from openpyxl import load_workbook
+
+XLS_ENCODING = "cp949"
+CHUNK_ROWS = 20_000
+AMOUNT_PATTERN = r"[+-]?(?:\d+(?:\.\d*)?|\.\d+)"
+
+
+# =========================== 공통 유틸 ===========================
+def upload_bytes(uploaded_file) -> bytes:
+    """UploadedFile/BytesIO → bytes (읽은 뒤 포인터는 처음으로 되돌림)"""
+    uploaded_file.seek(0)
+    data = uploaded_file.read()
+    uploaded_file.seek(0)
+    return data
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha1(data).hexdigest()
+
+
+def is_xls(uploaded_file) -> bool:
+    name = getattr(uploaded_file, "name", "") or ""
+    return os.path.splitext(name)[1].lower() == ".xls"
+
+
+def _xls_value(cell, datemode):
+    """xlrd 셀 → 파이썬 값 (공란 None, 날짜 datetime, 정수형 float → int)"""
+    ctype = cell.ctype
+    if ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK):
+        return None
+    if ctype == xlrd.XL_CELL_DATE:
+        try:
+            return xlrd.xldate_as_datetime(cell.value, datemode)
+        except Exception:
+            return cell.value
+    if ctype == xlrd.XL_CELL_NUMBER:
+        v = cell.value
+        return int(v) if float(v).is_integer() else v
+    if ctype == xlrd.XL_CELL_BOOLEAN:
+        return bool(cell.value)
+    if ctype == xlrd.XL_CELL_ERROR:
+        return None
+    return cell.value
+
+
+# =========================== .xls 캐시 ===========================
+@st.cache_data(show_spinner=False, max_entries=16)
+def _xls_sheets(digest: str, _data: bytes) -> dict[str, pd.DataFrame]:
+    """
+    .xls 전체 시트를 헤더 없는 원본 DataFrame 으로 변환.
+    digest(내용 해시)만 캐시 키로 사용 (_data 는 해시 대상 제외)
+    """
+    book = xlrd.open_workbook(file_contents=_data, encoding_override=XLS_ENCODING)
+    sheets = {}
+    for sh in book.sheets():
+        rows = [
+            [_xls_value(c, book.datemode) for c in sh.row(r)]
+            for r in range(sh.nrows)
+        ]
+        sheets[sh.name] = pd.DataFrame(rows, dtype=object)
+    return sheets
+
+
+def read_xls_sheets(uploaded_file) -> dict[str, pd.DataFrame]:
+    """.xls 업로드 → {시트명: 헤더 없는 DataFrame} (내용 해시로 캐시)"""
+    data = upload_bytes(uploaded_file)
+    return _xls_sheets(content_hash(data), data)
+
+
+def _header_labels(values) -> list:
+    """pd.read_excel 과 같은 열 이름 (공란 → 'Unnamed: n', 중복 → '이름.1')"""
+    labels, seen = [], {}
+    for i, v in enumerate(values):
+        name = f"Unnamed: {i}" if v is None or v == "" else v
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        labels.append(name)
+    return labels
+
+
+def _apply_header(raw: pd.DataFrame, header) -> pd.DataFrame:
+    if header is None:
+        return raw.reset_index(drop=True)
+    if raw.empty or len(raw) <= header:
+        return pd.DataFrame()
+    body = raw.iloc[header + 1:].reset_index(drop=True)
+    body.columns = _header_labels(raw.iloc[header])
+    return body
+
+
+def _as_text(df: pd.DataFrame, na_filter: bool) -> pd.DataFrame:
+    """pd.read_excel(dtype=str) 와 같은 모양으로 문자열화"""
+    def conv(v):
+        if v is None:
+            return None if na_filter else ""
+        return str(v)
+    return df.apply(lambda col: col.map(conv))
+
+
+# =========================== 공개 API ===========================
+def read_upload(
+    uploaded_file,
+    sheet_name=0,
+    header=0,
+    dtype=None,
+    na_filter: bool = True,
+) -> pd.DataFrame:
+    """
+    업로드 파일(xlsx/xlsm/xls) 한 시트를 DataFrame 으로 읽기.
+    pd.read_excel 과 같은 인자 의미 (sheet_name: 번호 또는 이름, header: 행 번호 또는 None)
+    """
+    if not is_xls(uploaded_file):
+        uploaded_file.seek(0)
+        return pd.read_excel(
+            uploaded_file,
+            sheet_name=sheet_name,
+            header=header,
+            engine="openpyxl",
+            dtype=dtype,
+            na_filter=na_filter,
+            keep_default_na=na_filter,
+        )
+
+    sheets = read_xls_sheets(uploaded_file)
+    if isinstance(sheet_name, int):
+        raw = list(sheets.values())[sheet_name]
+    else:
+        raw = sheets[sheet_name]
+
+    df = _apply_header(raw, header)
+    if dtype is str:
+        df = _as_text(df, na_filter)
+    return df
+
+
+def iter_upload_rows(uploaded_file, sheet_index: int = 0):
+    """
+    업로드 파일 한 시트를 행 단위(값 tuple)로 스트리밍.
+    - xlsx/xlsm: openpyxl read-only + values_only (셀 객체를 만들지 않음)
+    - xls: 캐시된 xlrd 변환 결과를 행 단위로
+    """
+    if is_xls(uploaded_file):
+        raw = list(read_xls_sheets(uploaded_file).values())[sheet_index]
+        yield from raw.itertuples(index=False, name=None)
+        return
+
+    uploaded_file.seek(0)
+    wb = load_workbook(uploaded_file, read_only=True, data_only=True)
+    try:
+        yield from wb.worksheets[sheet_index].iter_rows(values_only=True)
+    finally:
+        wb.close()
+
+
+def read_upload_filtered(
+    uploaded_file,
+    keep=None,
+    header: int | None = 0,
+    usecols: list[int] | None = None,
+    chunk_rows: int = CHUNK_ROWS,
+) -> pd.DataFrame:
+    """
+    업로드 파일 첫 시트를 chunk_rows 행씩 스트리밍하며 필터링해 DataFrame 으로.
+    - keep(batch) → bool mask : 묶음(DataFrame, dtype=object, 전체 열)마다 남길 행 판정
+    - usecols : 남길 열 위치(0-based). 원본 열 수가 모자라면 ValueError
+    - header : 헤더 행 번호 또는 None (None 이면 열 이름은 0,1,2…)
+    끝부분의 빈 행은 버림 (pd.read_excel 과 동일)
+    """
+    rows = iter_upload_rows(uploaded_file)
+
+    columns = None
+    if header is not None:
+        for _ in range(header):
+            next(rows, None)
+        first = next(rows, None)
+        if first is None:
+            return pd.DataFrame()
+        columns = _header_labels(first)
+        if usecols is not None and len(columns) <= max(usecols):
+            raise ValueError("필요한 열이 부족합니다")
+
+    kept = []
+    offset = 0
+
+    def flush(batch_rows):
+        nonlocal offset
+        batch = pd.DataFrame(batch_rows, dtype=object)
+        if columns is not None:
+            width = len(columns)
+            batch = batch.reindex(columns=range(width))
+            batch.columns = columns
+        batch.index = pd.RangeIndex(offset, offset + len(batch))
+        offset += len(batch)
+
+        if usecols is not None and batch.shape[1] <= max(usecols):
+            raise ValueError("필요한 열이 부족합니다")
+        if keep is not None and len(batch):
+            batch = batch[keep(batch)]
+        if usecols is not None:
+            batch = batch.iloc[:, usecols]
+        if len(batch):
+            kept.append(batch)
+
+    # 중간의 빈 행은 유지하고 끝부분 빈 행만 버림 (pd.read_excel 과 동일)
+    buf, blanks = [], []
+    for row in rows:
+        if all(v is None or v == "" for v in row):
+            blanks.append(row)
+            continue
+        if blanks:
+            buf.extend(blanks)
+            blanks = []
+        buf.append(row)
+        if len(buf) >= chunk_rows:
+            flush(buf)
+            buf = []
+    if buf:
+        flush(buf)
+
+    if not kept:
+        empty_cols = columns if usecols is None or columns is None else [columns[i] for i in usecols]
+        return pd.DataFrame(columns=empty_cols, dtype=object)
+    return pd.concat(kept).reset_index(drop=True)
+
+
+# =========================== 금액 파싱 ===========================
+cell_type = np.frompyfunc(type, 1, 1)   # 셀별 파이썬 타입 (object 배열 → 타입 배열, 1·2차원 모두)
+
+
+def parse_amounts(s: pd.Series, strip: str = "") -> pd.Series:
+    """
+    금액 열 → float Series (같은 index, 변환 불가·공란은 NaN)
+    - 숫자 셀은 그대로 float (True/False 는 금액이 아니므로 NaN)
+    - 문자열: 전각 → 반각(NFKC), 콤마·공백 및 strip 문자 제거
+    - '(1,234)' 처럼 괄호로 감싼 값은 음수 (회계 표기)
+    - 남은 문자열이 숫자 형식('-12', '3.5')이 아니면 NaN ('1e3', 'inf' 등도 NaN)
+    - 셀 타입 판정부터 열 단위 연산 (셀마다 파이썬 함수를 부르지 않음)
+    """
+    if pd.api.types.is_bool_dtype(s):
+        return pd.Series(np.nan, index=s.index, dtype=float)
+    if pd.api.types.is_numeric_dtype(s):
+        return s.astype(float)
+
+    obj = s.astype(object)
+    kinds = pd.Series(cell_type(obj.to_numpy()), index=s.index)   # 셀별 타입 (numpy ufunc)
+    is_text = kinds.isin((str, np.str_))
+    is_bool = kinds.isin((bool, np.bool_))
+
+    # 문자열 아닌 셀: 숫자만 float (bool / 날짜 등은 NaN)
+    out = pd.to_numeric(obj.mask(is_text | is_bool), errors="coerce").astype(float)
+
+    text = obj[is_text].astype(str)
+    if text.empty:
+        return out
+    text = text.str.normalize("NFKC").str.replace(r"[\s,]", "", regex=True)
+    if strip:
+        text = text.str.replace(f"[{re.escape(strip)}]", "", regex=True)
+    neg = text.str.fullmatch(r"\(.+\)")
+    text = text.where(~neg, "-" + text.str[1:-1])
+    text = text.where(text.str.fullmatch(AMOUNT_PATTERN))
+    out[text.index] = pd.to_numeric(text, errors="coerce")
+    return out
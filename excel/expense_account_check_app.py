@@ -1,180 +1,129 @@
 # expense_account_check_app.py
 # -*- coding: utf-8 -*-
 
+from datetime import datetime
 from io import BytesIO
 
 import pandas as pd
 import streamlit as st
-from openpyxl import load_workbook
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.utils import get_column_letter
 
+from excel.excel_io import parse_amounts, read_upload_filtered
+from excel.jobs import (
+    detach_upload, estimate_memory, forget_job, progress_widgets, session_job, start_job, watch_job,
+)
+from excel.result_cache import cached_result, get_result, result_key
+from excel.routing import assign_routes, split_by_route
+from excel.schema import resolve, resolve_letters
+
 
 # ======================================================
-# V열 기준 시트 구성
+# V열(지출계좌) → 시트 규칙은 routing_config.ROUTES
+# ("expense_grad" / "expense_kyobi")
 # ======================================================
-GRAD_SHEETS = [
-    "대학원비등록금운영비",
-    "국제법률대학원",
-    "대학원기부금",
-    "대학원임의기금",
-    "아동양육",
-    "최고경영자",
-]
-
-GRAD_V_MAP = {
-    "대학원비등록금운영비": ["대학원비등록금운영비(하나17804)"],
-    "국제법률대학원": [
-        "국제법률대여장학금(하나56104)",
-        "국제법률장학금(하나55404)",
-        "국제법률기타수익(하나57704)",
-    ],
-    "대학원기부금": ["대학원기부금(하나58304)"],
-    "대학원임의기금": ["대학원임의기금지급(하나45704)"],
-    "아동양육": ["아동양육상담 부모콜센터_보탬e(농협7628-91)"],
-    "최고경영자": ["최고경영자(하나59004)"],
-}
-
-KYOBI_SHEETS = [
-    "비등록금운영비",
-    "지정기부금",
-    "임의기금지급",
-    "대학교회",
-    "기부부동산",
-    "교비일반장학",
-    "연구소기부금",
-    "제네시스랩",
-    "그외",
-]
-
-KYOBI_V_MAP = {
-    "비등록금운영비": ["비등록금운영비(하나20104)"],
-    "지정기부금": ["지정기부금(하나32104)"],
-    "임의기금지급": ["임의기금지급(하나50204)", "임의기금지급_감가상각(하나69104)"],
-    "대학교회": ["대학교회한국어(하나41404)"],
-    "기부부동산": ["기부부동산임대(하나59204)"],
-    "연구소기부금": ["연구소기부금(하나41104)"],
-    "제네시스랩": ["제네시스랩수입(하나57804)"],
-    "교비일반장학": [],
-}
+# 결과 시트에서 지우는 열 (기본 양식 열문자, 실제 위치는 schema.resolve_letters)
+DELETE_LETTERS = ["AA", "Z", "Y", "U", "P", "O", "M", "L", "K", "H", "G", "F"]
+
+AMOUNT_HEADERS = ["차변", "대변"]
+NUM_FMT = "#,##0"
+DATETIME_FMT = "YYYY-MM-DD HH:MM:SS"  # pd.ExcelWriter 기본 날짜 서식과 동일
 
 
 # ======================================================
 # 유틸
 # ======================================================
-def _safe_numeric(series: pd.Series) -> pd.Series:
-    return pd.to_numeric(
-        series.astype(str).str.replace(",", "", regex=False).str.strip(),
-        errors="coerce"
-    )
-
-
-def _excel_col_to_idx(letter: str) -> int:
-    n = 0
-    for ch in letter.upper():
-        n = n * 26 + (ord(ch) - ord("A") + 1)
-    return n - 1
+def _unpaid_row_mask(batch: pd.DataFrame) -> pd.Series:
+    """
+    '미지급금 + 차변0' 행만 남기는 필터 (읽는 단계에서 스트리밍 묶음별로 적용)
+    - 계정(기본 E열) / '차변' 열 위치는 schema "ledger_basic" (헤더 지문별 1회 해석)
+    - '차변' 열이 없거나 결과에서 삭제되는 위치면 필터하지 않고 전부 남김
+    """
+    layout = resolve("ledger_basic", list(batch.columns))
+    cols = layout["cols"]
+    deleted = set(resolve_letters(layout, DELETE_LETTERS))
+    debit, account = cols["debit"], cols["account"]
+    mask = pd.Series(True, index=batch.index)
+    if debit is not None and debit not in deleted and account < batch.shape[1]:
+        e_txt = batch.iloc[:, account].map(lambda v: "" if v is None else str(v).strip())
+        mask &= e_txt.eq("미지급금") & parse_amounts(batch.iloc[:, debit]).eq(0)
+    return mask
 
 
 # ======================================================
-# 공통 후처리 (속도 최적화 핵심)
+# 공통: DataFrame 단계 정리 + 1회 기록 (속도 최적화 핵심)
 # ======================================================
-def _postprocess_workbook(
-    wb,
-    delete_letters,
-    widths,
-    status_text=None,
-    progress=None,
-    do_filter=True,
-):
-    delete_idxs = sorted([_excel_col_to_idx(l) + 1 for l in delete_letters], reverse=True)
-    total_ws = len(wb.worksheets)
-
-    for wi, ws in enumerate(wb.worksheets, start=1):
+def _prepare_sheet(sub: pd.DataFrame) -> pd.DataFrame:
+    """
+    시트 1개 정리 (기록 전)
+    - 차변/대변 숫자화
+    - 결과 열 삭제 (DELETE_LETTERS, 열이 밀린 양식은 schema.resolve_letters 로 따라감)
+    미지급금 + 차변0 조건은 읽는 단계(_unpaid_row_mask)에서 이미 적용됨
+    """
+    sub = sub.copy()
+    for c in AMOUNT_HEADERS:
+        if c in sub.columns:
+            sub[c] = parse_amounts(sub[c])
+    deleted = set(resolve_letters(resolve("ledger_basic", list(sub.columns)), DELETE_LETTERS))
+    return sub.iloc[:, [i for i in range(sub.shape[1]) if i not in deleted]]
+
+
+def _write_sheets(sheets: dict, widths, status_text=None, progress=None) -> BytesIO:
+    """{시트명: 정리된 DataFrame} → xlsx, write-only 1회 기록 (열 너비 + 차변/대변 #,##0)"""
+    wb = Workbook(write_only=True)
+    total_ws = len(sheets)
+
+    for wi, (name, df) in enumerate(sheets.items(), start=1):
         if status_text:
-            status_text.text(f"📐 결과 서식 적용 중... ({wi}/{total_ws})")
+            status_text.text(f"📐 결과 엑셀 작성 중... ({wi}/{total_ws})")
         if progress:
             progress.progress(85 + int((wi / total_ws) * 14))
 
-        # 1) 열 삭제
-        for idx in delete_idxs:
-            if idx <= ws.max_column:
-                ws.delete_cols(idx)
-
-        # 2) 미지급금 + 차변0 필터
-        if do_filter and ws.max_row >= 2:
-            header = [ws.cell(row=1, column=c).value for c in range(1, ws.max_column + 1)]
-            header_txt = [("" if v is None else str(v).strip()) for v in header]
-
-            if "차변" not in header_txt:
-                continue
-
-            debit_col = header_txt.index("차변") + 1
-            kept_rows = []
-
-            for row in ws.iter_rows(min_row=2, values_only=True):
-                e_val = "" if row[4] is None else str(row[4]).strip()
-                if e_val != "미지급금":
-                    continue
-                try:
-                    if float(row[debit_col - 1]) != 0:
-                        continue
-                except Exception:
-                    continue
-                kept_rows.append(row)
-
-            ws.delete_rows(2, ws.max_row)
-            for r in kept_rows:
-                ws.append(r)
-
-        # 3) 열 너비
+        ws = wb.create_sheet(name)
         for i, w in enumerate(widths, start=1):
             ws.column_dimensions[get_column_letter(i)].width = w
 
-        # 4) 숫자 서식
-        header = [ws.cell(row=1, column=c).value for c in range(1, ws.max_column + 1)]
-        header_txt = [("" if v is None else str(v).strip()) for v in header]
-
-        for target in ["차변", "대변"]:
-            if target in header_txt:
-                col = header_txt.index(target) + 1
-                for r in range(2, ws.max_row + 1):
-                    cell = ws.cell(row=r, column=col)
-                    if isinstance(cell.value, (int, float)):
-                        cell.number_format = "#,##0"
+        header = list(df.columns)
+        header_txt = [str(v).strip() for v in header]
+        amount_idxs = {header_txt.index(t) for t in AMOUNT_HEADERS if t in header_txt}
+
+        ws.append(header)
+        for row in df.astype(object).where(df.notna(), None).values.tolist():
+            for ci, v in enumerate(row):
+                if ci in amount_idxs and isinstance(v, (int, float)):
+                    cell = WriteOnlyCell(ws, value=v)
+                    cell.number_format = NUM_FMT
+                    row[ci] = cell
+                elif isinstance(v, datetime):
+                    cell = WriteOnlyCell(ws, value=v)
+                    cell.number_format = DATETIME_FMT
+                    row[ci] = cell
+            ws.append(row)
+
+    out = BytesIO()
+    wb.save(out)
+    out.seek(0)
+    return out
 
 
 # ======================================================
 # 대학원 처리
 # ======================================================
 def build_grad_excel_by_v(uploaded_file, progress, status_text):
-    df = pd.read_excel(uploaded_file, sheet_name=0, dtype=object)
-    v_series = df.iloc[:, 21].astype(str).str.strip()
-
-    out_buf = BytesIO()
-    with pd.ExcelWriter(out_buf, engine="openpyxl") as writer:
-        for s in GRAD_SHEETS:
-            mask = v_series.isin(GRAD_V_MAP.get(s, []))
-            sub = df.loc[mask].copy()
-
-            for c in ["차변", "대변"]:
-                if c in sub.columns:
-                    sub.loc[:, c] = _safe_numeric(sub[c])
-            sub.to_excel(writer, sheet_name=s, index=False)
-
-    out_buf.seek(0)
-    wb = load_workbook(out_buf)
-
-    _postprocess_workbook(
-        wb,
-        delete_letters=["AA", "Z", "Y", "U", "P", "O", "M", "L", "K", "H", "G", "F"],
+    # 대학원 지출계좌가 아닌 행은 읽는 단계에서 제외
+    df = read_upload_filtered(
+        uploaded_file,
+        keep=lambda b: _unpaid_row_mask(b) & assign_routes(b, "expense_grad").notna(),
+    )
+    sheets = {s: _prepare_sheet(part) for s, part in split_by_route(df, "expense_grad").items()}
+
+    final = _write_sheets(
+        sheets,
         widths=[5.75,14.5,8.63,12.38,9.5,10.13,17,8.63,14,10.75,10.75,17,30,33,27.3],
         status_text=status_text,
         progress=progress,
     )
-
-    final = BytesIO()
-    wb.save(final)
-    final.seek(0)
     progress.progress(100)
     return final
 
@@ -183,49 +132,27 @@ def build_grad_excel_by_v(uploaded_file, progress, status_text):
 # 교비 처리
 # ======================================================
 def build_kyobi_excel_by_v(uploaded_file, progress, status_text):
-    df = pd.read_excel(uploaded_file, sheet_name=0, dtype=object)
-    v_series = df.iloc[:, 21].astype(str).str.strip()
-
-    out_buf = BytesIO()
-    used = pd.Series(False, index=df.index)
-
-    with pd.ExcelWriter(out_buf, engine="openpyxl") as writer:
-        for s in KYOBI_SHEETS:
-            if s == "그외":
-                continue
-            targets = KYOBI_V_MAP.get(s, [])
-            mask = v_series.isin(targets)
-            used |= mask
-            sub = df.loc[mask].copy()
-            for c in ["차변", "대변"]:
-                if c in sub.columns:
-                    sub.loc[:, c] = _safe_numeric(sub[c])
-            sub.to_excel(writer, sheet_name=s, index=False)
-
-        other = df.loc[~used].copy()
-        for c in ["차변", "대변"]:
-            if c in other.columns:
-                other.loc[:, c] = _safe_numeric(other[c])
-        other.to_excel(writer, sheet_name="그외", index=False)
-
-    out_buf.seek(0)
-    wb = load_workbook(out_buf)
-
-    _postprocess_workbook(
-        wb,
-        delete_letters=["AA", "Z", "Y", "U", "P", "O", "M", "L", "K", "H", "G", "F"],
+    # '그외' 시트가 나머지 V값을 모두 받으므로 V열 조건 없이 미지급금 조건만
+    df = read_upload_filtered(uploaded_file, keep=_unpaid_row_mask)
+    sheets = {s: _prepare_sheet(part) for s, part in split_by_route(df, "expense_kyobi").items()}
+
+    final = _write_sheets(
+        sheets,
         widths=[5.75,14.5,8.63,12.38,9.5,10.13,17,8.63,10.5,10.75,10.75,23,30,33,22],
         status_text=status_text,
         progress=progress,
     )
-
-    final = BytesIO()
-    wb.save(final)
-    final.seek(0)
     progress.progress(100)
     return final
 
 
+def expense_job(report, key, up, mode):
+    """백그라운드 작업: 회계단위별 처리 (결과는 결과 캐시에도 보관)"""
+    progress, status = progress_widgets(report)
+    build = build_kyobi_excel_by_v if mode == "교비비등록금" else build_grad_excel_by_v
+    return cached_result(key, lambda: build(up, progress, status))
+
+
 # ======================================================
 # UI
 # ======================================================
@@ -233,7 +160,7 @@ def run():
     st.title("🧾 지출계좌 재원 검증")
 
     st.markdown("""
-        - 지원 형식: XLSX, XLSM  
+        - 지원 형식: XLSX, XLSM, XLS  
 
         1. 회계-장부관리-원장 엑셀자료 메뉴 클릭
         2. 회계단위를 조회하여 우클릭 후 *기본엑셀*로 저장(엑셀파일x)  
@@ -245,18 +172,39 @@ def run():
 
     mode = st.radio("회계단위 선택", ["교비비등록금", "대학원비등록금"])
 
-    up = st.file_uploader("원본 파일 업로드", type=["xlsx", "xlsm"])
+    up = st.file_uploader("원본 파일 업로드", type=["xlsx", "xlsm", "xls"])
     if not up:
         return
 
-    progress = st.progress(0)
-    status = st.empty()
-
-    if mode == "교비비등록금":
-        result = build_kyobi_excel_by_v(up, progress, status)
-        name = "지출계좌_검증결과_교비.xlsx"
-    else:
-        result = build_grad_excel_by_v(up, progress, status)
-        name = "지출계좌_검증결과_대학원.xlsx"
+    name = "지출계좌_검증결과_교비.xlsx" if mode == "교비비등록금" else "지출계좌_검증결과_대학원.xlsx"
+
+    # 같은 파일 + 같은 회계단위면 재실행(다운로드 클릭 등) 시 이전 결과 재사용
+    # 처음이면 백그라운드 작업으로 (화면은 진행률만 다시 그림)
+    key = result_key("expense_account_check", [up], {"mode": mode})
+    job_key = f"expense_account_check:{key}"
+    job = session_job(job_key)
+    if job is None:   # 처음이거나, 거절/오류를 알린 뒤 연결을 끊은 작업 → 다시 신청
+        result = get_result(key)
+        if result is not None:
+            st.progress(100, text="✅ 이전 결과 재사용")
+            st.download_button("📥 결과 다운로드", result, file_name=name)
+            return
+        job = start_job(
+            job_key, f"지출계좌 재원 검증 ({mode})", expense_job, key, detach_upload(up), mode,
+            cost=estimate_memory([up]),
+        )
+
+    if job["status"] == "rejected":
+        forget_job(job_key)
+        st.error(f"⛔ {job['message']}")
+        return
+    if job["status"] == "error":
+        forget_job(job_key)
+        st.exception(job["error"])
+        return
+    if job["status"] != "done":
+        watch_job(job)
+        return
 
-    st.download_button("📥 결과 다운로드", result, file_name=name)
+    st.progress(100, text="✅ 완료")
+    st.download_button("📥 결과 다운로드", job["result"], file_name=name)
@@ -2,38 +2,43 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
 
+from datetime import datetime
 from io import BytesIO
-import re
 import pandas as pd
 import streamlit as st
-from openpyxl import load_workbook
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.utils import get_column_letter
 
+from excel.excel_io import parse_amounts, read_upload_filtered
+from excel.jobs import (
+    detach_upload, estimate_memory, forget_job, progress_widgets, session_job, start_job, watch_job,
+)
+from excel.result_cache import cached_result, get_result, result_key
+from excel.routing import assign_routes
+from excel.schema import resolve, resolve_letters
+
 
 # -----------------------------
 # 설정값 (VBA 로직 그대로)
+# X열 → 연구/장학/건축/특목 분류 규칙은 routing_config.ROUTES["fund"]
+# 계정(E)/임의기금(X)/재원 열 위치는 schema.SCHEMAS["ledger_basic"]
 # -----------------------------
-PATTERNS = {
-    "연구기금": r"^\(임의_연구\)",
-    "장학기금": r"^\(임의_장학\)",
-    "건축기금": r"^\(임의_건축\)",
-    "특목기금": r"^\(임의_기타\)",
-}
-
 DROP_E_VALUES = {
     "미지급금", "미수금", "임의연구기금", "임의건축기금", "예금이자", "예금",
     "임의장학기금", "임의특정목적기금"
 }
 
-# VBA에서 지우던 열(열문자 기준). 파이썬에서는 “열문자→인덱스”로 드롭
+# VBA에서 지우던 열(기본 양식 열문자). 열이 밀린 양식은 schema.resolve_letters 로 실제 위치를 찾아 드롭
 DROP_COL_LETTERS = ["H", "K", "L", "M", "O", "P", "U", "Y", "Z", "AA"]
 
-# VBA에서 정렬 기준: Q열(=재원). 파이썬은 헤더 "재원" 우선, 없으면 Q fallback
-SORT_HEADER = "재원"
-SORT_FALLBACK_LETTER = "Q"
+# VBA에서 정렬 기준: Q열(=재원, 열 삭제 전 X열). 파이썬은 헤더 "재원" 우선 (schema 역할 source)
 
 # VBA에서 숫자 변환/서식: L, M
 NUM_COL_LETTERS = ["L", "M"]
+NUM_FMT = "#,##0"
+DATETIME_FMT = "YYYY-MM-DD HH:MM:SS"  # pd.ExcelWriter 기본 날짜 서식과 동일
+MIN_WIDTH, MAX_WIDTH = 10, 70
 
 
 # -----------------------------
@@ -48,65 +53,36 @@ def col_letter_to_index(letter: str) -> int:
     return n - 1
 
 
-def safe_strip(v) -> str:
-    if v is None:
-        return ""
-    return str(v).strip()
-
-
-def try_parse_number(x):
-    """문자열 '1,234' -> 1234"""
-    if x is None:
-        return x
-    if isinstance(x, (int, float)):
-        return x
-    s = str(x).strip().replace(",", "")
-    if s == "":
-        return None
-    try:
-        if re.fullmatch(r"-?\d+(\.\d+)?", s):
-            return float(s)
-    except Exception:
-        pass
-    return x
-
-
-def autofit_openpyxl(ws):
+def convert_amount_cols(df: pd.DataFrame) -> pd.DataFrame:
     """
-    헤더 + 데이터 전체 기준으로 열 너비 자동 조정
-    (글자 안 잘리게, 과도하게 넓어지지 않게 제한)
+    L/M열(결과 시트 기준) 숫자화: '1,234' -> 1234
+    숫자가 아닌 글자는 그대로, 공란은 빈칸
     """
-    for col in range(1, ws.max_column + 1):
-        col_letter = get_column_letter(col)
-        max_len = 0
-
-        for row in range(1, ws.max_row + 1):
-            cell = ws.cell(row, col)
-            v = cell.value
-            if v is None:
-                continue
-
-            # 숫자는 표시 문자열 길이 기준
-            if isinstance(v, (int, float)):
-                s = f"{v:,.0f}"
-            else:
-                s = str(v)
+    df = df.copy()
+    for letter in NUM_COL_LETTERS:
+        idx = col_letter_to_index(letter)
+        if idx >= df.shape[1]:
+            continue
+        col = df.iloc[:, idx]
+        num = parse_amounts(col)
+        keep_text = num.isna() & col.notna() & col.astype(str).str.strip().ne("")
+        df.isetitem(idx, num.astype(object).where(num.notna(), col.where(keep_text, None)))
+    return df
 
-            max_len = max(max_len, len(s))
 
-        # 최소/최대 폭 가드
-        ws.column_dimensions[col_letter].width = min(max(max_len + 2, 10), 70)
+def _display_len(v) -> int:
+    """AutoFit 기준 글자 수 (숫자는 천단위 콤마 표시 기준)"""
+    if isinstance(v, (int, float)):
+        return len(f"{v:,.0f}")
+    return len(str(v))
 
 
-def apply_number_format(ws, col_letters):
-    for letter in col_letters:
-        idx = col_letter_to_index(letter) + 1
-        if idx > ws.max_column:
-            continue
-        for r in range(2, ws.max_row + 1):
-            cell = ws.cell(r, idx)
-            cell.value = try_parse_number(cell.value)
-            cell.number_format = "#,##0"
+def fund_row_mask(batch: pd.DataFrame) -> pd.Series:
+    """스트리밍 묶음별 1차 필터: X열이 임의기금 4종 중 하나인 행만 남김"""
+    x_idx = resolve("ledger_basic", list(batch.columns))["cols"]["fund"]
+    if x_idx >= batch.shape[1]:
+        return pd.Series(False, index=batch.index)
+    return assign_routes(batch, "fund").notna()
 
 
 # -----------------------------
@@ -114,76 +90,110 @@ def apply_number_format(ws, col_letters):
 # -----------------------------
 def split_and_cleanup(df: pd.DataFrame) -> dict[str, pd.DataFrame]:
     """
-    1) X열(0-based 23) 기준 (임의_연구/장학/건축/기타) 분류
-    2) 열 삭제(H,K,L,M,O,P,U,Y,Z,AA)
-    3) E열 값 특정 항목 제거
-    4) 재원 정렬(헤더 '재원' 우선, 없으면 Q열)
+    1) X열(0-based 23) 기준 (임의_연구/장학/건축/기타) 분류 → 기금 구분 categorical (결합 정규식 1회)
+    2) E열 값 특정 항목 제거
+    3) 열 삭제(H,K,L,M,O,P,U,Y,Z,AA)
+    4) 재원 정렬(헤더 '재원' 우선, 없거나 삭제되는 열이면 Q열 = 원본 X열)
+    2)~4) 는 분류된 전체 행에 1회만 적용한 뒤 기금별로 나눔 (안정 정렬이라 시트별 정렬과 같은 순서)
+    열 위치는 헤더 지문별로 한 번만 해석 (schema "ledger_basic")
     """
+    layout = resolve("ledger_basic", list(df.columns))
+    cols = layout["cols"]
+
     # X열 존재 확인
-    x_idx = col_letter_to_index("X")
+    x_idx = cols["fund"]
     if x_idx >= len(df.columns):
         raise ValueError("원본에 X열이 없습니다. 원장 기본엑셀 형식인지 확인하세요.")
 
-    x_series = df.iloc[:, x_idx].map(safe_strip)
+    # 1) 분류
+    fund = assign_routes(df, "fund")
+    one = df[fund.notna()]
 
-    # 분류
-    out = {}
-    for sheet_name, pat in PATTERNS.items():
-        mask = x_series.str.contains(pat, regex=True, na=False)
-        out[sheet_name] = df.loc[mask].copy()
+    # 2) E열 특정값 제거
+    e_idx = cols["account"]
+    if e_idx < len(one.columns):
+        one = one[~one.iloc[:, e_idx].astype(str).isin(DROP_E_VALUES)]
 
-    # 공통 정리 함수
-    def cleanup(one: pd.DataFrame) -> pd.DataFrame:
-        # E열 특정값 제거
-        e_idx = col_letter_to_index("E")
-        if e_idx < len(one.columns):
-            e_series = one.iloc[:, e_idx].astype(str)
-            one = one[~e_series.isin(DROP_E_VALUES)].copy()
+    # 4) 재원 기준 정렬 (안정 정렬이라 열 삭제 전에 원본 위치로 정렬해도 같은 결과)
+    drop_idxs = set(resolve_letters(layout, DROP_COL_LETTERS))
+    sort_idx = cols["source"] if cols["source"] is not None and cols["source"] not in drop_idxs else x_idx
+    if sort_idx < len(one.columns):
+        order = one.iloc[:, sort_idx].sort_values(ascending=True, kind="mergesort")
+        one = one.loc[order.index]
 
-        # 열 삭제(열문자 기준 인덱스 드롭)
-        drop_idxs = sorted(
-            [col_letter_to_index(c) for c in DROP_COL_LETTERS if col_letter_to_index(c) < len(one.columns)],
-            reverse=True
-        )
-        cols = list(one.columns)
-        for di in drop_idxs:
-            cols.pop(di)
-        one = one.loc[:, cols]
+    # 3) 열 삭제(열문자 기준 위치 드롭)
+    one = one.iloc[:, [i for i in range(one.shape[1]) if i not in drop_idxs]]
 
-        # 재원 기준 정렬
-        if SORT_HEADER in one.columns:
-            one = one.sort_values(by=SORT_HEADER, ascending=True, kind="mergesort")
-        else:
-            q_idx = col_letter_to_index(SORT_FALLBACK_LETTER)
-            if q_idx < len(one.columns):
-                one = one.sort_values(by=one.columns[q_idx], ascending=True, kind="mergesort")
+    # 기금별 분리 (범주 순서 = 시트 순서, 행이 없는 기금도 빈 시트)
+    groups = dict(tuple(one.groupby(fund.loc[one.index], observed=True, sort=False)))
+    return {name: groups.get(name, one.iloc[0:0]) for name in fund.cat.categories}
 
-        return one
 
-    for k in list(out.keys()):
-        out[k] = cleanup(out[k])
+def build_excel_bytes(sheets: dict[str, pd.DataFrame]) -> bytes:
+    """
+    시트별 L/M열 숫자화 후 write-only 로 1회 기록
+    - L/M열 #,##0, 열 너비는 헤더 + 데이터 전체 기준 (10~70)
+    """
+    wb = Workbook(write_only=True)
+    num_idxs = [col_letter_to_index(c) for c in NUM_COL_LETTERS]
+
+    for name, data in sheets.items():
+        data = convert_amount_cols(data)
+        ws = wb.create_sheet(name)
+
+        header = list(data.columns)
+        body = data.astype(object).where(data.notna(), None).values.tolist()
+
+        # 열 너비 (write-only 는 행보다 먼저)
+        for ci in range(len(header)):
+            lens = [_display_len(v) for v in [header[ci], *(row[ci] for row in body)] if v is not None]
+            width = min(max(max(lens, default=0) + 2, MIN_WIDTH), MAX_WIDTH)
+            ws.column_dimensions[get_column_letter(ci + 1)].width = width
+
+        ws.append(header)
+        for row in body:
+            for ci, v in enumerate(row):
+                if ci in num_idxs:
+                    cell = WriteOnlyCell(ws, value=v)
+                    cell.number_format = NUM_FMT
+                    row[ci] = cell
+                elif isinstance(v, datetime):
+                    cell = WriteOnlyCell(ws, value=v)
+                    cell.number_format = DATETIME_FMT
+                    row[ci] = cell
+            ws.append(row)
 
-    return out
+    out = BytesIO()
+    wb.save(out)
+    return out.getvalue()
 
 
-def build_excel_bytes(sheets: dict[str, pd.DataFrame]) -> bytes:
-    bio = BytesIO()
-    with pd.ExcelWriter(bio, engine="openpyxl") as writer:
-        for name, data in sheets.items():
-            data.to_excel(writer, sheet_name=name, index=False)
-    bio.seek(0)
+def build_fund_result(up, prog=None, status=None) -> tuple[dict, bytes]:
+    """업로드 파일 → (기금별 건수, 결과 엑셀 bytes)"""
+    if status:
+        status.write("📥 파일 읽는 중 (임의기금 행만 추려서)...")
+    df = read_upload_filtered(up, keep=fund_row_mask)
+    if prog:
+        prog.progress(20)
 
-    wb = load_workbook(bio)
+    if status:
+        status.write("🧠 X열 기준 분류 + 정리(열삭제/행삭제/정렬) 중...")
+    sheets = split_and_cleanup(df)
+    if prog:
+        prog.progress(70)
 
-    # ✅ 여기: 모든 시트를 돌면서 숫자서식 + AutoFit
-    for ws in wb.worksheets:
-        apply_number_format(ws, NUM_COL_LETTERS)
-        autofit_openpyxl(ws)
+    if status:
+        status.write("📦 결과 엑셀 생성(서식/AutoFit 포함) 중...")
+    out_bytes = build_excel_bytes(sheets)
+    if prog:
+        prog.progress(95)
+    return {k: len(v) for k, v in sheets.items()}, out_bytes
 
-    out = BytesIO()
-    wb.save(out)
-    out.seek(0)
-    return out.read()
+
+def fund_job(report, key, up):
+    """백그라운드 작업: 분류 + 결과 엑셀 (결과는 결과 캐시에도 보관)"""
+    prog, status = progress_widgets(report)
+    return cached_result(key, lambda: build_fund_result(up, prog, status))
 
 # -----------------------------
 # Streamlit 페이지
@@ -193,7 +203,7 @@ def run():
     st.write("원장 기본엑셀 파일을 업로드하면 4개 시트(연구/장학/건축/특목)로 분류해 새 엑셀을 만들어줍니다.")
 
     st.markdown("""
-        - 지원 형식: XLSX, XLSM  
+        - 지원 형식: XLSX, XLSM, XLS  
 
         1. 회계-장부관리-원장 엑셀자료 메뉴 클릭  
         2. 교비비등록금 회계단위를 조회하여 우클릭 후 *기본엑셀*로 저장(엑셀파일x)  
@@ -202,41 +212,48 @@ def run():
         - 오류 시: 파일명/헤더 행/빈 행 여부를 확인
         """)
 
-    up = st.file_uploader("원본 파일 업로드 (.xlsx/.xlsm)", type=["xlsx", "xlsm"])
+    up = st.file_uploader("원본 파일 업로드 (.xlsx/.xlsm/.xls)", type=["xlsx", "xlsm", "xls"])
     if not up:
         st.stop()
 
+    # 같은 파일이면 재실행(다운로드 클릭 등) 시 이전 결과 재사용
+    # 처음이면 백그라운드 작업으로 (화면은 진행률만 다시 그림)
+    key = result_key("fundcheck", [up])
+    job_key = f"fundcheck:{key}"
+    job = session_job(job_key)
+    result, done_text = get_result(key), "✅ 완료! (이전 결과 재사용)"
+    if result is None and job is None:   # 처음이거나, 거절/오류를 알린 뒤 연결을 끊은 작업 → 다시 신청
+        job = start_job(job_key, "기금재원정리", fund_job, key, detach_upload(up), cost=estimate_memory([up]))
+    if job is not None:
+        if job["status"] == "rejected":
+            forget_job(job_key)
+            st.error(f"⛔ {job['message']}")
+            return
+        if job["status"] not in ("done", "error"):
+            watch_job(job)
+            return
+        result, done_text = job["result"], "✅ 완료!"
+
     prog = st.progress(0)
     status = st.empty()
 
-    try:
-        status.write("📥 파일 읽는 중...")
-        df = pd.read_excel(up, sheet_name=0, dtype=object)
-        prog.progress(20)
-
-        status.write("🧠 X열 기준 분류 + 정리(열삭제/행삭제/정렬) 중...")
-        sheets = split_and_cleanup(df)
-        prog.progress(70)
-
-        status.write("📦 결과 엑셀 생성(서식/AutoFit 포함) 중...")
-        out_bytes = build_excel_bytes(sheets)
-        prog.progress(95)
-
-        status.write("✅ 완료!")
-        prog.progress(100)
-
-        # 화면에는 결과 표를 안 보여주고 요약만
-        counts = {k: len(v) for k, v in sheets.items()}
-        st.info(f"분류 결과: 연구 {counts['연구기금']:,}건 / 장학 {counts['장학기금']:,}건 / 건축 {counts['건축기금']:,}건 / 특목 {counts['특목기금']:,}건")
-
-        st.download_button(
-            "📥 분류 결과 엑셀 다운로드",
-            data=out_bytes,
-            file_name="기금재원정리_결과.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        )
-
-    except Exception as e:
+    if job is not None and job["status"] == "error":
+        forget_job(job_key)
         prog.progress(100)
         status.write("❌ 오류 발생")
-        st.exception(e)
+        st.exception(job["error"])
+        return
+
+    counts, out_bytes = result
+    status.write(done_text)
+    prog.progress(100)
+
+    # 화면에는 결과 표를 안 보여주고 요약만
+    st.info(f"분류 결과: 연구 {counts['연구기금']:,}건 / 장학 {counts['장학기금']:,}건 / 건축 {counts['건축기금']:,}건 / 특목 {counts['특목기금']:,}건")
+
+    st.download_button(
+        "📥 분류 결과 엑셀 다운로드",
+        data=out_bytes,
+        file_name="기금재원정리_결과.xlsx",
+        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    )
@@ -0,0 +1,334 @@
+# jobs.py
+# -*- coding: utf-8 -*-
+"""
+오래 걸리는 엑셀 작업 백그라운드 실행 + 서버 전체 작업 스케줄러
+- 도구는 작업 함수를 제출하고 작업 id 를 받음 (스레드 풀에서 실행 → 화면이 멈추지 않음)
+- 허용 제어: 동시 실행 수(MAX_RUNNING_JOBS) + 메모리 예산(MEMORY_BUDGET_BYTES)
+  · 작업마다 업로드 크기로 메모리 사용량 추정 (estimate_memory)
+  · 예산/동시 실행 수를 넘으면 대기열(먼저 온 순서), 화면에 대기 순번 표시
+  · 혼자서도 예산을 넘는 작업, 대기열이 가득 찬 경우는 바로 거절
+- 화면에서 바로 결과가 필요한 도구는 run_admitted 로 같은 대기열을 거쳐 실행
+- 파일별 병렬 처리는 서버 전체 공용 프로세스 풀(process_pool) 하나를 나눠 씀
+  → 동시에 도는 작업이 여럿이어도 작업자 프로세스는 PROCESS_WORKERS 개 이하
+- 진행률은 작업 함수가 report(pct, message) 로 알리고, 화면은 짧은 주기로 다시 그려 st.progress 로 표시
+- 세션에는 {작업 키: 작업 id} 만 보관 → 다른 메뉴로 갔다 와도 작업/결과가 그대로
+- 끝난 작업 결과는 메모리에만 보관, 합계 FINISHED_BUDGET_BYTES 를 넘으면 오래된 것부터 버림
+  (run_admitted 결과는 넘겨받는 즉시 보관 목록에서 뺌)
+- 오류/거절된 작업은 화면에 한 번 알린 뒤 세션 연결을 끊음 (forget_job) → 다음 실행 때 다시 신청
+- 작업 함수 안에서는 st.* 를 부르지 않음 (화면 표시는 결과를 받은 페이지에서)
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from io import BytesIO
+from multiprocessing import get_context
+from types import SimpleNamespace
+
+import streamlit as st
+
+from excel.excel_io import is_xls, upload_bytes
+from excel.result_cache import result_size
+
+MAX_RUNNING_JOBS = 2                       # 동시에 실행하는 무거운 작업 수
+MEMORY_BUDGET_BYTES = 2 * 1024 ** 3        # 실행 중 작업 추정 메모리 합계 한도
+MAX_QUEUED_JOBS = 8                        # 대기열 길이 한도 (넘으면 거절)
+XLSX_MEMORY_FACTOR = 15                    # 압축된 xlsx/xlsm → 메모리 배수 (DataFrame + 결과 워크북)
+XLS_MEMORY_FACTOR = 5                      # xls(비압축) → 메모리 배수
+PROCESS_WORKERS = os.cpu_count() or 1      # 공용 프로세스 풀 크기 (모든 작업 합계)
+POLL_SECONDS = 0.5       # 진행률 다시 그리는 주기
+FINISHED_BUDGET_BYTES = 512 * 1024 ** 2   # 끝난 작업 결과 보관 한도 (전체)
+JOB_ENTRY_BYTES = 4 * 1024                 # 작업 1건 기본 보관 크기 (상태/오류 정보, 결과 없는 작업도 한도에 포함)
+JOBS_KEY = "excel_jobs"  # 세션: {작업 키: 작업 id}
+FINISHED = ("done", "error", "rejected")
+
+_POOL = ThreadPoolExecutor(max_workers=MAX_RUNNING_JOBS, thread_name_prefix="excel-job")
+_JOBS: dict[str, dict] = {}
+_QUEUE: list[str] = []   # 대기 중 작업 id (먼저 온 순서)
+_LOCK = threading.Lock()
+_IN_USE = 0              # 실행 중 작업 추정 메모리 합계
+_PROCS: ProcessPoolExecutor | None = None   # 공용 프로세스 풀 (처음 쓸 때 생성)
+
+
+# =========================== 작업 실행 ===========================
+def detach_upload(uploaded_file) -> BytesIO:
+    """업로드 파일 → 이름 붙은 BytesIO 사본 (위젯이 사라져도 작업이 계속 읽을 수 있게)"""
+    f = BytesIO(upload_bytes(uploaded_file))
+    f.name = getattr(uploaded_file, "name", "")
+    return f
+
+
+def estimate_memory(files, factor: float = 1.0) -> int:
+    """
+    업로드 파일들 → 작업 추정 메모리 (파일 크기 × 형식별 배수 × 도구별 배수)
+    크기는 UploadedFile.size (내용을 읽지 않음), 없으면 내용 길이
+    """
+    total = 0
+    for f in files:
+        size = getattr(f, "size", None)
+        if size is None:
+            size = len(upload_bytes(f))
+        total += size * (XLS_MEMORY_FACTOR if is_xls(f) else XLSX_MEMORY_FACTOR)
+    return int(total * factor)
+
+
+def process_pool() -> ProcessPoolExecutor | None:
+    """
+    서버 전체 공용 프로세스 풀 (PROCESS_WORKERS 개)
+    - 작업마다 풀을 만들지 않으므로 작업자 프로세스 수가 동시 작업 수만큼 늘지 않음
+    - 스레드가 여럿인 서버에서 fork 하지 않도록 spawn 방식
+    - 작업자가 비정상 종료돼 풀이 깨졌으면 새로 만듦
+    - 코어가 1개면 None (호출하는 쪽에서 바로 실행)
+    """
+    global _PROCS
+    if PROCESS_WORKERS <= 1:
+        return None
+    with _LOCK:
+        if _PROCS is None or getattr(_PROCS, "_broken", False):
+            _PROCS = ProcessPoolExecutor(max_workers=PROCESS_WORKERS, mp_context=get_context("spawn"))
+        return _PROCS
+
+
+def _update(job_id: str, **fields) -> None:
+    with _LOCK:
+        if job_id in _JOBS:
+            _JOBS[job_id].update(fields)
+
+
+def _prune(keep: str | None = None) -> None:
+    """끝난 작업 결과 합계가 한도를 넘으면 오래된 것부터 버림 (keep: 방금 끝난 작업은 남김)"""
+    with _LOCK:
+        done = sorted(
+            (j for j in _JOBS.values() if j["status"] in FINISHED),
+            key=lambda j: j["finished"],
+        )
+        used = sum(j["size"] for j in done)
+        for j in done:
+            if used <= FINISHED_BUDGET_BYTES:
+                break
+            if j["id"] != keep:
+                _JOBS.pop(j["id"], None)
+                used -= j["size"]
+
+
+def _run(job_id: str, fn, args) -> None:
+    def report(pct=None, message=None):
+        fields = {}
+        if pct is not None:
+            fields["progress"] = max(0, min(int(pct), 100))
+        if message is not None:
+            fields["message"] = message
+        _update(job_id, **fields)
+
+    with _LOCK:
+        cost = _JOBS[job_id]["cost"]   # 끝나자마자 결과를 가져가 작업이 빠져도 반환할 예산
+    _update(job_id, status="running", started=time.time(), message="🚀 시작")
+    try:
+        result = fn(report, *args)
+    except BaseException as e:
+        _update(job_id, status="error", error=e, finished=time.time(), size=JOB_ENTRY_BYTES)
+        if not isinstance(e, Exception):
+            raise
+    else:
+        _update(job_id, status="done", progress=100, result=result, finished=time.time(),
+                size=JOB_ENTRY_BYTES + result_size(result))
+    finally:
+        # 어떤 경우에도 예산 반환 + 다음 작업 시작
+        _release(cost)
+        _prune(keep=job_id)
+
+
+def _dispatch() -> None:
+    """
+    대기열 앞에서부터 실행 가능한 만큼 시작 (_LOCK 안에서 호출)
+    - 먼저 온 작업이 예산을 기다리는 동안 뒤 작업이 앞지르지 않음 (큰 작업 기아 방지)
+    - 실행 중 작업이 없으면 예산과 무관하게 시작 (혼자 예산 초과는 제출 때 이미 거절)
+    """
+    global _IN_USE
+    running = sum(1 for j in _JOBS.values() if j["status"] in ("starting", "running"))
+    while _QUEUE and running < MAX_RUNNING_JOBS:
+        job = _JOBS[_QUEUE[0]]
+        if running and _IN_USE + job["cost"] > MEMORY_BUDGET_BYTES:
+            break
+        _QUEUE.pop(0)
+        _IN_USE += job["cost"]
+        job["status"] = "starting"
+        running += 1
+        _POOL.submit(_run, job["id"], job.pop("fn"), job.pop("args"))
+
+
+def _release(cost: int) -> None:
+    global _IN_USE
+    with _LOCK:
+        _IN_USE -= cost
+        _dispatch()
+
+
+def submit_job(label: str, fn, *args, cost: int = 0) -> str:
+    """
+    fn(report, *args) 를 스케줄러에 제출하고 작업 id 반환
+    cost: 추정 메모리(바이트, estimate_memory). 예산 초과/대기열 가득이면 status "rejected"
+    """
+    job_id = uuid.uuid4().hex
+    job = {
+        "id": job_id, "label": label, "status": "queued",
+        "progress": 0, "message": "⏳ 대기 중...",
+        "result": None, "error": None, "cost": int(cost),
+        "created": time.time(), "started": None, "finished": None,
+        "size": JOB_ENTRY_BYTES, "fn": fn, "args": args,
+    }
+    with _LOCK:
+        if job["cost"] > MEMORY_BUDGET_BYTES:
+            reason = (
+                f"파일이 너무 커서 처리할 수 없습니다 (예상 메모리 {job['cost'] / 1024 ** 3:,.1f}GB, "
+                f"한도 {MEMORY_BUDGET_BYTES / 1024 ** 3:,.1f}GB). 파일을 나눠서 올려주세요."
+            )
+        elif len(_QUEUE) >= MAX_QUEUED_JOBS:
+            reason = "대기 중인 작업이 많습니다. 잠시 후 다시 실행해 주세요."
+        else:
+            reason = None
+        if reason:
+            job.update(status="rejected", message=reason, cost=0, finished=time.time(),
+                       fn=None, args=None)
+            _JOBS[job_id] = job
+        else:
+            _JOBS[job_id] = job
+            _QUEUE.append(job_id)
+            _dispatch()
+    return job_id
+
+
+def get_job(job_id: str | None) -> dict | None:
+    """작업 상태 사본 (없거나 정리된 작업이면 None). 대기 중이면 queue_pos = 대기 순번(1부터)"""
+    with _LOCK:
+        job = _JOBS.get(job_id)
+        if job is None:
+            return None
+        job = dict(job)
+        job["queue_pos"] = _QUEUE.index(job_id) + 1 if job_id in _QUEUE else None
+        return job
+
+
+def _take_job(job_id: str) -> dict | None:
+    """끝난 작업을 보관 목록에서 빼면서 반환"""
+    with _LOCK:
+        return _JOBS.pop(job_id, None)
+
+
+def job_status_text(job: dict) -> str:
+    """진행률 막대 옆 문구 (대기 중이면 대기 순번)"""
+    if job["queue_pos"] is not None:
+        return f"⏳ 대기 중... ({job['queue_pos']}번째, 서버 작업 한도 초과로 순서대로 처리)"
+    return job["message"]
+
+
+def run_admitted(label: str, fn, *args, cost: int = 0):
+    """
+    화면에서 결과를 바로 쓰는 도구용: 같은 대기열을 거쳐 실행하고 끝날 때까지 기다려 결과 반환
+    - 기다리는 동안 대기 순번/진행률 표시
+    - 거절되면 안내 문구를 보여주고 페이지 실행 중단 (st.stop), 작업 오류는 그대로 다시 발생
+    - 결과는 넘겨받는 즉시 보관 목록에서 뺌 (화면 쪽 result_cache 가 보관)
+    """
+    job_id = submit_job(label, fn, *args, cost=cost)
+    box = st.empty()
+    job = get_job(job_id)
+    while job is not None and job["status"] not in FINISHED:
+        box.progress(job["progress"], text=job_status_text(job))
+        time.sleep(POLL_SECONDS)
+        job = get_job(job_id)
+    box.empty()
+    job = _take_job(job_id)
+    if job is None:
+        st.error("⛔ 작업 정보가 서버에서 정리되었습니다. 다시 실행해 주세요.")
+        st.stop()
+    if job["status"] == "rejected":
+        st.error(f"⛔ {job['message']}")
+        st.stop()
+    if job["status"] == "error":
+        raise job["error"]
+    return job["result"]
+
+
+def progress_widgets(report):
+    """report → (st.progress 흉내, st.empty 흉내): 기존 progress/status 인자 함수에 그대로 넘김"""
+    progress = SimpleNamespace(progress=lambda pct, *a, **k: report(pct=pct))
+    status = SimpleNamespace(
+        text=lambda msg, *a, **k: report(message=str(msg)),
+        write=lambda msg, *a, **k: report(message=str(msg)),
+    )
+    return progress, status
+
+
+# =========================== 세션 연결 ===========================
+def _session_jobs() -> dict:
+    return st.session_state.setdefault(JOBS_KEY, {})
+
+
+def start_job(key: str, label: str, fn, *args, cost: int = 0) -> dict:
+    """새 작업 제출 후 이 세션의 key 에 연결 (같은 key 의 이전 작업은 연결만 끊김)"""
+    _session_jobs()[key] = submit_job(label, fn, *args, cost=cost)
+    return session_job(key)
+
+
+def forget_job(key: str) -> None:
+    """이 세션의 key 연결 끊기 (오류/거절을 알린 뒤 → 다음 실행 때 새로 신청)"""
+    _session_jobs().pop(key, None)
+
+
+def session_job(key: str) -> dict | None:
+    """이 세션에서 key 로 제출한 작업"""
+    return get_job(_session_jobs().get(key))
+
+
+def session_job_list() -> list[dict]:
+    """이 세션의 작업들 (제출 순)"""
+    jobs = [get_job(i) for i in _session_jobs().values()]
+    return sorted((j for j in jobs if j is not None), key=lambda j: j["created"])
+
+
+# =========================== 화면 ===========================
+def watch_job(job: dict) -> None:
+    """
+    진행 중 작업의 진행률 표시. 이 부분만 POLL_SECONDS 마다 다시 그리고,
+    작업이 끝나면 페이지 전체를 다시 실행해 결과를 그리게 함
+    """
+    job_id = job["id"]
+
+    @st.fragment(run_every=POLL_SECONDS)
+    def _poll():
+        cur = get_job(job_id)
+        if cur is None or cur["status"] in FINISHED:
+            st.rerun()
+        st.progress(cur["progress"], text=job_status_text(cur))
+        st.caption("다른 메뉴로 이동해도 작업은 계속되고, 돌아오면 결과를 받을 수 있습니다.")
+
+    _poll()
+
+
+def show_session_jobs() -> None:
+    """이 세션의 작업 목록 (진행 중 작업이 있으면 목록만 주기적으로 다시 그림)"""
+    jobs = session_job_list()
+    if not jobs:
+        return
+    running = any(j["status"] not in FINISHED for j in jobs)
+
+    @st.fragment(run_every=POLL_SECONDS if running else None)
+    def _panel():
+        cur = session_job_list()
+        if running and all(j["status"] in FINISHED for j in cur):
+            st.rerun()   # 모두 끝나면 주기적 갱신 중단
+        st.subheader("⏳ 내 작업")
+        for j in cur:
+            if j["status"] == "done":
+                st.write(f"✅ {j['label']} — 완료 (해당 메뉴에서 결과 다운로드)")
+            elif j["status"] == "error":
+                st.write(f"❌ {j['label']} — 오류")
+            elif j["status"] == "rejected":
+                st.write(f"⛔ {j['label']} — {j['message']}")
+            else:
+                st.progress(j["progress"], text=f"{j['label']} — {job_status_text(j)}")
+
+    _panel()
@@ -1,91 +1,530 @@
 # ledger_app.py
 # -*- coding: utf-8 -*-
+import os
+import pickle
+import tempfile
+import pandas as pd
 import streamlit as st
+from concurrent.futures import as_completed
+from contextlib import suppress
 from io import BytesIO
-from openpyxl import Workbook, load_workbook
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.utils import get_column_letter
 
+from excel.excel_io import CHUNK_ROWS, content_hash, iter_upload_rows, parse_amounts, upload_bytes
+from excel.jobs import detach_upload, estimate_memory, process_pool, session_job, start_job, watch_job
+from excel.ledger_store import export_columnar, export_formats, save_ledger
+from excel.schema import resolve, warn_if_moved
+
+
+# -------------------------------------------------------
+#  원장 형식 설정
+#  열 위치는 schema.SCHEMAS["ledger_file"] (헤더 지문별 1회 해석)
+#  - 전표번호(기본 M열) → 문자열 강제
+#  - 차변/대변(기본 U~V열) → 회계 서식
+#  - 마지막 행 판정 기준(AB열)
+# -------------------------------------------------------
+ACC_FMT = '_(* #,##0_);_(* (#,##0);_(* "-"??_);_(@_)'
+
+
+def _is_blank(v) -> bool:
+    return v is None or v == ""
+
+
+def ledger_layout(header) -> dict:
+    """원장 헤더 → {역할: 열 위치(0부터) 또는 None}"""
+    return resolve("ledger_file", header)["cols"]
+
+
+def _amount_idxs(cols: dict) -> tuple:
+    return tuple(i for i in (cols["debit"], cols["credit"]) if i is not None)
+
+
+def _chunk_amounts(batch: pd.DataFrame, i) -> list:
+    """본문 묶음의 금액 열 → float 목록 (공란/변환 불가는 0, 열이 없으면 전부 0)"""
+    if i is None or i >= batch.shape[1]:
+        return [0.0] * len(batch)
+    return parse_amounts(batch[i]).fillna(0.0).tolist()
+
+
+def iter_ledger_rows(uploaded_file):
+    """
+    원장 파일 1개를 스트리밍으로 읽기.
+    반환: (header, 본문 행 generator)
+    - 헤더 마지막 열 이후는 버림, 짧은 행은 None 으로 채움
+    - AB열 기준 마지막 행 이후(합계/빈 행)는 버림:
+      AB열이 빈 행은 잠시 보류했다가 뒤에 AB열 값이 있는 행이 나오면 함께 내보냄
+    """
+    rows = iter_upload_rows(uploaded_file)
+    header = next(rows, None)
+    if header is None:
+        return (), iter(())
+
+    last_col = len(header)
+    while last_col > 1 and _is_blank(header[last_col - 1]):
+        last_col -= 1
+
+    cols = ledger_layout(header[:last_col])
+    ab_idx = cols["last_row"]
+    m_idx = cols["voucher"] if cols["voucher"] is not None and cols["voucher"] < last_col else None
+
+    def body():
+        pending = []
+        for row in rows:
+            ab = row[ab_idx] if len(row) > ab_idx else None
+            vals = tuple(row[:last_col]) + (None,) * (last_col - len(row))
+            # 전표번호는 문자열로 강제
+            if m_idx is not None and vals[m_idx] is not None:
+                vals = vals[:m_idx] + (str(vals[m_idx]),) + vals[m_idx + 1:]
+            if _is_blank(ab):
+                pending.append(vals)
+                continue
+            yield from pending
+            pending.clear()
+            yield vals
+
+    return tuple(header[:last_col]), body()
+
+
+def _scan_widths(rows, widths):
+    """열 너비용 최대 글자수 누적 (행 수 반환)"""
+    n = 0
+    for vals in rows:
+        n += 1
+        for c, v in enumerate(vals):
+            if v is not None:
+                ln = len(str(v))
+                if ln > widths.get(c, 0):
+                    widths[c] = ln
+    return n
+
+
+# -------------------------------------------------------
+#  파일별 파싱 (프로세스 풀 작업 단위)
+#  작업자가 파일마다 한 번만 파싱해 본문 묶음을 임시 파일(spool)에 이어 씀
+#  → 부모는 다시 파싱하지 않고 업로드 순서대로 묶음을 읽어 기록만 함
+#  (임시 파일은 통합이 끝나면 바로 삭제)
+# -------------------------------------------------------
+LEDGER_CHUNK_ROWS = CHUNK_ROWS   # 묶음 1개 행 수 (spool 기록 / 통합 기록 단위)
+
+
+def new_spool() -> str:
+    """본문 묶음을 담을 임시 파일 경로 (부모가 만들고 지움)"""
+    fd, path = tempfile.mkstemp(prefix="ledger-", suffix=".spool")
+    os.close(fd)
+    return path
+
+
+def discard_spools(paths) -> None:
+    for path in paths:
+        with suppress(FileNotFoundError):
+            os.remove(path)
+
+
+def _chunked(rows, chunk_rows: int):
+    buf = []
+    for vals in rows:
+        buf.append(vals)
+        if len(buf) >= chunk_rows:
+            yield buf
+            buf = []
+    if buf:
+        yield buf
+
+
+def parse_ledger_file(name: str, data: bytes, spool: str, chunk_rows: int = LEDGER_CHUNK_ROWS) -> dict:
+    """
+    원장 파일 1개 파싱 (프로세스 풀에서 실행)
+    - 본문은 chunk_rows 행씩 spool 에 pickle 로 이어 씀 (파일 전체를 메모리/파이프로 옮기지 않음)
+    - 반환은 작은 요약: 헤더 + 묶음별 행 수 + 전표 수 + 열 너비 + 내용 해시
+    UploadedFile 은 피클링이 안 되므로 (파일명, bytes) 로 받음
+    """
+    f = BytesIO(data)
+    f.name = name
+    header, rows = iter_ledger_rows(f)
+    m_idx = ledger_layout(header)["voucher"] if header else None
+    vouchers = set()
+    widths = {}
+    chunks = []
+
+    with open(spool, "wb") as out:
+        for chunk in _chunked(rows, chunk_rows):
+            if m_idx is not None:
+                vouchers.update(vals[m_idx] for vals in chunk if m_idx < len(vals))
+            _scan_widths(chunk, widths)
+            pickle.dump(chunk, out, protocol=pickle.HIGHEST_PROTOCOL)
+            chunks.append(len(chunk))
+
+    return {
+        "name": name,
+        "digest": content_hash(data),
+        "header": header,
+        "n_rows": sum(chunks),
+        "chunks": chunks,                 # 묶음별 행 수 (통합 기록 진행률)
+        "n_vouchers": len(vouchers),      # 동일 파일 중복 요약용
+        "widths": widths,
+        "nbytes": len(data),
+        "spool": spool,
+    }
+
+
+def iter_ledger_chunks(part: dict):
+    """파싱해 둔 파일(part)의 본문 묶음(행 tuple 목록)을 spool 에서 순서대로 읽기"""
+    with open(part["spool"], "rb") as f:
+        for _ in part["chunks"]:
+            yield pickle.load(f)
+
 
 # -------------------------------------------------------
 #  원장 통합 함수 (진행률 업데이트 기능 포함)
 # -------------------------------------------------------
-def merge_ledgers_from_workbooks(files, progress_callback=None) -> BytesIO:
+def parse_ledgers(files, progress_callback=None):
     """
     files: UploadedFile 리스트
-    progress_callback: (done, total) → None 형태 함수
+    progress_callback: (done_bytes, total_bytes, rows) → None 형태 함수
+
+    파일별 파싱을 공용 프로세스 풀(jobs.process_pool)로 병렬 처리 (끝나는 순서대로 진행률 보고)
+    반환: (header, parts)  parts 는 업로드 순서, 데이터 있는 파일만
+          (본문은 iter_ledger_chunks 로 읽고, 다 쓰면 discard_spools 로 삭제)
     """
-    twb = Workbook()
-    summary_ws = twb.active
-    summary_ws.title = "통합"
+    payloads = [(f.name, upload_bytes(f)) for f in files]
+    spools = [new_spool() for _ in payloads]
+    total_bytes = sum(len(data) for _, data in payloads)
+    results = [None] * len(payloads)
+    done_bytes = 0
+    done_rows = 0
+
+    def collect(i, res):
+        nonlocal done_bytes, done_rows
+        results[i] = res
+        done_bytes += res["nbytes"]
+        done_rows += res["n_rows"]
+        if progress_callback is not None:
+            progress_callback(done_bytes, total_bytes, done_rows)
 
-    copy_row = 1
-    Mcol = 13  # 전표번호(M열)
+    try:
+        pool = process_pool() if len(payloads) > 1 else None
+        if pool is not None:
+            futures = {
+                pool.submit(parse_ledger_file, name, data, spools[i]): i
+                for i, (name, data) in enumerate(payloads)
+            }
+            for fut in as_completed(futures):
+                collect(futures[fut], fut.result())
+        else:
+            for i, (name, data) in enumerate(payloads):
+                collect(i, parse_ledger_file(name, data, spools[i]))
+    except BaseException:
+        discard_spools(spools)
+        raise
 
-    total = len(files)
-    done = 0
+    # --- 헤더는 데이터가 있는 첫 파일에서 1회만 ---
+    parts = [r for r in results if r["n_rows"] > 0]
+    discard_spools(r["spool"] for r in results if r["n_rows"] == 0)
+    header = parts[0]["header"] if parts else ()
+    return header, parts
 
-    for f in files:
-        done += 1
-        if progress_callback is not None:
-            progress_callback(done, total)
-
-        # 파일 열기 (Streamlit UploadedFile → BytesIO 변환)
-        file_bytes = BytesIO(f.read())
-        wb = load_workbook(filename=file_bytes, data_only=True)
-        ws = wb.worksheets[0]
-
-        # --- AB열 기준 마지막 행 찾기 ---
-        ab_idx = 28  # AB = 28번째 열
-        last_row = ws.max_row
-        while last_row > 1 and (ws.cell(row=last_row, column=ab_idx).value in (None, "")):
-            last_row -= 1
-        if last_row <= 1:
+
+# -------------------------------------------------------
+#  중복 업로드 / 기간 겹침 검출 (통합 기록 중 묶음 단위로)
+# -------------------------------------------------------
+DUP_COL = "중복여부"
+DEDUP_DROP = "제거"
+DEDUP_FLAG = "표시만"
+DEDUP_OFF = "안 함"
+
+
+def new_dedup(header, mode: str = DEDUP_DROP) -> dict:
+    """
+    같은 파일 재업로드 / 기간이 겹친 파일의 중복 전표 판정 상태 (스트리밍 중 한 번 훑기, O(n))
+    - 파일 내용 해시가 앞 파일과 같으면 파일 전체가 중복
+    - 행 키 (전표번호, 라인, 차변, 대변, 일자) + 파일 내 등장 순번이 앞 파일에 이미 있으면 중복
+      (같은 파일 안의 동일 행은 중복으로 보지 않음)
+    - 행 키는 묶음마다 열 단위로 64비트 해시 → 행 값은 보관하지 않고 해시 정수만 기억
+    mode: 제거 → 중복 행 삭제 / 표시만 → 맨 끝 '중복여부' 열에 표시
+    """
+    cols = ledger_layout(header)
+    return {
+        "mode": mode,
+        "key_idx": [cols["voucher"], cols["line"], cols["debit"], cols["credit"], cols["date"]],
+        "amount_idxs": _amount_idxs(cols),
+        "names": [],        # 판정한 파일명 (아래 보관값은 이 목록의 위치)
+        "seen_files": {},   # 내용 해시 → 파일 위치
+        "seen_rows": {},    # hash((행 키 해시, 순번)) → 처음 나온 파일 위치
+        "summary": [],
+        "file": None,       # 지금 판정 중인 파일 상태
+    }
+
+
+def dedup_start_file(state: dict, part: dict) -> bool:
+    """파일 판정 시작. 앞 파일과 내용이 같으면 (파일 전체 중복, 요약은 훑기 결과로) True"""
+    idx = len(state["names"])
+    state["names"].append(part["name"])
+    first = state["seen_files"].get(part["digest"])
+    state["file"] = {"idx": idx, "part": part, "same_as": first, "occ": {}, "hits": {}}
+    if first is None:
+        state["seen_files"][part["digest"]] = idx
+    return first is not None
+
+
+def _row_key_hashes(state: dict, batch: pd.DataFrame) -> list:
+    """본문 묶음 → 행 키 해시 목록 (금액은 숫자로 바꿔서, 없는 열은 공란)"""
+    keys = {}
+    for n, i in enumerate(state["key_idx"]):
+        if i is None or i >= batch.shape[1]:
+            keys[n] = pd.Series(None, index=batch.index, dtype=object)
+        elif i in state["amount_idxs"]:
+            keys[n] = parse_amounts(batch[i]).fillna(0.0)
+        else:
+            keys[n] = batch[i]
+    return pd.util.hash_pandas_object(pd.DataFrame(keys), index=False).tolist()
+
+
+def dedup_chunk(state: dict, batch: pd.DataFrame) -> list:
+    """본문 묶음(DataFrame, 열 위치 0부터) → 행별 중복 여부 목록"""
+    cur = state["file"]
+    if cur["same_as"] is not None:
+        return [True] * len(batch)
+
+    m_idx = state["key_idx"][0]
+    vouchers = batch[m_idx].tolist() if m_idx is not None and m_idx < batch.shape[1] else None
+    occ, seen_rows, idx = cur["occ"], state["seen_rows"], cur["idx"]
+    dup = []
+    for j, h in enumerate(_row_key_hashes(state, batch)):
+        n = occ.get(h, 0)
+        occ[h] = n + 1
+        key = hash((h, n))
+        owner = seen_rows.get(key)
+        if owner is None:
+            seen_rows[key] = idx
+            dup.append(False)
+        else:
+            dup.append(True)
+            hit = cur["hits"].setdefault(owner, [0, set()])
+            hit[0] += 1
+            hit[1].add(vouchers[j] if vouchers is not None else None)
+    return dup
+
+
+def dedup_end_file(state: dict) -> None:
+    """파일 판정 끝 → 요약 행 추가"""
+    cur = state["file"]
+    name = state["names"][cur["idx"]]
+    if cur["same_as"] is not None:
+        part = cur["part"]
+        state["summary"].append({"파일": name, "중복 대상": state["names"][cur["same_as"]],
+                                 "사유": "동일 파일", "중복 행": part["n_rows"],
+                                 "중복 전표": part["n_vouchers"]})
+    else:
+        for owner, (n_rows, vouchers) in cur["hits"].items():
+            state["summary"].append({"파일": name, "중복 대상": state["names"][owner], "사유": "기간 겹침",
+                                     "중복 행": n_rows, "중복 전표": len(vouchers)})
+    state["file"] = None
+
+
+def dedup_summary(state: dict) -> pd.DataFrame:
+    columns = ["파일", "중복 대상", "사유", "중복 행", "중복 전표"]
+    return pd.DataFrame(state["summary"], columns=columns)
+
+
+# -------------------------------------------------------
+#  계정별 합계 / 계정×월 집계 (본문 기록 중 함께 누적)
+# -------------------------------------------------------
+def find_header_col(header, keywords):
+    """헤더에서 키워드가 들어간 첫 열 위치(0부터), 없으면 None"""
+    for kw in keywords:
+        for i, v in enumerate(header):
+            if v is not None and kw in str(v):
+                return i
+    return None
+
+
+def _month(v) -> str:
+    """일자 값 → 'YYYY-MM' (datetime / '2025-01-05' / '20250105' 모두 허용)"""
+    if v is None:
+        return ""
+    if hasattr(v, "strftime"):
+        return v.strftime("%Y-%m")
+    digits = "".join(ch for ch in str(v) if ch.isdigit())
+    return f"{digits[:4]}-{digits[4:6]}" if len(digits) >= 6 else ""
+
+
+def new_ledger_totals(header) -> dict:
+    cols = ledger_layout(header)
+    return {
+        "account_idx": cols["account"],
+        "date_idx": cols["date"],
+        "voucher_idx": cols["voucher"],
+        "debit_idx": cols["debit"],
+        "credit_idx": cols["credit"],
+        "dup_idx": find_header_col(header, [DUP_COL]),
+        "accounts": {},     # 계정 → [차변, 대변, 전표번호 set]
+        "months": {},       # (계정, 월) → [차변, 대변]
+    }
+
+
+def add_to_totals(totals: dict, vals, debit: float, credit: float) -> None:
+    """본문 한 행을 누적 (차변/대변 금액은 열 단위로 변환해 둔 값, 전표번호)"""
+    ai = totals["account_idx"]
+    if ai is None or ai >= len(vals):
+        return
+    # '표시만' 모드에서 중복으로 표시된 행은 합계에서 제외
+    if totals["dup_idx"] is not None and vals[totals["dup_idx"]]:
+        return
+    account = "" if vals[ai] is None else str(vals[ai]).strip()
+    mi = totals["voucher_idx"]
+
+    acc = totals["accounts"].get(account)
+    if acc is None:
+        acc = totals["accounts"][account] = [0.0, 0.0, set()]
+    acc[0] += debit
+    acc[1] += credit
+    if mi is not None and mi < len(vals) and vals[mi] is not None:
+        acc[2].add(vals[mi])
+
+    di = totals["date_idx"]
+    month = _month(vals[di]) if di is not None and di < len(vals) else ""
+    cell = totals["months"].get((account, month))
+    if cell is None:
+        cell = totals["months"][(account, month)] = [0.0, 0.0]
+    cell[0] += debit
+    cell[1] += credit
+
+
+def _acc_cell(ws, value):
+    cell = WriteOnlyCell(ws, value=value)
+    cell.number_format = ACC_FMT
+    return cell
+
+
+def write_totals_sheets(twb, totals: dict) -> None:
+    """계정별합계(시산표) + 계정×월(차변-대변) 시트 추가"""
+    accounts = sorted(totals["accounts"])
+
+    ws = twb.create_sheet("계정별합계")
+    for letter, w in zip("ABCDE", (30, 18, 18, 18, 10)):
+        ws.column_dimensions[letter].width = w
+    ws.append(["계정과목", "차변합계", "대변합계", "차액(차변-대변)", "전표수"])
+    sum_d = sum_c = 0.0
+    for a in accounts:
+        d, c, vouchers = totals["accounts"][a]
+        sum_d += d
+        sum_c += c
+        ws.append([a, _acc_cell(ws, d), _acc_cell(ws, c), _acc_cell(ws, d - c), len(vouchers)])
+    ws.append(["합계", _acc_cell(ws, sum_d), _acc_cell(ws, sum_c), _acc_cell(ws, sum_d - sum_c), None])
+    ws.freeze_panes = "A2"
+
+    months = sorted({m for _, m in totals["months"]})
+    ws = twb.create_sheet("계정×월")
+    ws.column_dimensions["A"].width = 30
+    for i in range(len(months) + 1):
+        ws.column_dimensions[get_column_letter(i + 2)].width = 16
+    ws.append(["계정과목"] + [m or "(일자없음)" for m in months] + ["합계"])
+    for a in accounts:
+        row = [a]
+        net_total = 0.0
+        for m in months:
+            cell = totals["months"].get((a, m))
+            net = cell[0] - cell[1] if cell else None
+            net_total += net or 0.0
+            row.append(None if net is None else _acc_cell(ws, net))
+        row.append(_acc_cell(ws, net_total))
+        ws.append(row)
+    ws.freeze_panes = "B2"
+
+
+def write_ledger_xlsx(header, parts, with_totals: bool = False, dedup=None,
+                      frame_chunks=None, progress_callback=None) -> BytesIO:
+    """
+    파싱해 둔 파일들의 본문 묶음을 업로드 순서대로 spool 에서 읽어
+    write-only 시트에 한 번만 기록 (다시 파싱하지 않음, 파일 전체를 메모리에 들고 있지 않음)
+    with_totals: 기록하면서 계정별/계정×월 합계를 누적해 시트로 추가 (데이터 재순회 없음)
+    dedup: new_dedup() 상태 → 묶음마다 중복 판정 (제거 / '중복여부' 열 표시)
+    frame_chunks: 리스트를 넘기면 기록한 행을 묶음마다 타입 지정 DataFrame 으로 바꿔 모음
+                  (열 형식 출력용, 원본 행은 묶음이 끝나면 버림)
+    progress_callback: (done_rows, total_rows) → None 형태 함수 (작업자가 알려준 묶음별 행 수 기준)
+    """
+    flag = dedup is not None and dedup["mode"] == DEDUP_FLAG
+    out_header = tuple(header) + (DUP_COL,) if flag else tuple(header)
+
+    widths = {}
+    if parts:
+        _scan_widths([out_header], widths)
+    for r in parts:
+        for c, w in r["widths"].items():
+            if w > widths.get(c, 0):
+                widths[c] = w
+
+    twb = Workbook(write_only=True)
+    summary_ws = twb.create_sheet("통합")
+
+    # 열 너비 자동 조정 (write-only: 행보다 먼저 지정)
+    max_col = max(widths) + 1 if widths else 0
+    for c in range(max_col):
+        summary_ws.column_dimensions[get_column_letter(c + 1)].width = widths.get(c, 0) + 2
+
+    if parts:
+        summary_ws.append(list(out_header))
+
+    totals = new_ledger_totals(out_header) if with_totals else None
+    if frame_chunks is not None:
+        n_cols = max([len(out_header)] + [len(r["header"]) for r in parts])
+        frame_names = ledger_frame_names(out_header, n_cols)
+        frame_cols = ledger_layout(header)
+    amount_idxs = _amount_idxs(ledger_layout(header))
+    total_rows = sum(r["n_rows"] for r in parts)
+    done_rows = 0
+
+    # --- 본문: 업로드 순서대로, 파일마다 묶음 단위 스트리밍 ---
+    for r in parts:
+        if dedup is not None and dedup_start_file(dedup, r) and not flag:
+            # 앞 파일과 내용이 같은 파일은 '제거' 모드에서 다시 읽지 않음
+            dedup_end_file(dedup)
+            done_rows += r["n_rows"]
             continue
+        for rows in iter_ledger_chunks(r):
+            n_read = len(rows)
+            batch = pd.DataFrame(rows, dtype=object)
+            if dedup is not None:
+                dup = dedup_chunk(dedup, batch)
+                if flag:
+                    # 헤더보다 열이 적은 파일도 '중복여부' 가 같은 위치에 오도록 헤더 길이에 맞춤
+                    n = len(header)
+                    rows = [
+                        vals[:n] + (None,) * (n - len(vals)) + ("중복" if d else None,)
+                        for vals, d in zip(rows, dup)
+                    ]
+                else:
+                    keep = [not d for d in dup]
+                    rows = [vals for vals, k in zip(rows, keep) if k]
+                    batch = batch[keep]
 
-        # --- 헤더 마지막 열 찾기 ---
-        last_col = ws.max_column
-        while last_col > 1 and (ws.cell(row=1, column=last_col).value in (None, "")):
-            last_col -= 1
-
-        # --- 헤더 1회만 복사 ---
-        if copy_row == 1:
-            for col in range(1, last_col + 1):
-                summary_ws.cell(row=1, column=col).value = ws.cell(1, col).value
-            copy_row = 2
-
-        # --- 본문 복사 ---
-        for r in range(2, last_row + 1):
-            for c in range(1, last_col + 1):
-                val = ws.cell(row=r, column=c).value
-                # 전표번호(M열)은 문자열로 강제
-                if c == Mcol and val is not None:
-                    val = str(val)
-                summary_ws.cell(row=copy_row, column=c).value = val
-            copy_row += 1
+            if totals is not None and rows:
+                debits = _chunk_amounts(batch, totals["debit_idx"])
+                credits = _chunk_amounts(batch, totals["credit_idx"])
+                for j, vals in enumerate(rows):
+                    add_to_totals(totals, vals, debits[j], credits[j])
+            for vals in rows:
+                out = list(vals)
+                # 차변/대변 회계 서식
+                for i in amount_idxs:
+                    if i < len(out) and not _is_blank(out[i]):
+                        cell = WriteOnlyCell(summary_ws, value=out[i])
+                        cell.number_format = ACC_FMT
+                        out[i] = cell
+                summary_ws.append(out)
+            if frame_chunks is not None and rows:
+                frame_chunks.append(ledger_frame_chunk(rows, frame_names, frame_cols))
 
-    # -------------------------------------------------------
-    #  서식 정리 (열 너비 자동 조정, 회계 서식 적용)
-    # -------------------------------------------------------
-    max_row = summary_ws.max_row
-    max_col = summary_ws.max_column
-
-    # 열 너비 자동 조정
-    for col in range(1, max_col + 1):
-        max_len = 0
-        col_letter = get_column_letter(col)
-        for row in range(1, max_row + 1):
-            v = summary_ws.cell(row=row, column=col).value
-            if v is not None:
-                max_len = max(max_len, len(str(v)))
-        summary_ws.column_dimensions[col_letter].width = max_len + 2
+            done_rows += n_read
+            if progress_callback is not None:
+                progress_callback(done_rows, total_rows)
+        if dedup is not None:
+            dedup_end_file(dedup)
 
-    # U~V (21~22열) 회계 서식
-    acc_fmt = '_(* #,##0_);_(* (#,##0);_(* "-"??_);_(@_)'
-    for col in (21, 22):
-        for row in range(2, max_row + 1):
-            cell = summary_ws.cell(row=row, column=col)
-            if cell.value not in (None, ""):
-                cell.number_format = acc_fmt
+    if totals is not None and totals["account_idx"] is not None:
+        write_totals_sheets(twb, totals)
 
     # -------------------------------------------------------
     #  메모리에 저장 후 반환
@@ -95,6 +534,98 @@ def merge_ledgers_from_workbooks(files, progress_callback=None) -> BytesIO:
     output.seek(0)
     return output
 
+
+# -------------------------------------------------------
+#  열 형식(타입 지정) 원장 DataFrame (통합 기록 중 묶음마다 변환)
+# -------------------------------------------------------
+def ledger_frame_names(header, n_cols: int) -> list:
+    """열 이름: 헤더 값 (공란은 열 문자, 중복은 '_열문자' 붙임)"""
+    names = []
+    used = set()
+    for c in range(n_cols):
+        v = header[c] if c < len(header) else None
+        name = get_column_letter(c + 1) if _is_blank(v) else str(v).strip()
+        if name in used:
+            name = f"{name}_{get_column_letter(c + 1)}"
+        used.add(name)
+        names.append(name)
+    return names
+
+
+def ledger_frame_chunk(rows, names: list, cols: dict) -> pd.DataFrame:
+    """
+    본문 묶음(행 tuple 목록) → 타입이 지정된 DataFrame 조각
+    - 일자(schema date): 날짜 / 차변·대변: 숫자 (parse_amounts) / 전표번호: 문자열
+    - 나머지 열은 전부 문자열 그대로 ('0101' 같은 코드가 숫자로 바뀌지 않도록, Parquet 저장 가능)
+    """
+    df = pd.DataFrame(rows, dtype=object).reindex(columns=range(len(names)))
+    df.columns = names
+    amount_idxs = _amount_idxs(cols)
+    for i, name in enumerate(names):
+        if i in amount_idxs:
+            df[name] = parse_amounts(df[name])
+        elif i == cols["date"]:
+            df[name] = pd.to_datetime(df[name], errors="coerce", format="mixed")
+        else:
+            df[name] = df[name].astype("string")
+    return df
+
+
+def ledger_frame(header, chunks) -> pd.DataFrame:
+    """통합 기록 중 모은 조각(frame_chunks) → 원장 DataFrame (조각이 없으면 헤더만 있는 빈 프레임)"""
+    if chunks:
+        return pd.concat(chunks, ignore_index=True)
+    return ledger_frame_chunk([], ledger_frame_names(header, len(header)), ledger_layout(header))
+
+
+LEDGER_JOB_KEY = "ledger_merge"          # jobs 세션 키
+LEDGER_SAVED_KEY = "ledger_merge_saved"   # 세션 보관까지 끝낸 작업 id
+
+
+def merge_ledgers_job(report, files, dedup_mode, with_totals, companion, keep_in_session) -> dict:
+    """
+    백그라운드 작업: 파일별 병렬 파싱(묶음을 임시 파일에) → 업로드 순서대로 묶음을 읽으며
+    중복 처리 + 통합 엑셀 기록 (+ 열 형식 파일 / 세션 보관용 프레임), 끝나면 임시 파일 삭제
+    st.* 는 부르지 않음 (경고/세션 보관/다운로드는 결과를 받은 화면에서)
+    """
+    def parse_progress(done_bytes, total_bytes, rows):
+        pct = int(done_bytes / total_bytes * 50) if total_bytes else 50
+        report(pct, (
+            f"{pct}% 파일 읽는 중...  ({done_bytes / 1024 / 1024:,.1f} / "
+            f"{total_bytes / 1024 / 1024:,.1f} MB, {rows:,}행)"
+        ))
+
+    def write_progress(done_rows, total_rows):
+        pct = 50 + (int(done_rows / total_rows * 45) if total_rows else 45)
+        report(pct, f"{pct}% 통합 엑셀 작성 중...  ({done_rows:,} / {total_rows:,}행 처리 완료)")
+
+    header, parts = parse_ledgers(files, parse_progress)
+    dedup = new_dedup(header, dedup_mode) if dedup_mode != DEDUP_OFF else None
+    want_frame = companion != "없음" or keep_in_session
+    chunks = [] if want_frame else None
+    try:
+        merged = write_ledger_xlsx(header, parts, with_totals, dedup, chunks, write_progress).getvalue()
+    finally:
+        discard_spools(r["spool"] for r in parts)
+    out_header = tuple(header) + (DUP_COL,) if dedup_mode == DEDUP_FLAG and parts else header
+
+    frame = None
+    if want_frame:
+        report(97, "열 형식 변환 중...")
+        frame = ledger_frame(out_header, chunks)
+        chunks.clear()
+    return {
+        "header": header,
+        "merged": merged,
+        "dup_summary": dedup_summary(dedup) if dedup is not None else None,
+        "dedup_mode": dedup_mode,
+        "frame": frame if keep_in_session else None,
+        "companion": export_columnar(frame, companion, "원장 통합") if companion != "없음" else None,
+        "keep_in_session": keep_in_session,
+        "names": [f.name for f in files],
+    }
+
+
 # -------------------------------------------------------
 #  Streamlit 실행 화면
 # -------------------------------------------------------
@@ -102,7 +633,7 @@ def run():
     st.title("📘 회계단위별 원장 통합")
 
     st.markdown("""
-        - 지원 형식: XLSX, XLSM  
+        - 지원 형식: XLSX, XLSM, XLS  
                 
                     **사용 방법**        
         1. 회계-장부관리-원장 엑셀자료 메뉴 클릭
@@ -114,35 +645,86 @@ def run():
 
     files = st.file_uploader(
         "각 회계단위 원장 파일을 업로드하세요.",
-        type=["xlsx", "xlsm"],
+        type=["xlsx", "xlsm", "xls"],
         accept_multiple_files=True,
         key="ledger_upload",
     )
 
+    dedup_mode = st.radio(
+        "중복 전표 처리 (같은 파일 재업로드 / 기간 겹침)",
+        [DEDUP_DROP, DEDUP_FLAG, DEDUP_OFF],
+        horizontal=True,
+    )
+
+    companion = st.selectbox(
+        "추가 출력 (열 형식 파일, 후속 분석용)",
+        ["없음"] + export_formats(),
+        help="Parquet 은 pyarrow 가 설치된 서버에서만 선택할 수 있습니다.",
+    )
+    with_totals = st.checkbox(
+        "계정별합계 · 계정×월 시트 함께 만들기", value=True,
+        help="통합하면서 차변/대변(기본 U/V열)을 계정과목별·월별로 누적해 시트를 추가합니다.",
+    )
+    keep_in_session = st.checkbox(
+        "통합 원장을 이 세션에 보관 (다른 도구에서 재업로드 없이 조회)", value=True
+    )
+
     if files and st.button("📂 원장 통합 실행"):
-        files_list = list(files)
+        # 백그라운드 작업으로 통합 (화면이 멈추지 않고, 다른 메뉴에 갔다 와도 결과 유지)
+        start_job(
+            LEDGER_JOB_KEY, "원장 통합", merge_ledgers_job,
+            [detach_upload(f) for f in files], dedup_mode, with_totals,
+            companion, keep_in_session,
+            cost=estimate_memory(files),
+        )
 
-        # Progress bar 준비
-        progress_bar = st.progress(0)
-        status_text = st.empty()
+    job = session_job(LEDGER_JOB_KEY)
+    if job is None:
+        return
+    if job["status"] == "rejected":
+        st.error(f"⛔ {job['message']}")
+        return
+    if job["status"] not in ("done", "error"):
+        watch_job(job)
+        return
+    if job["status"] == "error":
+        st.error("❌ 원장 통합 중 오류")
+        st.exception(job["error"])
+        return
 
-        # 진행률 업데이트 함수
-        def update_progress(done, total):
-            pct = int(done / total * 100)
-            progress_bar.progress(pct)
-            status_text.text(f"{pct}% 진행 중...  ({done}/{total} 파일 처리 완료)")
+    res = job["result"]
+    warn_if_moved(resolve("ledger_file", res["header"]))
 
-        # 실제 통합 실행
-        merged_file = merge_ledgers_from_workbooks(files_list, update_progress)
+    # 세션 보관은 화면 쪽(세션)에서, 작업마다 한 번만
+    if res["keep_in_session"] and st.session_state.get(LEDGER_SAVED_KEY) != job["id"]:
+        save_ledger(res["frame"], res["names"])
+        st.session_state[LEDGER_SAVED_KEY] = job["id"]
 
-        # 완료 표시
-        progress_bar.progress(100)
-        status_text.text("✅ 원장 통합 완료!")
+    # 완료 표시
+    st.progress(100, text="✅ 원장 통합 완료!")
+
+    dup_summary, dedup_mode = res["dup_summary"], res["dedup_mode"]
+    if dup_summary is not None:
+        if dup_summary.empty:
+            st.info("중복 업로드/기간 겹침 없음")
+        else:
+            verb = "제거" if dedup_mode == DEDUP_DROP else "표시"
+            st.warning(f"중복 행 {int(dup_summary['중복 행'].sum()):,}건 {verb}")
+            st.dataframe(dup_summary, use_container_width=True)
+
+    # 다운로드 버튼
+    st.download_button(
+        label="📥 원장 통합.xlsx 다운로드",
+        data=res["merged"],
+        file_name="원장 통합.xlsx",
+        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    )
 
-        # 다운로드 버튼
+    if res["companion"] is not None:
+        data, name, mime = res["companion"]
         st.download_button(
-            label="📥 원장 통합.xlsx 다운로드",
-            data=merged_file,
-            file_name="원장 통합.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            label=f"📥 {name} 다운로드",
+            data=data,
+            file_name=name,
+            mime=mime,
         )
@@ -0,0 +1,229 @@
+# ledger_query_app.py
+# -*- coding: utf-8 -*-
+from __future__ import annotations
+
+import time
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+
+from excel.ledger_app import ACC_FMT, ledger_layout
+from excel.ledger_store import ledger_info, load_ledger
+from excel.result_cache import cached_result, get_result
+
+INDEX_KEY = "ledger_index"
+MAX_PREVIEW_ROWS = 1000
+
+
+# -------------------------------------------------------
+#  조회 대상 열 찾기 (원장 엑셀파일 형식 기준)
+# -------------------------------------------------------
+def ledger_columns(df: pd.DataFrame) -> dict:
+    """전표번호 / 차변·대변 / 계정과목 / 거래처 는 schema "ledger_file" 해석 위치, 일자는 날짜 dtype 열"""
+    cols = list(df.columns)
+    layout = ledger_layout(cols)
+    date_col = next((c for c in cols if pd.api.types.is_datetime64_any_dtype(df[c])), None)
+    found = {
+        role: cols[layout[role]] if layout[role] is not None and layout[role] < len(cols) else None
+        for role in ("voucher", "debit", "credit", "account", "vendor")
+    }
+    return {**found, "date": date_col}
+
+
+# -------------------------------------------------------
+#  인덱스
+#  - 해시 인덱스: 값 → 행 위치 배열 (전표번호/계정과목/거래처)
+#  - 정렬 인덱스: 정렬된 값 + 원래 위치 (일자/차변/대변 범위 조회)
+# -------------------------------------------------------
+def build_ledger_index(df: pd.DataFrame) -> dict:
+    cols = ledger_columns(df)
+    hashed = {}
+    for key in ("voucher", "account", "vendor"):
+        c = cols[key]
+        if c is not None:
+            hashed[key] = df[c].groupby(df[c], sort=True, dropna=True).indices
+
+    ranged = {}
+    for key in ("date", "debit", "credit"):
+        c = cols[key]
+        if c is None:
+            continue
+        s = df[c]
+        if key == "date":
+            values = s.to_numpy(dtype="datetime64[ns]")
+            ok = ~np.isnat(values)
+        else:
+            values = s.to_numpy(dtype="float64", na_value=np.nan)
+            ok = ~np.isnan(values)
+        pos = np.flatnonzero(ok)
+        order = np.argsort(values[pos], kind="stable")
+        ranged[key] = (values[pos][order], pos[order])
+
+    return {"cols": cols, "hash": hashed, "range": ranged}
+
+
+def lookup_values(index: dict, key: str, values) -> np.ndarray:
+    """해시 인덱스에서 여러 값의 행 위치 합집합"""
+    table = index["hash"].get(key, {})
+    hits = [table[v] for v in values if v in table]
+    return np.unique(np.concatenate(hits)) if hits else np.array([], dtype=np.int64)
+
+
+def lookup_contains(index: dict, key: str, text: str) -> np.ndarray:
+    """해시 인덱스 키 중 text 포함 값의 행 위치 (키 개수만큼만 훑음)"""
+    table = index["hash"].get(key, {})
+    return lookup_values(index, key, [k for k in table if text in str(k)])
+
+
+def lookup_range(index: dict, key: str, lo=None, hi=None) -> np.ndarray:
+    """정렬 인덱스에서 lo ≤ 값 ≤ hi 행 위치 (이진 탐색)"""
+    values, pos = index["range"][key]
+    start = 0 if lo is None else np.searchsorted(values, lo, side="left")
+    end = len(values) if hi is None else np.searchsorted(values, hi, side="right")
+    return np.sort(pos[start:end])
+
+
+def get_index(df: pd.DataFrame) -> dict:
+    """세션에 보관된 원장 기준으로 인덱스 1회 생성 후 재사용"""
+    info = ledger_info()
+    cached = st.session_state.get(INDEX_KEY)
+    if cached is not None and cached["created"] == info["created"]:
+        return cached["index"]
+    index = build_ledger_index(df)
+    st.session_state[INDEX_KEY] = {"created": info["created"], "index": index}
+    return index
+
+
+def filtered_excel(df: pd.DataFrame, cols: dict) -> BytesIO:
+    """조회 결과 엑셀 (write-only 시트에 한 번만 기록, 차변/대변 회계 서식)"""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("조회결과")
+    ws.freeze_panes = "A2"
+    ws.append([str(c) for c in df.columns])
+
+    acc_idxs = [df.columns.get_loc(cols[key]) for key in ("debit", "credit") if cols[key] is not None]
+    values = df.astype(object).where(df.notna(), None)
+    for row in values.itertuples(index=False, name=None):
+        out = list(row)
+        for i in acc_idxs:
+            if out[i] is not None:
+                cell = WriteOnlyCell(ws, value=out[i])
+                cell.number_format = ACC_FMT
+                out[i] = cell
+        ws.append(out)
+
+    out = BytesIO()
+    wb.save(out)
+    out.seek(0)
+    return out
+
+
+# -------------------------------------------------------
+#  Streamlit 실행 화면
+# -------------------------------------------------------
+def run():
+    st.title("🔎 통합 원장 조회")
+
+    df = load_ledger()
+    if df is None:
+        st.info("먼저 '회계단위별 원장 통합'에서 *세션에 보관*을 체크하고 통합을 실행하세요.")
+        return
+
+    info = ledger_info()
+    st.caption(
+        f"{info['rows']:,}행 · 원본 {len(info['sources'])}개 파일 · "
+        f"{info['created']:%Y-%m-%d %H:%M} 통합"
+    )
+
+    index = get_index(df)
+    cols = index["cols"]
+
+    c1, c2, c3 = st.columns(3)
+    with c1:
+        voucher_text = st.text_input("전표번호 (여러 개는 쉼표로)", disabled=cols["voucher"] is None)
+        accounts = st.multiselect(
+            "계정과목",
+            list(index["hash"].get("account", {}).keys()),
+            disabled=cols["account"] is None,
+        )
+    with c2:
+        vendor_text = st.text_input("거래처 (일부 포함)", disabled=cols["vendor"] is None)
+        date_range = None
+        if cols["date"] is not None:
+            dates = index["range"]["date"][0]
+            if len(dates):
+                lo = pd.Timestamp(dates[0]).date()
+                hi = pd.Timestamp(dates[-1]).date()
+                date_range = st.date_input(f"{cols['date']} 범위", (lo, hi), min_value=lo, max_value=hi)
+    with c3:
+        debit_range = st.text_input("차변 범위 (예: 1000000~5000000)", disabled=cols["debit"] is None)
+        credit_range = st.text_input("대변 범위 (예: ~100000)", disabled=cols["credit"] is None)
+
+    def parse_range(text):
+        if not text or "~" not in text:
+            return None
+        lo, hi = (t.replace(",", "").strip() for t in text.split("~", 1))
+        try:
+            return (float(lo) if lo else None, float(hi) if hi else None)
+        except ValueError:
+            st.warning(f"금액 범위 형식 오류: {text}")
+            return None
+
+    t0 = time.perf_counter()
+    hits = []
+    filters = []   # 적용된 조건 (조회 결과 엑셀 보관 키)
+    if voucher_text.strip():
+        vouchers = [v.strip() for v in voucher_text.split(",") if v.strip()]
+        hits.append(lookup_values(index, "voucher", vouchers))
+        filters.append(("voucher", tuple(vouchers)))
+    if accounts:
+        hits.append(lookup_values(index, "account", accounts))
+        filters.append(("account", tuple(accounts)))
+    if vendor_text.strip():
+        hits.append(lookup_contains(index, "vendor", vendor_text.strip()))
+        filters.append(("vendor", vendor_text.strip()))
+    if date_range and len(date_range) == 2 and tuple(date_range) != (lo, hi):
+        filters.append(("date", tuple(date_range)))
+        hits.append(lookup_range(
+            index, "date",
+            np.datetime64(pd.Timestamp(date_range[0]), "ns"),
+            np.datetime64(pd.Timestamp(date_range[1]) + pd.Timedelta(days=1) - pd.Timedelta(1, "ns"), "ns"),
+        ))
+    for key, text in (("debit", debit_range), ("credit", credit_range)):
+        rng = parse_range(text)
+        if rng is not None and key in index["range"]:
+            hits.append(lookup_range(index, key, *rng))
+            filters.append((key, rng))
+
+    if hits:
+        pos = hits[0]
+        for h in hits[1:]:
+            pos = np.intersect1d(pos, h, assume_unique=True)
+        result = df.iloc[pos]
+    else:
+        result = df
+    elapsed = (time.perf_counter() - t0) * 1000
+
+    st.success(f"조회 결과 {len(result):,}행 ({elapsed:,.0f} ms)")
+    if len(result) > MAX_PREVIEW_ROWS:
+        st.caption(f"미리보기는 앞 {MAX_PREVIEW_ROWS:,}행만 표시합니다. 전체는 다운로드하세요.")
+    st.dataframe(result.head(MAX_PREVIEW_ROWS), use_container_width=True)
+
+    if hits and len(result):
+        # 엑셀은 버튼을 눌렀을 때만 작성 (미리보기 재실행에는 포함 안 함),
+        # 같은 통합 원장 + 같은 조건이면 보관된 파일 재사용
+        key = ("ledger_query", info["created"], tuple(filters))
+        data = get_result(key)
+        if data is None and st.button("📊 엑셀 만들기"):
+            data = cached_result(key, lambda: filtered_excel(result, cols))
+        if data is not None:
+            st.download_button(
+                "📥 조회 결과 다운로드",
+                data=data,
+                file_name="원장 조회결과.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            )
@@ -0,0 +1,77 @@
+# ledger_store.py
+# -*- coding: utf-8 -*-
+"""
+통합 원장 세션 저장소 + 열 형식(Parquet/CSV) 내보내기
+- 원장 통합 결과를 타입 지정된 DataFrame 으로 세션 메모리에만 보관 (서버 디스크 저장 없음)
+- 다른 도구는 load_ledger() 로 재업로드 없이 조회
+"""
+from __future__ import annotations
+
+import importlib.util
+from datetime import datetime
+from io import BytesIO
+
+import pandas as pd
+import streamlit as st
+
+STORE_KEY = "ledger_store"
+
+# Parquet 은 pyarrow(또는 fastparquet)가 있을 때만
+PARQUET_AVAILABLE = any(
+    importlib.util.find_spec(m) is not None for m in ("pyarrow", "fastparquet")
+)
+
+FORMAT_PARQUET = "Parquet"
+FORMAT_CSV = "CSV(gzip)"
+
+
+# =========================== 세션 저장소 ===========================
+def save_ledger(df: pd.DataFrame, source_names) -> None:
+    st.session_state[STORE_KEY] = {
+        "df": df,
+        "sources": list(source_names),
+        "created": datetime.now(),
+    }
+
+
+def load_ledger() -> pd.DataFrame | None:
+    entry = st.session_state.get(STORE_KEY)
+    return None if entry is None else entry["df"]
+
+
+def ledger_info() -> dict | None:
+    """저장된 원장 요약 (행/열 수, 원본 파일, 생성 시각)"""
+    entry = st.session_state.get(STORE_KEY)
+    if entry is None:
+        return None
+    df = entry["df"]
+    return {
+        "rows": len(df),
+        "cols": df.shape[1],
+        "sources": entry["sources"],
+        "created": entry["created"],
+    }
+
+
+def clear_ledger() -> None:
+    st.session_state.pop(STORE_KEY, None)
+
+
+# =========================== 내보내기 ===========================
+def export_formats() -> list[str]:
+    return ([FORMAT_PARQUET] if PARQUET_AVAILABLE else []) + [FORMAT_CSV]
+
+
+def export_columnar(df: pd.DataFrame, fmt: str, base_name: str):
+    """
+    열 형식 파일 생성.
+    반환: (bytes, 파일명, mime)
+    """
+    buf = BytesIO()
+    if fmt == FORMAT_PARQUET:
+        df.to_parquet(buf, index=False)
+        return buf.getvalue(), f"{base_name}.parquet", "application/octet-stream"
+
+    # CSV(gzip): 압축을 푼 CSV 를 엑셀로 열어도 한글이 깨지지 않도록 utf-8-sig, 날짜는 ISO 형식
+    df.to_csv(buf, index=False, encoding="utf-8-sig", compression="gzip", date_format="%Y-%m-%d")
+    return buf.getvalue(), f"{base_name}.csv.gz", "application/gzip"
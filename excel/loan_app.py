@@ -1,10 +1,19 @@
 # loan_app.py
 # -*- coding: utf-8 -*-
-import streamlit as st
+from concurrent.futures import as_completed
+from datetime import date
 from io import BytesIO
+
+import numpy as np
+import pandas as pd
+import streamlit as st
 from openpyxl import load_workbook, Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.utils import get_column_letter
 
+from excel.excel_io import cell_type, parse_amounts, upload_bytes
+from excel.jobs import estimate_memory, process_pool, run_admitted
+
 
 # ----------------------------- 헤더 -----------------------------
 LOAN_HEADERS = [
@@ -17,209 +26,363 @@ LOAN_HEADERS = [
 ]
 
 
-# ======================= VBA 매크로 변환 핵심 기능 =======================
-def make_loan_workbook(uploaded_files, year_prefix: str) -> BytesIO:
-
-    wb_out = Workbook()
-    ws_out = wb_out.active
-    ws_out.title = "통합결과"
+# 원본 열 위치 (통합결과 기준 0-based: 0=차입금명, 2=상환예정일, 3~ 금액)
+DATE_IDX = 2
+SUM_START_IDX = 3
+NUM_FMT_COLS = range(3, 22)  # D~V 숫자 서식
+NUM_FMT = "#,##0"
+# 합계 대상 셀 타입 (isinstance(v, (int, float)) 와 같은 범위: bool 은 int, np.float64 는 float 하위 타입)
+NUM_TYPES = (int, float, bool, np.float64)
+FLOAT_TYPES = (float, np.float64)
+
+
+# ======================= 1) 원본 파일 → 행 수집 =======================
+HEADER_ROW = 4
+MAX_COPY_COLS = 23
+# 연속 빈 행이 이만큼 이어지면 그 뒤는 서식만 남은 빈 영역으로 보고 읽기 중단
+TRAILING_EMPTY_STOP = 200
+
+
+def _filled(v) -> bool:
+    return v not in (None, "")
+
+
+def scan_loan_file(name: str, data: bytes) -> tuple[list[list], str | None]:
+    """
+    차입금 원본 1개 → (통합결과 행 목록, 경고 문구 또는 None) (프로세스 풀에서 실행)
+    - read-only 로 4행(헤더)부터 순차 스트리밍, 전체 시트를 메모리에 올리지 않음
+    - 복사할 열 수: 4행 마지막 값 있는 열 (최대 23열)
+    - 5행~A열 값이 있는 마지막 행까지, 복사 범위가 모두 빈 행은 제외
+    - 빈 행이 TRAILING_EMPTY_STOP 행 이어져 멈췄는데 시트 범위(dimension)가 더 아래까지면 경고
+    """
+    wb = load_workbook(BytesIO(data), read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[0]
+        declared_last = ws.max_row  # 파일에 기록된 시트 범위의 마지막 행 (없으면 None)
+        ws.reset_dimensions()  # 잘못 기록된 시트 범위(dimension) 때문에 행이 잘리지 않도록
+        rows = ws.iter_rows(min_row=HEADER_ROW, max_col=MAX_COPY_COLS, values_only=True)
+
+        header = next(rows, None) or ()
+        copy_cols = max((i + 1 for i, v in enumerate(header) if _filled(v)), default=0)
+        if copy_cols < 1:
+            return [], None
+
+        base_name = name.rsplit(".", 1)[0]
+        out, pending, empty_run = [], [], 0
+        warning = None
+        for row_no, vals in enumerate(rows, start=HEADER_ROW + 1):
+            vals = tuple(vals[:copy_cols]) + (None,) * (copy_cols - len(vals))
+            if not any(_filled(v) for v in vals):
+                empty_run += 1
+                if empty_run >= TRAILING_EMPTY_STOP:
+                    if declared_last is not None and declared_last > row_no:
+                        warning = (
+                            f"{name}: 빈 행이 {TRAILING_EMPTY_STOP}행 이어져 {row_no}행에서 읽기를 멈췄습니다. "
+                            f"시트 범위는 {declared_last}행까지라 그 아래 자료가 빠졌을 수 있습니다."
+                        )
+                    break
+                continue
+            empty_run = 0
+            row = [base_name, *vals]
+            if _filled(vals[0]):
+                # A열 값이 있는 행까지 오면 그 사이 (A열 빈) 행도 확정
+                out.extend(pending)
+                pending = []
+                out.append(row)
+            else:
+                pending.append(row)
+        return out, warning
+    finally:
+        wb.close()
+
+
+def collect_loan_rows(uploaded_files) -> tuple[list[list], list[str]]:
+    """
+    업로드 파일들을 (여러 개면 프로세스 풀로 병렬) 읽어 업로드 순서대로 이어붙임
+    반환: (행 목록, 중간에 읽기를 멈춘 파일 경고 목록)
+    """
+    payloads = [
+        (f.name, upload_bytes(f))
+        for f in uploaded_files
+        if f.name.lower().endswith((".xls", ".xlsx", ".xlsm"))
+    ]
+    results = [None] * len(payloads)
+
+    pool = process_pool() if len(payloads) > 1 else None
+    if pool is not None:
+        futures = {
+            pool.submit(scan_loan_file, name, data): i
+            for i, (name, data) in enumerate(payloads)
+        }
+        for fut in as_completed(futures):
+            results[futures[fut]] = fut.result()
+    else:
+        for i, (name, data) in enumerate(payloads):
+            results[i] = scan_loan_file(name, data)
+
+    rows = [row for rows, _ in results for row in rows]
+    return rows, [warning for _, warning in results if warning]
+
+
+# ======================= 2) 연도 필터 · 정렬 · 소계/총계 =======================
+def loan_frame(rows: list[list]) -> pd.DataFrame:
+    """수집한 행 → 통합결과 열 개수에 맞춘 DataFrame (열 이름은 위치 번호)"""
+    width = len(LOAN_HEADERS)
+    padded = [r + [None] * (width - len(r)) for r in rows]
+    return pd.DataFrame(padded, columns=range(width), dtype=object)
+
+
+def _sum_value(v, has_float: bool):
+    """합계 셀 값: 0 이면 빈칸, 실수가 섞이지 않았으면 int"""
+    if v == 0:
+        return None
+    return float(v) if has_float else int(v)
+
+
+def consolidate_loans(df: pd.DataFrame, year_prefix: str) -> list[list]:
+    """
+    - year_prefix 가 있으면 상환예정일(C열)이 그 문자열로 시작하는 행만
+    - 상환예정일 문자열 기준 정렬 (같은 날짜는 원래 순서 유지)
+    - 상환예정일별 소계(D열 이후 숫자만 합산) + 빈 줄 + 총계
+    """
+    dates = df[DATE_IDX]
+    date_key = dates.map(lambda v: "" if v is None else str(v))
 
-    # 헤더 기록
-    ws_out.append(LOAN_HEADERS)
-    has_data = False
-
-    # 1) 파일들에서 데이터 모으기
-    for f in uploaded_files:
-        if not f.name.lower().endswith((".xls", ".xlsx", ".xlsm")):
-            continue
-
-        file_bytes = BytesIO(f.read())
-        wb_src = load_workbook(file_bytes, data_only=True)
-        ws_src = wb_src.worksheets[0]
-
-        # 마지막 행(A열 기준)
-        last_row = 0
-        for r in range(ws_src.max_row, 4, -1):
-            if ws_src.cell(row=r, column=1).value not in (None, ""):
-                last_row = r
-                break
-
-        # 마지막 열(4행 기준)
-        last_col = 0
-        for c in range(ws_src.max_column, 0, -1):
-            if ws_src.cell(row=4, column=c).value not in (None, ""):
-                last_col = c
-                break
-
-        copy_cols = min(last_col, 23)
-
-        if last_row >= 5 and copy_cols >= 1:
-            has_data = True
-            base_name = f.name.rsplit(".", 1)[0]
-
-            for r in range(5, last_row + 1):
-                row_vals = [base_name]
-                empty = True
-                for c in range(1, copy_cols + 1):
-                    v = ws_src.cell(row=r, column=c).value
-                    if v not in (None, ""):
-                        empty = False
-                    row_vals.append(v)
-                if not empty:
-                    ws_out.append(row_vals)
-
-    if not has_data:
-        output = BytesIO()
-        wb_out.save(output)
-        output.seek(0)
-        return output
-
-    # 2) (옵션) 연도 필터: C열 상환예정일이 year_prefix로 시작하는 것만 남기기
     year_prefix = (year_prefix or "").strip()
-    all_rows = [[c for c in row] for row in ws_out.iter_rows(values_only=True)]
-    header = all_rows[0]
-    body = all_rows[1:]
-
     if year_prefix:
-        body = [
-            row for row in body
-            if row[2] is not None and str(row[2]).startswith(year_prefix)
-        ]
-
-    # 3) 상환예정일로 정렬
-    body_sorted = sorted(
-        body,
-        key=lambda r: str(r[2]) if r[2] is not None else ""
+        keep = dates.notna() & date_key.str.startswith(year_prefix)
+        df, date_key = df[keep], date_key[keep]
+
+    order = np.argsort(date_key.to_numpy(dtype=str), kind="stable")
+    df = df.iloc[order].reset_index(drop=True)
+    date_key = date_key.iloc[order].reset_index(drop=True)
+
+    # D열 이후: 숫자 셀만 합산 대상 (문자/날짜는 0), 셀 타입은 열 단위로 한 번에 판정
+    amounts = df.iloc[:, SUM_START_IDX:]
+    kinds = pd.DataFrame(
+        cell_type(amounts.to_numpy(dtype=object)), index=amounts.index, columns=amounts.columns,
     )
+    is_num = kinds.isin(NUM_TYPES)
+    is_float = kinds.isin(FLOAT_TYPES)
+    amounts = amounts.where(is_num, 0).astype(float)
+
+    group_sums = amounts.groupby(date_key, sort=False).sum()
+    group_float = is_float.groupby(date_key, sort=False).any()
+    group_ends = date_key.index.to_series().groupby(date_key, sort=False).last()
+    first_dates = df[DATE_IDX].groupby(date_key, sort=False).first()
+    total = amounts.sum()
+
+    width = len(LOAN_HEADERS)
+    body = df.values.tolist()
+    out = []
+    start = 0
+    for key, end in group_ends.items():
+        out.extend(body[start:end + 1])
+        start = end + 1
+        subtotal = [None] * width
+        subtotal[0] = "소계"
+        subtotal[DATE_IDX] = first_dates[key]
+        sums = zip(group_sums.loc[key], group_float.loc[key])
+        for i, (v, has_float) in enumerate(sums, start=SUM_START_IDX):
+            subtotal[i] = _sum_value(v, has_float)
+        out.append(subtotal)
+
+    grand = [None] * width
+    grand[0] = "총계"
+    for i, (v, has_float) in enumerate(zip(total, is_float.any()), start=SUM_START_IDX):
+        grand[i] = _sum_value(v, has_float)
+    out.append([None] * width)
+    out.append(grand)
+    return out
+
+
+# ======================= 4) 이자경과 · 잔여상환일정 추정 =======================
+# 통합결과 열 위치 (0-based)
+NAME_IDX = 0
+ROUND_IDX = 1
+PRINCIPAL_IDX = 3
+INTEREST_IDX = 4
+STUB_IDX = 5
+RATE_IDX = 22
+DAY_BASIS = 365           # 일할 계산 기준 (actual/365)
+RATE_PERCENT_FROM = 0.3   # 이자율이 이 값 이상이면 % 단위로 입력된 것으로 보고 /100
+DATE_FMT = "yyyy-mm-dd"
+
+
+def _number_series(s: pd.Series) -> pd.Series:
+    """숫자/문자('1,234', '2.5%') 혼재 열 → float (변환 불가는 NaN)"""
+    return parse_amounts(s, strip="%")
+
+
+def _rate_series(s: pd.Series) -> pd.Series:
+    """이자율 → 연 이율(소수). 2.5 / '2.5%' / 0.025 모두 0.025"""
+    r = _number_series(s)
+    return r.where(r < RATE_PERCENT_FROM, r / 100)
+
+
+def loan_schedule(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    통합 행 → 차입금별 상환예정 일정 (차입금명·상환예정일 순)
+    상환전잔액 = 해당 회차 이후 원금상환예정액 합 (차입금별 역누적합)
+    기간일수 = 직전 회차 상환예정일 ~ 해당 회차 (첫 회차는 알 수 없어 공란)
+    """
+    sch = pd.DataFrame({
+        "차입금명": df[NAME_IDX],
+        "회차": df[ROUND_IDX],
+        "상환예정일": pd.to_datetime(df[DATE_IDX], errors="coerce", format="mixed"),
+        "원금상환예정액": _number_series(df[PRINCIPAL_IDX]).fillna(0.0),
+        "이자상환예정액": _number_series(df[INTEREST_IDX]),
+        "12.21-31예정액": _number_series(df[STUB_IDX]),
+        "이자율": _rate_series(df[RATE_IDX]),
+    })
+    sch = sch[sch["상환예정일"].notna()]
+    sch = sch.sort_values(["차입금명", "상환예정일"], kind="stable").reset_index(drop=True)
+
+    by_loan = sch.groupby("차입금명", sort=False)
+    # 이자율은 회차마다 비어 있을 수 있어 차입금별 직전 값으로 채움
+    sch["이자율"] = by_loan["이자율"].ffill().fillna(by_loan["이자율"].transform("first"))
+
+    principal = sch["원금상환예정액"].to_numpy()
+    rev_cum = sch["원금상환예정액"][::-1].groupby(sch["차입금명"][::-1], sort=False).cumsum()[::-1]
+    sch["상환전잔액"] = rev_cum.to_numpy()
+    sch["상환후잔액"] = sch["상환전잔액"].to_numpy() - principal
+
+    prev = by_loan["상환예정일"].shift(1)
+    sch["기간일수"] = (sch["상환예정일"] - prev).dt.days
+    sch["추정이자"] = (sch["상환전잔액"] * sch["이자율"] * sch["기간일수"] / DAY_BASIS).round(0)
+    return sch
+
+
+def project_loans(df: pd.DataFrame, accrual_date) -> dict[str, pd.DataFrame]:
+    """
+    기준일(연말 등) 이자경과 추정 + 기준일 이후 잔여 상환일정.
+    모든 차입금을 한 번에 배열 연산/groupby 로 계산.
+    - 기준일 잔액 = 기준일 이후 회차 원금상환예정액 합
+    - 경과일수 = 기준일 이전 마지막 상환예정일 다음 날 ~ 기준일
+      (예: 12.20 상환 → 12.21~31, 11일)
+    - 경과이자 = 기준일 잔액 × 이자율 × 경과일수 / 365
+    """
+    base = pd.Timestamp(accrual_date)
+    sch = loan_schedule(df)
+    future = (sch["상환예정일"] > base).to_numpy()
+    by_loan = sch.groupby("차입금명", sort=False)
+
+    in_year = (sch["상환예정일"].dt.year == base.year).to_numpy()
+    accrual = pd.DataFrame({
+        "이자율": by_loan["이자율"].last(),
+        "직전상환예정일": sch["상환예정일"].where(~future).groupby(sch["차입금명"], sort=False).max(),
+        "기준일": base,
+        "기준일잔액": sch["원금상환예정액"].where(future, 0.0).groupby(sch["차입금명"], sort=False).sum(),
+        "입력된 12.21-31예정액": sch["12.21-31예정액"].where(in_year).groupby(sch["차입금명"], sort=False).sum(min_count=1),
+    })
+    accrual["경과일수"] = (base - accrual["직전상환예정일"]).dt.days
+    # 경과이자는 반올림 전 일이자로 계산 (일이자 반올림 오차가 일수만큼 커지지 않게), 일이자는 표시용
+    accrual["경과이자(추정)"] = (
+        accrual["기준일잔액"] * accrual["이자율"] * accrual["경과일수"] / DAY_BASIS
+    ).round(0)
+    accrual["일이자"] = (accrual["기준일잔액"] * accrual["이자율"] / DAY_BASIS).round(0)
+    accrual["차이(추정-입력)"] = accrual["경과이자(추정)"] - accrual["입력된 12.21-31예정액"]
+    accrual = accrual.reset_index()[[
+        "차입금명", "이자율", "직전상환예정일", "기준일", "경과일수",
+        "기준일잔액", "일이자", "경과이자(추정)", "입력된 12.21-31예정액", "차이(추정-입력)",
+    ]]
+
+    remaining = sch.loc[future, [
+        "차입금명", "회차", "상환예정일", "상환전잔액", "원금상환예정액",
+        "기간일수", "이자율", "추정이자", "이자상환예정액", "상환후잔액",
+    ]].reset_index(drop=True)
+
+    return {"이자경과추정": accrual, "잔여상환일정": remaining}
+
+
+def _write_frame_sheet(wb_out, title: str, frame: pd.DataFrame):
+    """추정 결과 DataFrame → write-only 시트 (날짜/금액/이율 서식, 열 너비)"""
+    ws = wb_out.create_sheet(title)
+    fmts = {}
+    for c in frame.columns:
+        if pd.api.types.is_datetime64_any_dtype(frame[c]):
+            fmts[c] = DATE_FMT
+        elif c == "이자율":
+            fmts[c] = "0.000%"
+        elif c in ("경과일수", "기간일수"):
+            fmts[c] = "0"
+        elif pd.api.types.is_numeric_dtype(frame[c]) and c != "회차":
+            fmts[c] = NUM_FMT
+
+    for i, c in enumerate(frame.columns, start=1):
+        longest = frame[c].map(lambda v: len(f"{v:,.0f}") if isinstance(v, float) else len(str(v))).max()
+        width = max(len(str(c)) * 2, 0 if pd.isna(longest) else int(longest)) + 2
+        ws.column_dimensions[get_column_letter(i)].width = min(width, 40)
+    ws.freeze_panes = "A2"
+
+    ws.append(list(frame.columns))
+    for rec in frame.itertuples(index=False, name=None):
+        out_row = []
+        for c, v in zip(frame.columns, rec):
+            if v is None or (not isinstance(v, str) and pd.isna(v)):
+                out_row.append(None)
+                continue
+            if isinstance(v, pd.Timestamp):
+                v = v.to_pydatetime()
+            if c in fmts:
+                cell = WriteOnlyCell(ws, value=v)
+                cell.number_format = fmts[c]
+                v = cell
+            out_row.append(v)
+        ws.append(out_row)
+
+
+# ======================= 3) 통합결과 시트 1회 쓰기 =======================
+def write_loan_workbook(rows: list[list] | None, extra_sheets: dict | None = None) -> BytesIO:
+    """
+    헤더 + rows 를 write-only 시트에 한 번에 기록 (D~V 숫자 서식, 열 너비, 틀고정)
+    extra_sheets: {시트명: DataFrame} 추정 결과 시트 (통합결과 뒤에 추가)
+    """
+    wb_out = Workbook(write_only=True)
+    ws_out = wb_out.create_sheet("통합결과")
+
+    if rows is not None:
+        # 열 너비: 헤더 포함 각 열의 가장 긴 값 + 2 (write-only 는 행보다 먼저 지정)
+        widths = [len(str(h)) for h in LOAN_HEADERS]
+        for row in rows:
+            for i, v in enumerate(row):
+                if v is not None:
+                    widths[i] = max(widths[i], len(str(v)))
+        for i, w in enumerate(widths, start=1):
+            ws_out.column_dimensions[get_column_letter(i)].width = w + 2
+        ws_out.freeze_panes = "A2"
 
-    # 4) 상환예정일별 소계 + 총계 계산
-    new_body = []
-    current_date = None
-    group_acc = None
-    total_acc = [0] * len(header)  # 총계용 누적
-
-    def make_subtotal_row(date_value, acc):
-        """현재 그룹(acc)에 대한 소계 행 생성"""
-        if acc is None:
-            return None
-        row = [None] * len(header)
-        row[0] = "소계"
-        row[2] = date_value
-        for i in range(3, len(header)):  # D열 이후 숫자 합계
-            if acc[i] != 0:
-                row[i] = acc[i]
-        return row
-
-    for row in body_sorted:
-        row_date = row[2]
-
-        # 날짜가 바뀌는 시점에 소계 한 줄 삽입
-        if current_date is not None and row_date != current_date:
-            subtotal_row = make_subtotal_row(current_date, group_acc)
-            if subtotal_row:
-                new_body.append(subtotal_row)
-            group_acc = None  # 새 그룹 시작
-
-        # 그룹 누적 초기화
-        if group_acc is None:
-            group_acc = [0] * len(header)
-
-        # 숫자 컬럼 누적 (D열 이후)
-        for i, v in enumerate(row):
-            if i >= 3 and isinstance(v, (int, float)):
-                group_acc[i] += v
-                total_acc[i] += v
-
-        new_body.append(list(row))
-        current_date = row_date
-
-    # 마지막 그룹 소계
-    if current_date is not None:
-        subtotal_row = make_subtotal_row(current_date, group_acc)
-        if subtotal_row:
-            new_body.append(subtotal_row)
-
-    # 총계 행
-    total_row = [None] * len(header)
-    total_row[0] = "총계"
-    for i in range(3, len(header)):
-        if total_acc[i] != 0:
-            total_row[i] = total_acc[i]
-    # 소계들 아래에 한 줄 비우고 총계 추가
-    new_body.append([None] * len(header))
-    new_body.append(total_row)
-
-    # 5) 시트 갈아엎고 다시 쓰기
-    wb_out.remove(ws_out)
-    ws_out = wb_out.create_sheet("통합결과", 0)
-    ws_out.append(header)
-    for row in new_body:
-        ws_out.append(row)
-
-    # 6) 숫자 서식 D~V 적용
-    for row in ws_out.iter_rows(min_row=2, min_col=4, max_col=22):
-        for cell in row:
-            if isinstance(cell.value, (int, float)):
-                cell.number_format = "#,##0"
-
-    # 7) 열 너비 자동 조정 + 틀고정
-    for col in ws_out.columns:
-        max_len = 0
-        col_letter = get_column_letter(col[0].column)
-        for cell in col:
-            if cell.value is not None:
-                max_len = max(max_len, len(str(cell.value)))
-        ws_out.column_dimensions[col_letter].width = max_len + 2
-
-    ws_out.freeze_panes = "A2"
+    ws_out.append(LOAN_HEADERS)
+    for row in rows or []:
+        out_row = list(row)
+        for i in NUM_FMT_COLS:
+            v = out_row[i]
+            if isinstance(v, (int, float)):
+                cell = WriteOnlyCell(ws_out, value=v)
+                cell.number_format = NUM_FMT
+                out_row[i] = cell
+        ws_out.append(out_row)
+
+    for title, frame in (extra_sheets or {}).items():
+        _write_frame_sheet(wb_out, title, frame)
 
     output = BytesIO()
     wb_out.save(output)
     output.seek(0)
     return output
 
-    # ======================= 연도 필터(C열) =======================
-    year_prefix = (year_prefix or "").strip()
-    if year_prefix:
-        all_rows = [[c for c in row] for row in ws_out.iter_rows(values_only=True)]
-        header = all_rows[0]
-        body = all_rows[1:]
-
-        filtered = []
-        for row in body:
-            val = row[2]
-            if val is None:
-                continue
-            if str(val).startswith(year_prefix):
-                filtered.append(row)
-
-        wb_out.remove(ws_out)
-        ws_out = wb_out.create_sheet("통합결과", 0)
-        ws_out.append(header)
-        for row in filtered:
-            ws_out.append(row)
-
-    # ======================= 숫자 서식 D~V =======================
-    for row in ws_out.iter_rows(min_row=2, min_col=4, max_col=22):
-        for cell in row:
-            if isinstance(cell.value, (int, float)):
-                cell.number_format = "#,##0"
-
-    # ======================= 열 너비 자동 조정 =======================
-    for col in ws_out.columns:
-        max_len = 0
-        col_letter = get_column_letter(col[0].column)
-        for cell in col:
-            if cell.value is not None:
-                max_len = max(max_len, len(str(cell.value)))
-        ws_out.column_dimensions[col_letter].width = max_len + 2
-
-    ws_out.freeze_panes = "A2"
 
-    output = BytesIO()
-    wb_out.save(output)
-    output.seek(0)
-    return output
+def make_loan_workbook(uploaded_files, year_prefix: str, accrual_date=None) -> tuple[BytesIO, list[str]]:
+    """
+    반환: (통합 파일, 읽기 경고 목록)
+    accrual_date 를 주면 이자경과추정/잔여상환일정 시트 추가 (연도 필터와 무관하게 전체 일정 기준)
+    """
+    rows, warnings = collect_loan_rows(uploaded_files)
+    if not rows:
+        return write_loan_workbook(None), warnings
+    df = loan_frame(rows)
+    extra = project_loans(df, accrual_date) if accrual_date is not None else None
+    return write_loan_workbook(consolidate_loans(df, year_prefix), extra), warnings
 
 
 # ======================= Streamlit 화면 =======================
@@ -237,11 +400,23 @@ def run():
 
     year = st.text_input("정리할 연도 (예: 2025) — 비워두면 전체 포함", value="")
 
+    with_projection = st.checkbox("이자경과 추정 · 잔여상환일정 시트 추가", value=True)
+    accrual_date = None
+    if with_projection:
+        base_year = int(year) if year.strip().isdigit() else date.today().year
+        accrual_date = st.date_input("이자경과 기준일", value=date(base_year, 12, 31))
+
     if st.button("📊 통합 파일 생성"):
         if not files:
             st.warning("먼저 파일을 업로드하세요.")
         else:
-            output = make_loan_workbook(files, year)
+            # 서버 작업 스케줄러 경유 (동시 실행 수 / 메모리 한도 초과 시 대기)
+            output, warnings = run_admitted(
+                "차입금 통합", lambda report: make_loan_workbook(files, year, accrual_date),
+                cost=estimate_memory(files),
+            )
+            for w in warnings:
+                st.warning(f"⚠️ {w}")
             st.success("완료되었습니다!")
             st.download_button(
                 label="📥 차입금 통합결과 다운로드",
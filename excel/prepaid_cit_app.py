@@ -7,42 +7,39 @@ import pandas as pd
 import streamlit as st
 from openpyxl.utils import get_column_letter
 
+from excel.excel_io import read_upload_filtered
+from excel.jobs import estimate_memory, run_admitted
+from excel.result_cache import cached_result, result_key
+from excel.schema import resolve, warn_if_moved
 
-def run():
-
-    st.title("🧾 선급법인세 취합")
 
-    st.write("여러 엑셀을 업로드하면 선급법인세 자료를 제목행 포함 통합파일로 생성합니다.")
-
-    uploaded = st.file_uploader(
-        "엑셀 파일 업로드 (여러 개 가능)",
-        type=["xlsx", "xlsm"],
-        accept_multiple_files=True,
-    )
-
-    if not uploaded:
-        st.info("파일을 업로드하면 취합이 시작됩니다.")
-        return
-
-    # 가져올 열 (B, D, E, F, H, I, J, K, L)
-    PICK_IDXS = [1, 3, 4, 5, 7, 8, 9, 10, 11]
+def collect_prepaid(uploaded) -> dict:
+    """
+    업로드 파일들 → {"out": 통합 DataFrame 또는 None, "fail": [(파일, 사유)],
+                     "moved": [열 위치가 기본과 다른 양식 해석 결과], "xlsx": 통합파일 bytes 또는 None}
+    """
+    # 가져올 열 (기본 B, D, E, F, H, I, J, K, L) → schema "prepaid_cit" 로 파일 헤더별 위치 해석
 
     frames = []
     fail = []
+    moved = []
 
     for f in uploaded:
         try:
-            df = pd.read_excel(f, sheet_name=0, header=None)
-
-            # 원본 1행 제거
-            df = df.iloc[1:, :].dropna(how="all").reset_index(drop=True)
-
-            max_col = df.shape[1]
-            if any(i >= max_col for i in PICK_IDXS):
-                fail.append((f.name, "필요한 열이 부족합니다"))
-                continue
-
-            sub = df.iloc[:, PICK_IDXS].copy()
+            # 원본 1행(제목) 제외, 빈 행 제외하고 묶음 단위로 읽은 뒤 필요한 열만 추림
+            # (열 부족 시 ValueError → 아래 except 에서 실패 목록으로)
+            sub = read_upload_filtered(
+                f, header=0,
+                keep=lambda b: b.notna().any(axis=1),
+            )
+            layout = resolve("prepaid_cit", list(sub.columns))
+            pick_idxs = list(layout["cols"].values())
+            if sub.shape[1] <= max(pick_idxs):
+                raise ValueError("필요한 열이 부족합니다")
+            if layout["moved"]:
+                moved.append(layout)
+            sub = sub.iloc[:, pick_idxs]
+            sub.columns = list(layout["cols"])   # 파일마다 위치가 달라도 역할 이름으로 맞춰 합침
 
             # ✅ 확장자 제거된 파일명만 사용
             filename = Path(f.name).stem
@@ -54,10 +51,7 @@ def run():
             fail.append((f.name, str(e)))
 
     if not frames:
-        st.error("취합할 데이터가 없습니다.")
-        if fail:
-            st.write(pd.DataFrame(fail, columns=["파일", "사유"]))
-        return
+        return {"out": None, "fail": fail, "moved": moved, "xlsx": None}
 
     out = pd.concat(frames, ignore_index=True)
 
@@ -75,9 +69,6 @@ def run():
         "수입계정",
     ]
 
-    st.success(f"취합 완료: {len(out):,}행")
-    st.dataframe(out, use_container_width=True)
-
     # 엑셀 저장
     buf = BytesIO()
     with pd.ExcelWriter(buf, engine="openpyxl") as writer:
@@ -98,11 +89,48 @@ def run():
         # (보너스) 제목행 고정
         ws.freeze_panes = "A2"
 
-    buf.seek(0)
+    return {"out": out, "fail": fail, "moved": moved, "xlsx": buf.getvalue()}
+
+
+def run():
+
+    st.title("🧾 선급법인세 취합")
+
+    st.write("여러 엑셀을 업로드하면 선급법인세 자료를 제목행 포함 통합파일로 생성합니다.")
+
+    uploaded = st.file_uploader(
+        "엑셀 파일 업로드 (여러 개 가능)",
+        type=["xlsx", "xlsm", "xls"],
+        accept_multiple_files=True,
+    )
+
+    if not uploaded:
+        st.info("파일을 업로드하면 취합이 시작됩니다.")
+        return
+
+    # 같은 파일 묶음(내용 + 파일명 + 순서)이면 재실행 시 이전 결과 재사용
+    key = result_key("prepaid_cit", uploaded, {"names": tuple(f.name for f in uploaded)})
+    # 처음 취합은 서버 작업 스케줄러 경유 (동시 실행 수 / 메모리 한도 초과 시 대기)
+    result = cached_result(key, lambda: run_admitted(
+        "선급법인세 취합", lambda report: collect_prepaid(uploaded), cost=estimate_memory(uploaded),
+    ))
+
+    for layout in result["moved"]:
+        warn_if_moved(layout)
+
+    out, fail = result["out"], result["fail"]
+    if out is None:
+        st.error("취합할 데이터가 없습니다.")
+        if fail:
+            st.write(pd.DataFrame(fail, columns=["파일", "사유"]))
+        return
+
+    st.success(f"취합 완료: {len(out):,}행")
+    st.dataframe(out, use_container_width=True)
 
     st.download_button(
         "📥 통합파일 다운로드 (XLSX)",
-        data=buf,
+        data=result["xlsx"],
         file_name="선급법인세_통합.xlsx",
         mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
     )
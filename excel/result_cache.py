@@ -0,0 +1,102 @@
+# result_cache.py
+# -*- coding: utf-8 -*-
+"""
+도구 결과 메모리 캐시 (Streamlit 재실행 대비)
+- 위젯을 누를 때마다(다운로드 버튼 포함) 스크립트 전체가 다시 돌므로
+  (도구, 옵션, 업로드 파일 내용 해시) 가 같으면 이전 결과를 그대로 돌려줌
+- 용량(바이트) 한도 LRU: 한도를 넘으면 가장 오래 안 쓴 결과부터 버림
+- 메모리에만 보관 (디스크 기록 없음 → 업로드 파일 서버 미보관 원칙 유지)
+"""
+from __future__ import annotations
+
+import sys
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+import pandas as pd
+
+from excel.excel_io import content_hash, upload_bytes
+
+RESULT_BUDGET_BYTES = 256 * 1024 * 1024   # 전체 결과 보관 한도
+
+_RESULTS: OrderedDict = OrderedDict()   # 키 → (결과, 크기)
+_LOCK = threading.Lock()                # 세션(스레드) 간 공유
+_USED = 0
+
+
+def result_size(value) -> int:
+    """결과 크기 추정 (bytes / BytesIO / DataFrame / 컨테이너는 안쪽까지)"""
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, BytesIO):
+        return value.getbuffer().nbytes
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(result_size(k) + result_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set)):
+        return sys.getsizeof(value) + sum(result_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+def _freeze(value):
+    """BytesIO 는 bytes 로 바꿔 보관 (읽기 위치 공유 문제 없이 여러 번 내려받기)"""
+    if isinstance(value, BytesIO):
+        return value.getvalue()
+    if isinstance(value, tuple):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def result_key(tool: str, uploads, options: dict | None = None) -> tuple:
+    """(도구, 옵션, 업로드 파일 내용 해시들) — 파일 순서도 키에 포함"""
+    digests = tuple(content_hash(upload_bytes(f)) for f in uploads)
+    opts = tuple(sorted((options or {}).items()))
+    return (tool, opts, digests)
+
+
+def cached_result(key: tuple, compute):
+    """
+    key 결과가 있으면 그대로, 없으면 compute() 결과를 보관 후 반환
+    - 예외는 보관하지 않음 (다음 실행에서 다시 시도)
+    - 한도보다 큰 결과는 보관하지 않고 돌려주기만 함
+    """
+    global _USED
+    with _LOCK:
+        hit = _RESULTS.get(key)
+        if hit is not None:
+            _RESULTS.move_to_end(key)
+            return hit[0]
+
+    value = _freeze(compute())
+    size = result_size(value)
+    if size > RESULT_BUDGET_BYTES:
+        return value
+
+    with _LOCK:
+        if key in _RESULTS:
+            _USED -= _RESULTS.pop(key)[1]
+        _RESULTS[key] = (value, size)
+        _USED += size
+        while _USED > RESULT_BUDGET_BYTES and _RESULTS:
+            _, (_, old) = _RESULTS.popitem(last=False)
+            _USED -= old
+    return value
+
+
+def get_result(key: tuple):
+    """보관된 결과 (없으면 None)"""
+    with _LOCK:
+        hit = _RESULTS.get(key)
+        if hit is None:
+            return None
+        _RESULTS.move_to_end(key)
+        return hit[0]
+
+
+def has_result(key: tuple) -> bool:
+    with _LOCK:
+        return key in _RESULTS
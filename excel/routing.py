@@ -0,0 +1,175 @@
+# routing.py
+# -*- coding: utf-8 -*-
+"""
+행 → 결과 시트 분류 엔진 (규칙은 excel/routing_config.py)
+- 값 규칙은 조회표 하나, 패턴 규칙은 결합 정규식 하나로 컴파일 (경로별 1회)
+- 모든 행에 대해 '먼저 맞은 규칙 번호'를 열 단위로 한 번에 계산
+- 시트 분리는 그 결과로 groupby 1회 (시트마다 전체를 다시 훑지 않음)
+"""
+from __future__ import annotations
+
+import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from excel.routing_config import ROUTES
+from excel.schema import index_to_letter, resolve
+
+
+def _col_letter_to_idx(letter: str) -> int:
+    n = 0
+    for ch in letter.upper():
+        n = n * 26 + (ord(ch) - ord("A") + 1)
+    return n - 1
+
+
+def _text(s: pd.Series) -> pd.Series:
+    """분류용 글자 (공란 → '', 앞뒤 공백 제거)"""
+    return s.where(s.notna(), "").astype(str).str.strip()
+
+
+def _column(df: pd.DataFrame, letter: str, header: str | None = None) -> pd.Series:
+    if header:
+        for i, c in enumerate(df.columns):
+            if header in str(c).strip():
+                return df.iloc[:, i]
+    idx = _col_letter_to_idx(letter)
+    if idx >= df.shape[1]:
+        raise ValueError(f"{letter}열이 없습니다(컬럼 수 부족). 원본 파일 형식 확인 필요.")
+    return df.iloc[:, idx]
+
+
+def _key_column(df: pd.DataFrame, spec: dict) -> pd.Series:
+    """분류 기준 열: schema 가 있으면 양식 해석 결과(헤더 지문 캐시)의 역할 위치, 없으면 열문자/헤더"""
+    if spec.get("schema"):
+        idx = resolve(spec["schema"], list(df.columns))["cols"][spec["key"]]
+        if idx is None or idx >= df.shape[1]:
+            where = spec["key"] if idx is None else f"{index_to_letter(idx)}열"
+            raise ValueError(f"{where}이 없습니다(컬럼 수 부족). 원본 파일 형식 확인 필요.")
+        return df.iloc[:, idx]
+    return _column(df, spec["key"], spec.get("key_header"))
+
+
+# =========================== 컴파일 ===========================
+@lru_cache(maxsize=None)
+def compile_route(name: str) -> dict:
+    """
+    ROUTES[name] → 분류용 구조 (경로별 1회만 만들고 재사용)
+    - table    : 값 → 먼저 맞는 규칙 번호 (and 조건 없는 values 규칙)
+    - regex    : 패턴 규칙 결합 정규식. 규칙 순서대로 시도해 처음 맞은 가지의 이름(r번호)만 잡힘
+    - guarded  : and 조건이 붙은 규칙 [(번호, 값 집합, 패턴, {열문자: 정규식})]
+    """
+    spec = ROUTES[name]
+    rules = spec["rules"]
+
+    table, branches, guarded = {}, [], []
+    for i, rule in enumerate(rules):
+        if rule.get("and"):
+            conds = {col: re.compile(pat) for col, pat in rule["and"].items()}
+            guarded.append((i, set(rule.get("values", [])), rule.get("regex"), conds))
+            continue
+        for v in rule.get("values", []):
+            table.setdefault(v, i)
+        if rule.get("regex"):
+            # 빈 이름 그룹 + 전방탐색: 가지 순서 = 규칙 우선순위, 위치와 무관하게 re.search 와 같은 판정
+            branches.append(f"(?P<r{i}>)(?=[\\s\\S]*?(?:{rule['regex']}))")
+
+    sheets = [r["sheet"] for r in rules]
+    default = spec.get("default")
+    order = spec.get("order") or list(dict.fromkeys(sheets + ([default] if default else [])))
+    always = spec.get("always", [])
+    return {
+        "spec": spec,
+        "n": len(rules),
+        "table": table,
+        "regex": re.compile("^(?:" + "|".join(branches) + ")") if branches else None,
+        "guarded": guarded,
+        "targets": np.array(sheets + [default], dtype=object),
+        "order": order,
+        "always": order if always is True else list(always),
+    }
+
+
+# =========================== 분류 ===========================
+def route_ranks(df: pd.DataFrame, name: str) -> tuple[np.ndarray, pd.Series]:
+    """
+    행마다 먼저 맞은 규칙 번호 (어느 규칙에도 안 맞으면 규칙 수 = default)
+    반환: (번호 배열, 분류 기준 key 글자)
+    """
+    c = compile_route(name)
+    spec = c["spec"]
+    n = c["n"]
+    key = _text(_key_column(df, spec))
+    rank = np.full(len(df), n, dtype=np.int64)
+    if not len(df):
+        return rank, key
+
+    if c["table"]:
+        hit = key.map(c["table"]).fillna(n).to_numpy(dtype=np.int64)
+        rank = np.minimum(rank, hit)
+
+    if c["regex"] is not None:
+        groups = key.str.extract(c["regex"])
+        matched = groups.notna().to_numpy()
+        rule_no = np.array([int(g[1:]) for g in groups.columns], dtype=np.int64)
+        hit = np.where(matched.any(axis=1), rule_no[matched.argmax(axis=1)], n)
+        rank = np.minimum(rank, hit)
+
+    for i, values, pattern, conds in c["guarded"]:
+        m = np.zeros(len(df), dtype=bool)
+        if values:
+            m |= key.isin(values).to_numpy()
+        if pattern:
+            m |= key.str.contains(pattern, regex=True).to_numpy()
+        for letter, rx in conds.items():
+            m &= _text(_column(df, letter)).str.contains(rx).to_numpy()
+        rank = np.where(m & (i < rank), i, rank)
+
+    return rank, key
+
+
+def assign_routes(df: pd.DataFrame, name: str) -> pd.Series:
+    """행별 결과 시트명 (categorical, 범주 순서 = 시트 순서, 버리는 행은 NaN)"""
+    c = compile_route(name)
+    rank, key = route_ranks(df, name)
+    dest = c["targets"][rank]
+    if c["spec"].get("skip_blank"):
+        dest = np.where(key.ne("").to_numpy(), dest, None)
+    categories = list(dict.fromkeys(c["order"] + [t for t in c["targets"] if t is not None]))
+    return pd.Series(pd.Categorical(dest, categories=categories), index=df.index)
+
+
+def split_by_route(df: pd.DataFrame, name: str) -> dict[str, pd.DataFrame]:
+    """
+    df → {시트명: DataFrame} (order 순서, always 시트는 행이 없어도 빈 시트)
+    행 분류 1회 + groupby 1회
+    """
+    c = compile_route(name)
+    spec = c["spec"]
+    rank, key = route_ranks(df, name)
+    dest = c["targets"][rank]
+    keep = pd.notna(dest)
+    if spec.get("skip_blank"):
+        keep &= key.ne("").to_numpy()
+    pos = np.flatnonzero(keep)
+
+    if spec.get("sort_by_key"):
+        # default 로 모인 행은 key 순으로 묶고(-1), 규칙으로 옮겨온 행은 규칙 순서대로 그 뒤에
+        sort_rank = np.where(rank == c["n"], -1, rank)
+        frame = pd.DataFrame({"r": sort_rank[pos], "k": key.to_numpy()[pos], "p": pos})
+        pos = frame.sort_values(["r", "k"], kind="mergesort")["p"].to_numpy()
+
+    picked = df.iloc[pos]
+    groups = dict(tuple(picked.groupby(dest[pos], sort=False))) if len(pos) else {}
+
+    out = {}
+    for sheet in c["order"]:
+        if sheet in groups:
+            out[sheet] = groups[sheet]
+        elif sheet in c["always"]:
+            out[sheet] = df.iloc[0:0]
+    for sheet, part in groups.items():  # order 에 없는 시트는 뒤에
+        out.setdefault(sheet, part)
+    return out
@@ -0,0 +1,112 @@
+# routing_config.py
+# -*- coding: utf-8 -*-
+"""
+행 → 결과 시트 분류 규칙 (excel/routing.py 가 읽어 한 번에 분류)
+
+경로(route) 1개 형식
+- key         : 분류 기준 열 (열문자, 넘겨받은 DataFrame 위치 기준)
+- schema      : (선택) 양식 이름 (excel/schema.py). 있으면 key 는 그 양식의 역할 이름
+- key_header  : (선택) 헤더에 이 글자가 들어간 첫 열을 key 로 우선 사용
+- rules       : 위에서부터 먼저 맞은 규칙의 시트로 보냄
+    · values : key 값(앞뒤 공백 제거)이 이 중 하나
+    · regex  : key 값에 이 패턴이 있음 (re.search)
+    · and    : (선택) {열문자: 패턴} 다른 열 조건도 함께 만족해야 함
+- default     : 어느 규칙에도 안 맞는 행의 시트 (None 이면 버림)
+- skip_blank  : key 가 공란인 행은 버림
+- sort_by_key : 시트 안에서 default 로 모인 행을 key 순으로 묶고, 규칙으로 옮겨온 행은 그 뒤에
+- order       : (선택) 시트 순서. 없으면 규칙 순서 → default
+- always      : 행이 없어도 만드는 시트 (True 면 전부)
+"""
+from __future__ import annotations
+
+from typing import Dict
+
+ROUTES: Dict[str, dict] = {
+    # ---------------------------------------------------
+    # 지출계좌 재원 검증 (원장 기본엑셀 지출계좌, 기본 V열)
+    # ---------------------------------------------------
+    "expense_grad": {
+        "schema": "ledger_basic",
+        "key": "pay_account",
+        "rules": [
+            {"sheet": "대학원비등록금운영비", "values": ["대학원비등록금운영비(하나17804)"]},
+            {"sheet": "국제법률대학원", "values": [
+                "국제법률대여장학금(하나56104)",
+                "국제법률장학금(하나55404)",
+                "국제법률기타수익(하나57704)",
+            ]},
+            {"sheet": "대학원기부금", "values": ["대학원기부금(하나58304)"]},
+            {"sheet": "대학원임의기금", "values": ["대학원임의기금지급(하나45704)"]},
+            {"sheet": "아동양육", "values": ["아동양육상담 부모콜센터_보탬e(농협7628-91)"]},
+            {"sheet": "최고경영자", "values": ["최고경영자(하나59004)"]},
+        ],
+        "default": None,
+        "always": True,
+    },
+    "expense_kyobi": {
+        "schema": "ledger_basic",
+        "key": "pay_account",
+        "rules": [
+            {"sheet": "비등록금운영비", "values": ["비등록금운영비(하나20104)"]},
+            {"sheet": "지정기부금", "values": ["지정기부금(하나32104)"]},
+            {"sheet": "임의기금지급", "values": ["임의기금지급(하나50204)", "임의기금지급_감가상각(하나69104)"]},
+            {"sheet": "대학교회", "values": ["대학교회한국어(하나41404)"]},
+            {"sheet": "기부부동산", "values": ["기부부동산임대(하나59204)"]},
+            {"sheet": "교비일반장학", "values": []},
+            {"sheet": "연구소기부금", "values": ["연구소기부금(하나41104)"]},
+            {"sheet": "제네시스랩", "values": ["제네시스랩수입(하나57804)"]},
+        ],
+        "default": "그외",
+        "always": True,
+    },
+
+    # ---------------------------------------------------
+    # 기금재원정리 (원장 기본엑셀 임의기금 구분, 기본 X열)
+    # ---------------------------------------------------
+    "fund": {
+        "schema": "ledger_basic",
+        "key": "fund",
+        "rules": [
+            {"sheet": "연구기금", "regex": r"^\(임의_연구\)"},
+            {"sheet": "장학기금", "regex": r"^\(임의_장학\)"},
+            {"sheet": "건축기금", "regex": r"^\(임의_건축\)"},
+            {"sheet": "특목기금", "regex": r"^\(임의_기타\)"},
+        ],
+        "default": None,
+        "always": True,
+    },
+
+    # ---------------------------------------------------
+    # 출연받은재산 정리 (F/H/I/J 삭제 후 I열 부서, P열 적요)
+    # ---------------------------------------------------
+    "donation_gb": {
+        "key": "I",
+        "skip_blank": True,
+        "rules": [
+            {"sheet": "CCF", "values": ["학생지원팀"], "and": {"P": r"\(지정\)장학 기부금\(CCF\)"}},
+            {"sheet": "지정기부금", "values": ["학생지원팀"],
+             "and": {"P": r"\(지정\)기타 지정기부금|\(지정\)총학생회 기부금"}},
+            {"sheet": "교비일반장학", "values": ["학생지원팀"]},
+            {"sheet": "공시학부", "values": ["공간환경시스템공학부"]},
+            {"sheet": "연구소기부", "values": ["산학연구지원팀"]},
+            {"sheet": "비서실", "values": ["비서실"]},
+            {"sheet": "대외협력팀", "values": ["대외협력팀"]},
+            {"sheet": "대학교회", "values": ["대학교회"]},
+        ],
+        "default": "지정기부금",
+        "sort_by_key": True,
+        "order": ["대외협력팀", "대학교회", "비서실", "지정기부금", "CCF", "교비일반장학", "공시학부", "연구소기부"],
+        "always": ["지정기부금"],
+    },
+    "donation_grad": {
+        "key": "I",
+        "key_header": "부서",
+        "skip_blank": True,
+        "rules": [
+            {"sheet": "국제법률대학원", "values": ["국제법률대학원"]},
+        ],
+        "default": "대학원기부금",
+        "sort_by_key": True,
+        "always": ["대학원기부금"],
+    },
+}
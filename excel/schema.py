@@ -0,0 +1,212 @@
+# schema.py
+# -*- coding: utf-8 -*-
+"""
+업로드 양식(내보내기 형식)별 열 위치 해석
+- 양식마다 역할(role) → 기본 열문자 / 헤더 후보 정의 (SCHEMAS)
+- 헤더 행 지문(정규화한 헤더 글자의 해시)마다 한 번만 해석해 {역할: 위치} 를 캐시
+  (같은 양식 파일을 다시 올리거나 스트리밍 묶음마다 물어도 재계산 없음)
+- 헤더 후보가 있으면 헤더로 먼저 찾고, 없으면 기본 열문자 위치
+- 헤더로 찾은 위치가 기본 열문자와 다르면 moved 로 기록 → 열이 추가/이동된 양식 경고
+- 헤더가 없는 열(열문자 목록)은 resolve_letters: 왼쪽의 헤더로 찾은 열이 밀린 만큼 같이 이동
+"""
+from __future__ import annotations
+
+import hashlib
+
+import streamlit as st
+
+# ---------------------------------------------------
+# 양식 정의
+# 역할 속성
+# - letter   : 기본 위치 (열문자). 헤더로 못 찾으면 이 위치
+# - headers  : 헤더 후보
+# - contains : True 면 헤더에 후보 글자가 들어가면 일치 (기본: 앞뒤 공백 제거 후 완전 일치)
+# - first    : "keyword"(기본) 후보 순서 우선 / "column" 왼쪽 열 우선
+# ---------------------------------------------------
+ACCOUNT_KEYWORDS = ["계정과목", "계정명", "계정"]
+LINE_KEYWORDS = ["라인", "순번", "행번호"]
+PAY_ACCOUNT_KEYWORDS = ["지출계좌", "출금계좌"]
+FUND_KEYWORDS = ["임의기금", "기금구분"]
+LAST_ROW_KEYWORDS = ["입력자", "작성자", "등록자"]
+
+SCHEMAS = {
+    # 회계-장부관리-원장 → 기본엑셀 (지출계좌 검증, 기금재원정리)
+    "ledger_basic": {
+        "label": "원장 기본엑셀",
+        "columns": {
+            "account": {"letter": "E", "headers": ACCOUNT_KEYWORDS, "contains": True},
+            "pay_account": {"letter": "V", "headers": PAY_ACCOUNT_KEYWORDS, "contains": True},
+            "fund": {"letter": "X", "headers": FUND_KEYWORDS, "contains": True},
+            "source": {"headers": ["재원"]},   # 없으면 임의기금 열(X)로 정렬
+            "debit": {"headers": ["차변"]},
+            "credit": {"headers": ["대변"]},
+        },
+    },
+    # 회계-장부관리-원장 → 엑셀파일 (원장 통합, 통합 원장 조회)
+    "ledger_file": {
+        "label": "원장 엑셀파일",
+        "columns": {
+            "voucher": {"letter": "M", "headers": ["전표번호"]},
+            "debit": {"letter": "U", "headers": ["차변"]},
+            "credit": {"letter": "V", "headers": ["대변"]},
+            "last_row": {"letter": "AB", "headers": LAST_ROW_KEYWORDS},
+            "account": {"headers": ACCOUNT_KEYWORDS, "contains": True},
+            "date": {"headers": ["일자"], "contains": True},
+            "line": {"headers": LINE_KEYWORDS, "contains": True},
+            "vendor": {"headers": ["거래처"], "contains": True, "first": "column"},
+        },
+    },
+    # 홈택스 세금계산서 목록
+    "hometax": {
+        "label": "홈택스",
+        "columns": {
+            "key": {"letter": "B", "headers": ["공급자등록번호", "사업자등록번호"], "contains": True, "first": "column"},
+            "supply": {"headers": ["공급가액"], "contains": True, "first": "column"},
+            "tax": {"headers": ["세액"], "contains": True, "first": "column"},
+            "total": {"headers": ["합계금액", "발생금액"], "contains": True, "first": "column"},
+            "date": {"headers": ["작성일자", "발급일자", "일자"], "contains": True, "first": "column"},
+            "id": {"headers": ["승인번호"], "contains": True, "first": "column"},
+        },
+    },
+    # 학사 세금계산서 목록
+    "haksa": {
+        "label": "학사",
+        "columns": {
+            "key": {"headers": ["사업자번호"], "contains": True, "first": "column"},
+            "supply": {"headers": ["공급가액"], "contains": True, "first": "column"},
+            "tax": {"headers": ["세액"], "contains": True, "first": "column"},
+            "total": {"headers": ["합계금액", "발생금액"], "contains": True, "first": "column"},
+            "vendor": {"headers": ["거래처명", "상호"], "contains": True, "first": "column"},
+            "date": {"headers": ["작성일자", "발행일자", "일자"], "contains": True, "first": "column"},
+            "id": {"headers": ["전표번호", "승인번호"], "contains": True, "first": "column"},
+        },
+    },
+    # 선급법인세 자료 (B, D, E, F, H, I, J, K, L / 회계단위는 파일명)
+    "prepaid_cit": {
+        "label": "선급법인세",
+        "columns": {
+            "연월일": {"letter": "B", "headers": ["연월일"]},
+            "예적금명": {"letter": "D", "headers": ["예적금명"]},
+            "예치기관": {"letter": "E", "headers": ["예치기관"]},
+            "사업자번호": {"letter": "F", "headers": ["사업자번호"]},
+            "세율": {"letter": "H", "headers": ["세율"]},
+            "과세표준(수입이자)": {"letter": "I", "headers": ["과세표준(수입이자)"]},
+            "선급법인세": {"letter": "J", "headers": ["선급법인세"]},
+            "법인지방소득세": {"letter": "K", "headers": ["법인지방소득세"]},
+            "수입계정": {"letter": "L", "headers": ["수입계정"]},
+        },
+    },
+}
+
+MAX_LAYOUTS = 64
+_LAYOUTS: dict = {}   # (양식, 헤더 지문) → 해석 결과
+
+
+def letter_to_index(letter: str) -> int:
+    """A->0, B->1, ... AA->26"""
+    n = 0
+    for ch in letter.upper():
+        n = n * 26 + (ord(ch) - ord("A") + 1)
+    return n - 1
+
+
+def index_to_letter(idx: int) -> str:
+    s = ""
+    idx += 1
+    while idx:
+        idx, r = divmod(idx - 1, 26)
+        s = chr(ord("A") + r) + s
+    return s
+
+
+def _header_texts(header) -> tuple:
+    return tuple("" if v is None else str(v).strip() for v in header)
+
+
+def header_fingerprint(header) -> str:
+    """헤더 행 지문 (열 순서 포함, 앞뒤 공백 무시)"""
+    return hashlib.sha1("\x1f".join(_header_texts(header)).encode("utf-8")).hexdigest()
+
+
+def _find(texts, spec):
+    heads = spec.get("headers") or []
+    if spec.get("contains"):
+        def hit(h, k):
+            return k in h
+    else:
+        def hit(h, k):
+            return h == k
+
+    if spec.get("first") == "column":
+        for i, h in enumerate(texts):
+            if any(hit(h, k) for k in heads):
+                return i
+        return None
+    for k in heads:
+        for i, h in enumerate(texts):
+            if hit(h, k):
+                return i
+    return None
+
+
+def resolve(schema: str, header) -> dict:
+    """
+    양식 + 헤더 행 → {"cols": {역할: 위치(0부터) 또는 None}, "moved": [(역할, 기본열, 실제열)], ...}
+    - 기본 열문자 위치는 헤더 길이와 무관하게 돌려줌 (범위 확인은 호출하는 쪽)
+    - 헤더 지문별 캐시
+    """
+    texts = _header_texts(header)
+    fp = header_fingerprint(texts)
+    cached = _LAYOUTS.get((schema, fp))
+    if cached is not None:
+        return cached
+
+    spec = SCHEMAS[schema]
+    cols, moved, anchors = {}, [], []
+    for role, rule in spec["columns"].items():
+        idx = _find(texts, rule)
+        letter = rule.get("letter")
+        if idx is None:
+            idx = letter_to_index(letter) if letter else None
+        elif letter:
+            anchors.append((letter_to_index(letter), idx - letter_to_index(letter)))
+            if idx != letter_to_index(letter):
+                moved.append((role, letter, index_to_letter(idx)))
+        cols[role] = idx
+
+    layout = {
+        "schema": schema, "label": spec["label"], "fingerprint": fp,
+        "cols": cols, "moved": moved, "anchors": sorted(anchors),
+    }
+    if len(_LAYOUTS) >= MAX_LAYOUTS:
+        _LAYOUTS.pop(next(iter(_LAYOUTS)))
+    _LAYOUTS[(schema, fp)] = layout
+    return layout
+
+
+def resolve_letters(layout: dict, letters) -> list:
+    """
+    기본 양식 열문자 목록 → 이 양식에서의 위치(0부터)
+    열이 끼어들면 그 뒤 열은 모두 같은 만큼 밀리므로,
+    왼쪽에서 가장 가까운 '헤더로 찾은 역할'(anchors)의 이동량을 그대로 적용
+    """
+    out = []
+    for letter in letters:
+        pos = letter_to_index(letter)
+        shift = 0
+        for base, d in layout["anchors"]:
+            if base > pos:
+                break
+            shift = d
+        out.append(pos + shift)
+    return out
+
+
+def warn_if_moved(layout: dict) -> None:
+    """헤더로 찾은 열이 기본 위치에서 벗어났으면 화면에 경고 (위치로만 읽는 열도 확인 필요)"""
+    if layout["moved"]:
+        moves = ", ".join(f"{role} {a}→{b}열" for role, a, b in layout["moved"])
+        st.warning(
+            f"{layout['label']} 양식의 열 위치가 기본과 다릅니다 ({moves}). "
+            "헤더로 찾는 열은 자동으로 따라가지만, 위치로만 읽는 열은 결과를 확인하세요."
+        )
@@ -1,13 +1,22 @@
 # tax_invoice_app.py
 # -*- coding: utf-8 -*-
+from __future__ import annotations
 
-import os
+import json
+import re
+import uuid
+import zipfile
+from collections import defaultdict
 from io import BytesIO
 
+import numpy as np
 import pandas as pd
 import streamlit as st
 from openpyxl.utils import get_column_letter
 
+from excel.excel_io import read_upload
+from excel.schema import resolve
+
 
 # =========================== 공통 유틸 ===========================
 
@@ -16,14 +25,10 @@ def normalize_key(series: pd.Series) -> pd.Series:
     return series.astype(str).str.replace(r"[^0-9]", "", regex=True).str.strip()
 
 
-def detect_key_index(header_row, candidates):
-    """헤더에서 특정 문자열 포함 컬럼 index 찾기"""
-    for idx, val in enumerate(header_row):
-        txt = str(val)
-        for c in candidates:
-            if c in txt:
-                return idx
-    return None
+def masked_key(series: pd.Series) -> pd.Series:
+    """마스킹 자리 비교용 정규화: 숫자 + 마스킹 문자(*, X, ＊)만 남기고 마스킹은 "*" 로 통일"""
+    s = series.fillna("").astype(str).str.replace(r"[^0-9*Xx＊]", "", regex=True)
+    return s.str.replace(r"[Xx＊]", "*", regex=True)
 
 
 def find_col(df: pd.DataFrame, keywords):
@@ -36,16 +41,6 @@ def find_col(df: pd.DataFrame, keywords):
     return None
 
 
-def pick_col_name(df: pd.DataFrame, keywords):
-    """키워드 포함 컬럼명을 반환"""
-    for col in df.columns:
-        s = str(col)
-        for kw in keywords:
-            if kw in s:
-                return col
-    return None
-
-
 def sanitize_headers(header_row):
     """NaN, 중복 컬럼명 정리"""
     new_headers = []
@@ -175,21 +170,13 @@ def import_by_pattern(uploaded_files, pattern, start_row_first):
 
     for f in uploaded_files:
         if pattern in f.name:
-            ext = os.path.splitext(f.name)[1].lower()
-            if ext == ".xls":
-                st.warning(f"{f.name}은 XLS라서 제외됩니다.")
-                skipped += 1
-                continue
-
             try:
-                f.seek(0)
-                raw = pd.read_excel(
+                # .xls 도 공통 입력 레이어에서 바로 읽음 (내용 해시 캐시)
+                raw = read_upload(
                     f,
                     header=None,
-                    engine="openpyxl",
                     dtype=str,
                     na_filter=False,        # ✅ 빈칸/마스킹을 NaN으로 덜 바꿈
-                    keep_default_na=False
                 )
 
             except Exception as e:
@@ -213,28 +200,245 @@ def import_by_pattern(uploaded_files, pattern, start_row_first):
     df = pd.concat(df_list, ignore_index=True) if df_list else pd.DataFrame()
     return df, f"{pattern} → 처리 {processed}건 / 건너뜀 {skipped}건"
 
+# =========================== 매칭 엔진 ===========================
+MATCH_STATUS_COL = "매칭구분"
+MATCH_AMOUNT = "금액일치"      # 사업자번호 + 금액(+일자순) 1:1 매칭
+MATCH_KEY_ONLY = "번호일치"    # 사업자번호만 같고 금액이 다른 건(일자순 1:1)
+MATCH_VENDOR = "상호일치"      # 번호 누락/마스킹 → 거래처명 유사 + 금액 일치
+HOME_ONLY = "홈택스만"
+HAKSA_ONLY = "학사만"
+
+
+# 사업자번호는 10자리. 그보다 짧으면 마스킹/누락으로 보고 정확 매칭에서 제외
+KEY_MIN_DIGITS = 10
+
+# 상호 유사도 매칭 설정
+NGRAM_N = 2
+VENDOR_MIN_SIMILARITY = 0.5
+NGRAM_MAX_POSTINGS = 200   # 너무 흔한 n-gram(예: '대학')은 후보 생성에서 제외
+VENDOR_NOISE = re.compile(r"\(주\)|㈜|주식회사|\(유\)|유한회사|\(재\)|재단법인|\(사\)|사단법인|[^0-9A-Za-z가-힣]")
+
+
+def to_amount(series: pd.Series) -> pd.Series:
+    """'1,234' 같은 금액 문자열을 숫자로 (실패/공란은 NaN)"""
+    return pd.to_numeric(
+        series.astype(str).str.replace(",", "", regex=False).str.strip(),
+        errors="coerce",
+    )
+
+
+def to_date_ordinal(series: pd.Series) -> pd.Series:
+    """정렬용 일자값 (일자 없으면 맨 뒤로 가도록 최대값)"""
+    dt = pd.to_datetime(series, errors="coerce")
+    out = pd.Series(np.iinfo(np.int64).max, index=series.index, dtype="int64")
+    ok = dt.notna()
+    out[ok] = dt[ok].astype("int64")
+    return out
+
+
+def two_pointer_pairs(left_keys, right_keys):
+    """
+    정렬된 두 키 목록을 한 번씩만 훑어서 같은 키끼리 1:1로 짝짓기.
+    반환: [(왼쪽 위치, 오른쪽 위치), ...]  → 결과 크기는 min(n, m) 이하
+    """
+    pairs = []
+    i = j = 0
+    n, m = len(left_keys), len(right_keys)
+    while i < n and j < m:
+        a, b = left_keys[i], right_keys[j]
+        if a == b:
+            pairs.append((i, j))
+            i += 1
+            j += 1
+        elif a < b:
+            i += 1
+        else:
+            j += 1
+    return pairs
+
+
+def match_invoices(home: pd.DataFrame, haksa: pd.DataFrame):
+    """
+    사업자번호(__KEY) 그룹 안에서 홈택스/학사 세금계산서를 1:1로 짝짓기.
+
+    home / haksa: 컬럼 "__KEY", "__AMT", "__DATE" 를 가진 DataFrame
+    1차) (번호, 금액) 이 같은 건끼리 일자순으로 짝짓기
+    2차) 1차에서 남은 건끼리 같은 번호 안에서 일자순으로 짝짓기
+    번호가 10자리 미만인(마스킹/누락) 행은 여기서 매칭하지 않음
+
+    반환: (pairs, home_unmatched, haksa_unmatched)
+        pairs: DataFrame[home_pos, haksa_pos, status]  (입력 index 값 기준)
+        home_unmatched / haksa_unmatched: 짝을 못 찾은 행 index 배열
+    """
+    home_left = home.index[home["__KEY"].str.len() >= KEY_MIN_DIGITS]
+    haksa_left = haksa.index[haksa["__KEY"].str.len() >= KEY_MIN_DIGITS]
+    frames = []
+
+    # ── 1차: 번호 + 금액 ─────────────────────
+    h1 = home.loc[home_left]
+    k1 = haksa.loc[haksa_left]
+    h1 = h1[h1["__AMT"].notna()].sort_values(["__KEY", "__AMT", "__DATE"], kind="mergesort")
+    k1 = k1[k1["__AMT"].notna()].sort_values(["__KEY", "__AMT", "__DATE"], kind="mergesort")
+
+    pairs = two_pointer_pairs(
+        list(zip(h1["__KEY"], h1["__AMT"])),
+        list(zip(k1["__KEY"], k1["__AMT"])),
+    )
+    if pairs:
+        hi, ki = map(list, zip(*pairs))
+        frames.append(pd.DataFrame({
+            "home_pos": h1.index[hi],
+            "haksa_pos": k1.index[ki],
+            "status": MATCH_AMOUNT,
+        }))
+        home_left = home_left.difference(h1.index[hi])
+        haksa_left = haksa_left.difference(k1.index[ki])
+
+    # ── 2차: 남은 건끼리 번호만 ─────────────────
+    h2 = home.loc[home_left].sort_values(["__KEY", "__DATE"], kind="mergesort")
+    k2 = haksa.loc[haksa_left].sort_values(["__KEY", "__DATE"], kind="mergesort")
+
+    pairs = two_pointer_pairs(list(h2["__KEY"]), list(k2["__KEY"]))
+    if pairs:
+        hi, ki = map(list, zip(*pairs))
+        frames.append(pd.DataFrame({
+            "home_pos": h2.index[hi],
+            "haksa_pos": k2.index[ki],
+            "status": MATCH_KEY_ONLY,
+        }))
+
+    if frames:
+        matched = pd.concat(frames, ignore_index=True)
+    else:
+        matched = pd.DataFrame({"home_pos": [], "haksa_pos": [], "status": []})
+    matched = matched.astype({"home_pos": "int64", "haksa_pos": "int64"})
+
+    home_unmatched = np.setdiff1d(home.index.to_numpy(), matched["home_pos"].to_numpy())
+    haksa_unmatched = np.setdiff1d(haksa.index.to_numpy(), matched["haksa_pos"].to_numpy())
+    return matched, home_unmatched, haksa_unmatched
+
+
+def normalize_vendor(name) -> str:
+    """상호 비교용 정규화: 법인 표기/공백/기호 제거 + 소문자"""
+    if name is None or pd.isna(name):
+        return ""
+    return VENDOR_NOISE.sub("", str(name)).lower()
+
+
+def char_ngrams(text: str, n: int = NGRAM_N) -> set:
+    if not text:
+        return set()
+    if len(text) <= n:
+        return {text}
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+def keys_compatible(a: str, b: str) -> bool:
+    """
+    마스킹된 번호는 양쪽 모두 보이는 자리의 숫자가 같을 때만 허용 (예: 123-**-45678)
+    - 자리별 비교, "*" 자리는 건너뜀 / 길이가 다르면 짧은 쪽 길이까지만 (뒷자리 잘린 번호)
+    - 번호가 없으면 비교하지 않음
+    """
+    return all(x == y or x == "*" or y == "*" for x, y in zip(a, b))
+
+
+def fuzzy_match_vendors(home: pd.DataFrame, haksa: pd.DataFrame, home_pos, haksa_pos):
+    """
+    정확 매칭 후 남은 행끼리 거래처명 + 금액으로 보조 매칭.
+
+    home / haksa: 컬럼 "__RAWKEY", "__AMT", "__NAME" 을 가진 DataFrame (위치 index)
+    home_pos / haksa_pos: 정확 매칭에서 남은 행 위치
+    - (금액, 문자 n-gram) 블로킹 인덱스로 후보쌍만 비교 → O(n×m) 전체 비교 없음
+    - 유사도(Jaccard) 높은 순으로 1:1 배정
+
+    반환: DataFrame[home_pos, haksa_pos, status]
+    """
+    empty = pd.DataFrame({"home_pos": [], "haksa_pos": [], "status": []})
+    if len(home_pos) == 0 or len(haksa_pos) == 0:
+        return empty
+
+    # 학사 잔여분 블로킹 인덱스: (금액, n-gram) → 학사 위치 목록
+    index = defaultdict(list)
+    haksa_grams = {}
+    for pos in haksa_pos:
+        amt = haksa.at[pos, "__AMT"]
+        if pd.isna(amt):
+            continue
+        grams = char_ngrams(haksa.at[pos, "__NAME"])
+        haksa_grams[pos] = grams
+        for g in grams:
+            index[(amt, g)].append(pos)
+
+    candidates = []
+    for pos in home_pos:
+        amt = home.at[pos, "__AMT"]
+        if pd.isna(amt):
+            continue
+        grams = char_ngrams(home.at[pos, "__NAME"])
+        seen = set()
+        for g in grams:
+            posting = index.get((amt, g), ())
+            if len(posting) > NGRAM_MAX_POSTINGS:
+                continue
+            seen.update(posting)
+
+        for other in seen:
+            if not keys_compatible(home.at[pos, "__RAWKEY"], haksa.at[other, "__RAWKEY"]):
+                continue
+            other_grams = haksa_grams[other]
+            score = len(grams & other_grams) / len(grams | other_grams)
+            if score >= VENDOR_MIN_SIMILARITY:
+                candidates.append((score, pos, other))
+
+    # 점수 높은 순으로 1:1 배정 (동점은 위치 순)
+    candidates.sort(key=lambda t: (-t[0], t[1], t[2]))
+    used_home, used_haksa = set(), set()
+    rows = []
+    for score, hp, kp in candidates:
+        if hp in used_home or kp in used_haksa:
+            continue
+        used_home.add(hp)
+        used_haksa.add(kp)
+        rows.append((hp, kp))
+
+    if not rows:
+        return empty
+    hp, kp = zip(*rows)
+    return pd.DataFrame({"home_pos": hp, "haksa_pos": kp, "status": MATCH_VENDOR})
+
+
 # =========================== 매칭 로직 ===========================
-def connect_by_id(home_df, haksa_df):
-    if home_df.empty:
+STATE_SHEET = "_대조상태"
+STATE_COLUMNS = ["구분", "측", "짝번호", "매칭구분", "해시", "식별번호", "원본"]
+SIDE_HOME = "홈택스"
+SIDE_HAKSA = "학사"
+# 다음 실행에서 그대로 고정하는 매칭구분 (번호일치/상호일치 같은 약한 짝은 다시 매칭)
+# 고정된 짝은 원본 없이 해시/식별번호만 보관 → 대조상태가 지금까지 본 전체 자료로 커지지 않음
+LOCKED_STATUSES = (MATCH_AMOUNT,)
+
+
+def split_header(raw_df: pd.DataFrame) -> pd.DataFrame:
+    """import_by_pattern 결과(첫 행이 헤더) → 헤더 정리된 본문"""
+    if raw_df.empty:
         return pd.DataFrame()
+    body = raw_df.iloc[1:].reset_index(drop=True)
+    body.columns = sanitize_headers(list(raw_df.iloc[0]))
+    return body
 
-    # 홈택스 헤더/본문
-    home_header = sanitize_headers(list(home_df.iloc[0]))
-    home_body = home_df.iloc[1:].reset_index(drop=True)
-    home_body.columns = home_header
 
-    # 학사 헤더/본문
-    if not haksa_df.empty:
-        haksa_header = sanitize_headers(list(haksa_df.iloc[0]))
-        haksa_body = haksa_df.iloc[1:].reset_index(drop=True)
-        haksa_body.columns = haksa_header
-    else:
-        haksa_body = pd.DataFrame()
+def schema_col_names(body: pd.DataFrame, schema: str) -> dict:
+    """양식 해석(schema, 헤더 지문별 1회) 결과를 {역할: 컬럼명 또는 None} 으로"""
+    names = list(body.columns)
+    cols = resolve(schema, names)["cols"]
+    return {role: names[i] if i is not None and i < len(names) else None for role, i in cols.items()}
+
 
-    # 홈택스 키 표준화
-    key_idx = detect_key_index(home_header, ["공급자등록번호", "사업자등록번호"])
-    if key_idx is None:
-        key_idx = 1
+def standardize_home(home_body: pd.DataFrame) -> dict:
+    """홈택스 본문에 표준 컬럼 추가 + 매칭/해시에 쓸 컬럼명 반환 (열 위치는 schema "hometax")"""
+    names = schema_col_names(home_body, "hometax")
+
+    # 홈택스 키 표준화 (헤더로 못 찾으면 B열)
+    key_idx = resolve("hometax", list(home_body.columns))["cols"]["key"]
 
     key_col = home_body.columns[key_idx]
     if "공급자등록번호" not in str(key_col):
@@ -244,79 +448,363 @@ def connect_by_id(home_df, haksa_df):
             home_body["공급자등록번호"] = home_body[key_col]
 
     # 홈택스 금액 표준화
-    sup = pick_col_name(home_body, ["공급가액"])
+    sup = names["supply"]
     if sup:
         home_body["공급가액"] = home_body[sup]
 
-    tax = pick_col_name(home_body, ["세액"])
+    tax = names["tax"]
     if tax:
         home_body["세액"] = home_body[tax]
 
-    tot = pick_col_name(home_body, ["합계금액", "발생금액"])
+    tot = names["total"]
     if tot:
         home_body["합계금액"] = home_body[tot]
 
-    # 학사 표준화
-    if not haksa_body.empty:
-        key_h = pick_col_name(haksa_body, ["사업자번호"])
-        haksa_body["사업자번호_학사"] = haksa_body[key_h]
+    home_body["__KEY"] = normalize_key(home_body["공급자등록번호"])
+
+    return {
+        "key": "공급자등록번호",
+        "amount": "합계금액" if tot else ("공급가액" if sup else None),
+        "date": names["date"],
+        "vendor": next((c for c in home_body.columns[key_idx + 1:] if "상호" in str(c)), None),
+        "id": names["id"],
+        "hash": [c for c in ["공급가액", "세액", "합계금액"] if c in home_body.columns],
+    }
+
+
+def standardize_haksa(haksa_body: pd.DataFrame) -> dict:
+    """학사 본문에 표준 컬럼(_학사) 추가 + 매칭/해시에 쓸 컬럼명 반환 (열 위치는 schema "haksa")"""
+    names = schema_col_names(haksa_body, "haksa")
+    key_h = names["key"]
+    haksa_body["사업자번호_학사"] = haksa_body[key_h]
+
+    sup_h = names["supply"]
+    if sup_h:
+        haksa_body["공급가액_학사"] = haksa_body[sup_h]
+
+    tax_h = names["tax"]
+    if tax_h:
+        haksa_body["세액_학사"] = haksa_body[tax_h]
+
+    tot_h = names["total"]
+    if tot_h:
+        haksa_body["합계금액_학사"] = haksa_body[tot_h]
+
+    # 학사 거래처명
+    vendor_h = names["vendor"]
+    if vendor_h:
+        haksa_body["거래처명_학사"] = haksa_body[vendor_h]
+
+    haksa_body["__KEY"] = normalize_key(haksa_body["사업자번호_학사"])
+
+    return {
+        "key": "사업자번호_학사",
+        "amount": "합계금액_학사" if tot_h else ("공급가액_학사" if sup_h else None),
+        "date": names["date"],
+        "vendor": "거래처명_학사" if vendor_h else None,
+        "id": names["id"],
+        "hash": [c for c in ["공급가액_학사", "세액_학사", "합계금액_학사"] if c in haksa_body.columns],
+    }
+
+
+def match_view(body: pd.DataFrame, cols: dict) -> pd.DataFrame:
+    """매칭 엔진 입력(__KEY/__RAWKEY/__AMT/__DATE/__NAME)"""
+    empty = pd.Series(pd.NA, index=body.index)
+    return pd.DataFrame({
+        "__KEY": body["__KEY"],
+        "__RAWKEY": masked_key(body[cols["key"]]),
+        "__AMT": to_amount(body[cols["amount"]] if cols["amount"] else empty),
+        "__DATE": to_date_ordinal(body[cols["date"]] if cols["date"] else empty),
+        "__NAME": (body[cols["vendor"]] if cols["vendor"] else empty).map(normalize_vendor),
+    })
+
+
+def invoice_hash(body: pd.DataFrame, cols: dict) -> pd.Series:
+    """핵심 필드(번호/일자/금액/식별번호) 해시 → 신규·변경 건 판별용 (16자리 hex)"""
+    parts = {"key": body["__KEY"]}
+    if cols["date"]:
+        parts["date"] = body[cols["date"]].astype(str).str.strip()
+    for c in cols["hash"]:
+        parts[c] = to_amount(body[c]).astype(str)
+    if cols["id"]:
+        parts["id"] = body[cols["id"]].astype(str).str.strip()
+    hashed = pd.util.hash_pandas_object(pd.DataFrame(parts), index=False)
+    return hashed.map(lambda v: format(v, "016x"))
+
+
+def state_rows(body: pd.DataFrame, raw_cols, cols, side, pair_ids, statuses) -> pd.DataFrame:
+    """
+    다음 달 증분 실행용 대조상태 행
+    - 미확정 행: 원본 행을 JSON 으로 보관 (다음 실행에서 다시 매칭)
+    - 확정 짝(LOCKED_STATUSES): 원본 없이 해시/식별번호/짝번호만 (재업로드 중복 제외용)
+    """
+    statuses = np.broadcast_to(np.asarray(statuses, dtype=object), (len(body),))
+    is_open = ~np.isin(statuses, LOCKED_STATUSES)
+    raw = body.loc[is_open, raw_cols]
+    raw = raw.astype(object).where(raw.notna(), "")
+    originals = np.full(len(body), "", dtype=object)
+    originals[is_open] = [json.dumps(r, ensure_ascii=False) for r in raw.astype(str).to_dict("records")]
+    return pd.DataFrame({
+        "측": side,
+        "짝번호": pair_ids,
+        "매칭구분": statuses,
+        "해시": invoice_hash(body, cols).to_numpy(),
+        "식별번호": body[cols["id"]].astype(str).str.strip().to_numpy() if cols["id"] else "",
+        "원본": originals,
+    })
+
+
+def state_body(prev_state: pd.DataFrame, side: str) -> pd.DataFrame:
+    """대조상태 → 이전 실행의 미확정 원본 본문 (+ __PREV_PAIR / __PREV_STATUS)"""
+    part = prev_state[(prev_state["측"] == side) & (prev_state["원본"] != "")]
+    if part.empty:
+        return pd.DataFrame()
+    body = pd.DataFrame([json.loads(r) for r in part["원본"]])
+    body["__PREV_PAIR"] = part["짝번호"].to_numpy()
+    body["__PREV_STATUS"] = part["매칭구분"].to_numpy()
+    return body
+
+
+def locked_rows(prev_state: pd.DataFrame | None, side: str) -> pd.DataFrame:
+    """대조상태 → 이전까지 확정된 짝 (원본 없이 해시만 보관된 행)"""
+    if prev_state is None or prev_state.empty:
+        return pd.DataFrame(columns=STATE_COLUMNS)
+    return prev_state[(prev_state["측"] == side) & (prev_state["원본"] == "")]
+
+
+def _tagged(hashes: pd.Series) -> pd.Series:
+    """해시 + 같은 해시 안에서의 순번 (같은 내용 행이 여러 개여도 1:1 로 대응)"""
+    hashes = hashes.astype(str)
+    return hashes + "#" + hashes.groupby(hashes).cumcount().astype(str)
+
+
+def released_pairs(body: pd.DataFrame, hashes: pd.Series, ids, locked: pd.DataFrame) -> set:
+    """확정 짝 중 같은 식별번호가 내용(해시)이 바뀌어 다시 들어온 것 → 양쪽 모두 풀 짝번호"""
+    if ids is None or locked.empty:
+        return set()
+    is_new = body["__PREV_PAIR"].isna()
+    changed = set(ids[is_new & ~hashes.isin(set(locked["해시"])) & (ids != "")])
+    return set(locked.loc[locked["식별번호"].isin(changed), "짝번호"])
+
+
+def drop_superseded(body: pd.DataFrame, hashes: pd.Series, ids, locked: pd.DataFrame):
+    """
+    이전 상태 + 신규 업로드를 합친 본문에서 남길 행 mask.
+    - 이미 반영된 신규 행(이전 미확정 행 또는 확정 짝과 같은 해시, 같은 순번) → 제외
+    - 식별번호가 같은데 해시가 바뀐 행 → 이전 행을 버리고 신규 행 사용
+    반환: (본문 mask, locked 중 이번 업로드에 다시 들어온 행 mask → 다음 상태에도 유지)
+    """
+    is_prev = body["__PREV_PAIR"].notna()
+    prev_tagged = _tagged(pd.concat([hashes[is_prev], locked["해시"]], ignore_index=True))
+    new_tagged = _tagged(hashes[~is_prev])
+
+    dup_new = pd.Series(False, index=body.index)
+    dup_new[~is_prev] = new_tagged.isin(set(prev_tagged)).to_numpy()
+    carried = pd.Series(
+        prev_tagged.iloc[int(is_prev.sum()):].isin(set(new_tagged)).to_numpy(), index=locked.index,
+    )
+    if ids is None:
+        return ~dup_new, carried
+
+    changed = set(ids[~is_prev & ~dup_new & (ids != "")])
+    stale_prev = is_prev & ids.isin(changed)
+    return ~(dup_new | stale_prev), carried
+
+
+def _side_ids(body: pd.DataFrame, cols: dict):
+    return body[cols["id"]].astype(str).str.strip() if cols["id"] else None
+
+
+def connect_by_id(home_df, haksa_df):
+    merged, _, _ = reconcile(split_header(home_df), split_header(haksa_df))
+    return merged
 
-        sup_h = pick_col_name(haksa_body, ["공급가액"])
-        if sup_h:
-            haksa_body["공급가액_학사"] = haksa_body[sup_h]
 
-        tax_h = pick_col_name(haksa_body, ["세액"])
-        if tax_h:
-            haksa_body["세액_학사"] = haksa_body[tax_h]
+def reconcile(home_body, haksa_body, prev_state=None):
+    """
+    홈택스/학사 본문 대조.
 
-        tot_h = pick_col_name(haksa_body, ["합계금액", "발생금액"])
-        if tot_h:
-            haksa_body["합계금액_학사"] = haksa_body[tot_h]
+    prev_state: 이전 결과 파일의 대조상태(해당 구분 행만). 주어지면 증분 모드:
+        확정 짝(금액일치)은 다시 올라와도 제외하고 건수만 '유지' 로,
+        신규/변경 건 + 이전 잔여분 + 약한 짝(번호일치/상호일치)만 다시 매칭
+    반환: (merged, state, stats)
+    """
+    if prev_state is not None and not prev_state.empty:
+        home_body = pd.concat([state_body(prev_state, SIDE_HOME), home_body], ignore_index=True)
+        haksa_body = pd.concat([state_body(prev_state, SIDE_HAKSA), haksa_body], ignore_index=True)
+    home_locked = locked_rows(prev_state, SIDE_HOME)
+    haksa_locked = locked_rows(prev_state, SIDE_HAKSA)
+    run_id = uuid.uuid4().hex[:8]   # 이번 실행 짝번호 접두어 (이전 실행 짝번호와 겹치지 않게)
+
+    for body in (home_body, haksa_body):
+        if not body.empty:
+            for c in ("__PREV_PAIR", "__PREV_STATUS"):
+                if c not in body.columns:
+                    body[c] = pd.NA
+
+    stats = {"유지": 0, "재매칭": 0, "중복제외": 0}
+    if home_body.empty:
+        return pd.DataFrame(), pd.DataFrame(columns=STATE_COLUMNS), stats
+
+    internal = {"__PREV_PAIR", "__PREV_STATUS"}
+    home_raw_cols = [c for c in home_body.columns if c not in internal]
+    home_cols = standardize_home(home_body)
 
-        # 학사 거래처명
-        vendor_h = pick_col_name(haksa_body, ["거래처명", "상호"])
-        if vendor_h:
-            haksa_body["거래처명_학사"] = haksa_body[vendor_h]
+    # 학사 표준화
+    if not haksa_body.empty:
+        haksa_raw_cols = [c for c in haksa_body.columns if c not in internal]
+        haksa_cols = standardize_haksa(haksa_body)
+
+        # 증분: 이미 반영된 건 / 변경 전 건 정리
+        home_hash = invoice_hash(home_body, home_cols)
+        haksa_hash = invoice_hash(haksa_body, haksa_cols)
+        home_ids, haksa_ids = _side_ids(home_body, home_cols), _side_ids(haksa_body, haksa_cols)
+
+        # 확정 짝 중 한쪽 내용이 바뀐 것은 양쪽 모두 풀어서 다시 매칭
+        released = (released_pairs(home_body, home_hash, home_ids, home_locked)
+                    | released_pairs(haksa_body, haksa_hash, haksa_ids, haksa_locked))
+        home_locked = home_locked[~home_locked["짝번호"].isin(released)]
+        haksa_locked = haksa_locked[~haksa_locked["짝번호"].isin(released)]
+
+        home_keep, home_carried = drop_superseded(home_body, home_hash, home_ids, home_locked)
+        haksa_keep, haksa_carried = drop_superseded(haksa_body, haksa_hash, haksa_ids, haksa_locked)
+        stats["중복제외"] = int((~home_keep).sum() + (~haksa_keep).sum())
+        home_body = home_body[home_keep].reset_index(drop=True)
+        haksa_body = haksa_body[haksa_keep].reset_index(drop=True)
+        home_locked, haksa_locked = home_locked[home_carried], haksa_locked[haksa_carried]
+
+        # (이전 형식 상태 파일) 원본이 남아 있는 짝 중 양쪽이 모두 남아 있고 확정 구분인 것만 고정
+        hp = home_body["__PREV_PAIR"].dropna()
+        kp = haksa_body["__PREV_PAIR"].dropna()
+        hp, kp = hp[hp != ""], kp[kp != ""]
+        fixed = pd.merge(
+            pd.DataFrame({"pair": hp.to_numpy(), "home_pos": hp.index}),
+            pd.DataFrame({"pair": kp.to_numpy(), "haksa_pos": kp.index}),
+            on="pair",
+        )
+        fixed["status"] = home_body.loc[fixed["home_pos"], "__PREV_STATUS"].to_numpy()
+        fixed = fixed[fixed["status"].isin(LOCKED_STATUSES)].drop(columns="pair")
+        stats["유지"] = len(fixed) + len(set(home_locked["짝번호"]) | set(haksa_locked["짝번호"]))
+
+        # ✅ 번호 그룹 안에서 금액/일자 기준 1:1 매칭 (교차조인 없음) — 미고정 행만
+        home_view = match_view(home_body, home_cols).drop(index=fixed["home_pos"])
+        haksa_view = match_view(haksa_body, haksa_cols).drop(index=fixed["haksa_pos"])
+        stats["재매칭"] = len(home_view) + len(haksa_view)
+
+        pairs, home_rest, haksa_rest = match_invoices(home_view, haksa_view)
+
+        # 번호 매칭에서 남은 행만 상호 + 금액 보조 매칭
+        fuzzy = fuzzy_match_vendors(home_view, haksa_view, home_rest, haksa_rest)
+        if not fuzzy.empty:
+            haksa_rest = np.setdiff1d(haksa_rest, fuzzy["haksa_pos"].to_numpy())
+        pairs = pd.concat([fixed, pairs, fuzzy], ignore_index=True).astype(
+            {"home_pos": "int64", "haksa_pos": "int64"}
+        )
 
-        # 머지
-        home_body["__KEY"] = normalize_key(home_body["공급자등록번호"])
-        haksa_body["__KEY"] = normalize_key(haksa_body["사업자번호_학사"])
+        # 홈택스 행마다 고유 번호, 짝지어진 학사 행에 같은 번호 부여 → 1:1 머지
+        home_body["__PAIR"] = np.arange(len(home_body))
+        home_body[MATCH_STATUS_COL] = HOME_ONLY
+        home_body.loc[pairs["home_pos"].to_numpy(), MATCH_STATUS_COL] = pairs["status"].to_numpy()
+
+        # 다음 실행용 대조상태 (+ 이번 업로드에 다시 들어온 이전 확정 짝)
+        pair_ids = (run_id + "-" + pairs["home_pos"].astype(str)).to_numpy()
+        haksa_pair = pd.Series("", index=haksa_body.index, dtype=object)
+        haksa_pair[pairs["haksa_pos"].to_numpy()] = pair_ids
+        haksa_status = pd.Series(HAKSA_ONLY, index=haksa_body.index, dtype=object)
+        haksa_status[pairs["haksa_pos"].to_numpy()] = pairs["status"].to_numpy()
+        home_pair = pd.Series("", index=home_body.index, dtype=object)
+        home_pair[pairs["home_pos"].to_numpy()] = pair_ids
+        state = pd.concat([
+            state_rows(home_body, home_raw_cols, home_cols, SIDE_HOME,
+                       home_pair.to_numpy(), home_body[MATCH_STATUS_COL].to_numpy()),
+            state_rows(haksa_body, haksa_raw_cols, haksa_cols, SIDE_HAKSA,
+                       haksa_pair.to_numpy(), haksa_status.to_numpy()),
+            home_locked[STATE_COLUMNS[1:]],
+            haksa_locked[STATE_COLUMNS[1:]],
+        ], ignore_index=True)
+
+        haksa_body = haksa_body.drop(columns=["__PREV_PAIR", "__PREV_STATUS"])
+        home_body = home_body.drop(columns=["__PREV_PAIR", "__PREV_STATUS"])
+
+        haksa_matched = haksa_body.iloc[pairs["haksa_pos"].to_numpy()].drop(columns="__KEY")
+        haksa_matched["__PAIR"] = pairs["home_pos"].to_numpy()
 
-        # ✅ merge는 한 번만 (indicator 포함)
         merged = pd.merge(
             home_body,
-            haksa_body,
-            on="__KEY",
+            haksa_matched,
+            on="__PAIR",
             how="left",
-            indicator=True
+            validate="one_to_one",
         )
 
-        # ✅ 홈택스에 없는 학사 키만 추출
-        home_keys = set(home_body["__KEY"].dropna().astype(str))
-        haksa_only = haksa_body[
-            haksa_body["__KEY"].notna() &
-            ~haksa_body["__KEY"].astype(str).isin(home_keys)
-        ].copy()
+        # ✅ 짝을 못 찾은 학사 행(잔여분)
+        haksa_only = haksa_body.iloc[haksa_rest].copy()
 
         if not haksa_only.empty:
             # merged 구조에 맞게 컬럼 보정
             for c in merged.columns:
-                if c not in haksa_only.columns and c != "_merge":
+                if c not in haksa_only.columns:
                     haksa_only[c] = pd.NA
 
             # 컬럼 순서 맞추기
-            haksa_only = haksa_only[[c for c in merged.columns if c != "_merge"]]
-            haksa_only["_merge"] = "haksa_only"
+            haksa_only = haksa_only[list(merged.columns)]
+            haksa_only[MATCH_STATUS_COL] = HAKSA_ONLY
 
             merged = pd.concat([merged, haksa_only], ignore_index=True)
 
-        # 마무리 정리
-        merged = merged.drop(columns=["__KEY", "_merge"])
+        # 마무리 정리 (매칭구분은 맨 끝으로)
+        merged = merged.drop(columns=["__KEY", "__PAIR"])
+        status = merged.pop(MATCH_STATUS_COL)
+        merged[MATCH_STATUS_COL] = status
     
     else:
-        merged = home_body.copy()
+        home_hash = invoice_hash(home_body, home_cols)
+        home_ids = _side_ids(home_body, home_cols)
+        released = released_pairs(home_body, home_hash, home_ids, home_locked)
+        home_locked = home_locked[~home_locked["짝번호"].isin(released)]
+        home_keep, home_carried = drop_superseded(home_body, home_hash, home_ids, home_locked)
+        stats["중복제외"] = int((~home_keep).sum())
+        home_locked = home_locked[home_carried]
+        stats["유지"] = home_locked["짝번호"].nunique()
+        home_body = home_body[home_keep].reset_index(drop=True)
+        state = pd.concat([
+            state_rows(home_body, home_raw_cols, home_cols, SIDE_HOME, "", HOME_ONLY),
+            home_locked[STATE_COLUMNS[1:]],
+        ], ignore_index=True)
+        merged = home_body.drop(columns=["__KEY", "__PREV_PAIR", "__PREV_STATUS"])
+
+    return merged, state, stats
+
+
+def load_previous_state(file_like) -> pd.DataFrame | None:
+    """
+    이전 대조결과 파일에서 대조상태 시트 읽기
+    시트가 없거나, 열이 빠졌거나, 원본 JSON 이 깨진 경우 None (→ 전체 대조)
+    """
+    try:
+        file_like.seek(0)
+        state = pd.read_excel(
+            file_like,
+            sheet_name=STATE_SHEET,
+            engine="openpyxl",
+            dtype=str,
+            na_filter=False,
+            keep_default_na=False,
+        )
+        state = state[STATE_COLUMNS]
+        for raw in state.loc[state["원본"] != "", "원본"]:
+            if not isinstance(json.loads(raw), dict):
+                return None
+    except (ValueError, KeyError, TypeError, zipfile.BadZipFile):
+        return None
+    return state
 
-    return merged
+
+def match_summary(df: pd.DataFrame) -> dict:
+    """매칭구분별 건수 (화면 요약용)"""
+    if df.empty or MATCH_STATUS_COL not in df.columns:
+        return {}
+    return df[MATCH_STATUS_COL].value_counts().to_dict()
 
 # =========================== 엑셀 수식 ===========================
 def display_len(cell) -> int:
@@ -453,16 +941,28 @@ def run():
     st.write("사업자등록번호 기준으로 거래처 대조 및 공급가액과 세액의 차이 대조")
     st.write("**결과값 True는 사업자등록번호 일치**")
     st.write("**금액이 0원이면 홈택스와 학사의 금액이 일치**")
+    st.write("**매칭구분: 금액일치 / 번호일치(금액 다름) / 상호일치(번호 누락·마스킹) / 홈택스만 / 학사만**")
 
     uploaded_files = st.file_uploader(
         "세금계산서 관련 8개 파일을 업로드하세요. ex)학사매입세금계산서, 홈택스매출계산서",
-        type=["xlsx", "xlsm"],
+        type=["xlsx", "xlsm", "xls"],
         accept_multiple_files=True,
     )
     if not uploaded_files:
         st.info("파일을 업로드하면 매칭 결과가 표시됩니다.")
         return
 
+    prev_file = st.file_uploader(
+        "(선택) 지난달 대조결과 파일 — 올리면 신규/변경 건만 다시 매칭합니다.",
+        type=["xlsx"],
+        key="tax_prev_result",
+    )
+    prev_state = None
+    if prev_file:
+        prev_state = load_previous_state(prev_file)
+        if prev_state is None:
+            st.warning("이전 결과 파일에 대조상태 시트가 없거나 손상되어 전체 대조로 진행합니다.")
+
     patterns = [
         ("홈택스매입세금계산서", 9),
         ("학사매입세금계산서", 1),
@@ -481,19 +981,40 @@ def run():
          data_map[pat] = df
          #st.write(msg)
 
-    # 매칭
-    buy_tax = connect_by_id(
-        data_map["홈택스매입세금계산서"], data_map["학사매입세금계산서"]
-    )
-    sell_tax = connect_by_id(
-        data_map["홈택스매출세금계산서"], data_map["학사매출세금계산서"]
-    )
-    buy_bill = connect_by_id(
-        data_map["홈택스매입계산서"], data_map["학사매입계산서"]
-    )
-    sell_bill = connect_by_id(
-        data_map["홈택스매출계산서"], data_map["학사매출계산서"]
-    )
+    # 매칭 (증분 모드면 이전 대조상태와 함께)
+    results = {}
+    stats_rows = []
+    states = []
+    for label in ["매입세금계산서", "매출세금계산서", "매입계산서", "매출계산서"]:
+        prev_part = None
+        if prev_state is not None:
+            prev_part = prev_state[prev_state["구분"] == label]
+
+        merged, state, stats = reconcile(
+            split_header(data_map[f"홈택스{label}"]),
+            split_header(data_map[f"학사{label}"]),
+            prev_part,
+        )
+        results[label] = merged
+        if not state.empty:
+            state.insert(0, "구분", label)
+            states.append(state)
+        stats_rows.append({"구분": label, **stats, **match_summary(merged)})
+
+    buy_tax = results["매입세금계산서"]
+    sell_tax = results["매출세금계산서"]
+    buy_bill = results["매입계산서"]
+    sell_bill = results["매출계산서"]
+    state_df = pd.concat(states, ignore_index=True) if states else pd.DataFrame(columns=STATE_COLUMNS)
+
+    # 매칭 잔여분 요약 (홈택스만 / 학사만) + 증분 처리 건수
+    st.subheader("매칭 요약")
+    summary = pd.DataFrame(stats_rows).fillna(0)
+    if prev_state is None:
+        summary = summary.drop(columns=["유지", "재매칭", "중복제외"])
+    st.dataframe(summary, use_container_width=True)
+    if prev_state is not None:
+        st.caption("유지: 지난 결과에서 금액일치로 확정된 짝 (이번 결과 시트에는 다시 싣지 않음)")
 
     # 매입 → 매출 구조 맞추기
     buy_tax = align_columns(sell_tax, buy_tax)
@@ -551,6 +1072,10 @@ def run():
                     is_tax=is_tax
                 )
 
+            # 다음 달 증분 대조용 상태 (숨김 시트)
+            state_df.to_excel(writer, sheet_name=STATE_SHEET, index=False)
+            writer.book[STATE_SHEET].sheet_state = "hidden"
+
         output.seek(0)
         st.download_button(
             "📗 대조결과 파일 다운로드",
@@ -3,42 +3,38 @@
 import streamlit as st
 from io import BytesIO
 
-import xlrd
 from openpyxl import Workbook
 
+from excel.excel_io import read_xls_sheets
+from excel.jobs import estimate_memory, run_admitted
+from excel.result_cache import cached_result, result_key
+
 
 def convert_xls_to_xlsx(uploaded_file) -> BytesIO:
     """
     업로드된 .xls 파일을 .xlsx 로 변환해서 BytesIO 로 반환.
-    - xlrd 로 xls 읽고
+    - 공통 입력 레이어(read_xls_sheets)로 xls 읽고 (내용 해시 캐시)
     - openpyxl Workbook 으로 복사
-    - 모든 시트, 모든 셀 값 그대로 복사(서식은 단순화)
+    - 모든 시트, 모든 셀 값 그대로 복사(서식은 단순화, 날짜는 날짜로)
     """
-    # Streamlit UploadedFile -> bytes
-    file_bytes = uploaded_file.read()
-
-    # 1) xlrd로 .xls 열기
-    book_xls = xlrd.open_workbook(file_contents=file_bytes, encoding_override="cp949")
+    sheets = read_xls_sheets(uploaded_file)
 
-    # 2) openpyxl 워크북 새로 생성
+    # openpyxl 워크북 새로 생성
     wb_xlsx = Workbook()
 
-    for sheet_idx in range(book_xls.nsheets):
-        sheet_xls = book_xls.sheet_by_index(sheet_idx)
-
+    for sheet_idx, (name, raw) in enumerate(sheets.items()):
         # 첫 시트는 이미 있으니 제목만 바꾸고, 나머지는 새로 생성
         if sheet_idx == 0:
             ws = wb_xlsx.active
-            ws.title = sheet_xls.name
+            ws.title = name
         else:
-            ws = wb_xlsx.create_sheet(title=sheet_xls.name)
+            ws = wb_xlsx.create_sheet(title=name)
 
         # 각 셀 값 복사
-        for r in range(sheet_xls.nrows):
-            row_values = sheet_xls.row_values(r)
-            ws.append(row_values)
+        for row_values in raw.itertuples(index=False, name=None):
+            ws.append(list(row_values))
 
-    # 3) 메모리로 저장해서 반환
+    # 메모리로 저장해서 반환
     output = BytesIO()
     wb_xlsx.save(output)
     output.seek(0)
@@ -62,7 +58,15 @@ def run():
         st.info("각 파일 옆의 버튼을 눌러 .xlsx로 저장하세요.")
 
         for idx, xls_file in enumerate(xls_files):
-            converted = convert_xls_to_xlsx(xls_file)
+            # 같은 파일이면 재실행(다운로드 클릭 등) 시 변환 결과 재사용
+            # (처음 변환은 서버 작업 스케줄러 경유: 동시 실행 수 / 메모리 한도 초과 시 대기)
+            converted = cached_result(
+                result_key("xls_convert", [xls_file]),
+                lambda: run_admitted(
+                    f"XLS 변환 ({xls_file.name})", lambda report: convert_xls_to_xlsx(xls_file),
+                    cost=estimate_memory([xls_file]),
+                ),
+            )
 
             base = xls_file.name.rsplit(".", 1)[0]
             out_name = base + ".xlsx"